@@ -8,8 +8,10 @@ from fastapi.responses import StreamingResponse
 from routers.namespaces import ns
 from routers.typeDefinitions import typeDefinitions
 from routers.objects import explore, query, update
-from routers.subscriptions import subs, subscription_worker, handle_data_source_update
+from routers.subscriptions import subs, subscription_worker, SubscriptionDispatcher
 from data_sources.factory import DataSourceFactory
+from history_jobs import HistoryJobs
+from subscription_registry import SubscriptionRegistry
 
 
 # Load configuration helper function
@@ -59,9 +61,11 @@ async def lifespan(app: FastAPI):
     # Set the data source in app state
     app.state.data_source = data_source
 
-    # Create callback function that passes subscriptions and data source to the handler
-    def callback(instance, value):
-        handle_data_source_update(instance, value, app.state.I3X_DATA_SUBSCRIPTIONS, data_source)
+    # Long history queries run as jobs whose results are paged out of this store
+    app.state.HISTORY_JOBS = HistoryJobs(config.get("history_jobs"))
+
+    # Route data source updates, single or batched, to the subscriptions monitoring them
+    callback = SubscriptionDispatcher(app.state.I3X_DATA_SUBSCRIPTIONS, data_source)
 
     # Start the data source with the callback
     data_source.start(callback)
@@ -75,6 +79,7 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     SUBSCRIPTION_THREAD_FLAG["running"] = False
+    app.state.HISTORY_JOBS.shutdown()
 
     # Stop the data source
     if hasattr(app.state, "data_source"):
@@ -92,7 +97,7 @@ app = FastAPI(
 )
 
 # Setup app state (data source will be set after config is loaded)
-app.state.I3X_DATA_SUBSCRIPTIONS = []  # List[Subscription]
+app.state.I3X_DATA_SUBSCRIPTIONS = SubscriptionRegistry()  # subscriptionId -> Subscription
 
 # Include namespaces
 app.include_router(ns)
@@ -0,0 +1,52 @@
+"""
+Benchmark writing many last known values in one request.
+
+Run from demo/server:
+    python -m benchmarks.bench_bulk_write
+
+Writes 500 setpoints of a generated plant, as a recipe download would, with one
+update_instance_value per element (the previous path) and with one
+update_instance_values batch, directly and through PUT /objects/value.
+"""
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.objects import update
+
+SETPOINTS = 500
+RUNS = 5
+PLANT = {"sites": 2, "lines": 5, "equipment": 13, "measurements": 3, "records": 2}
+
+
+def timed(label, func):
+    """Best of RUNS"""
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<36} {best * 1000:>10.2f} ms")
+
+
+def main():
+    source = MockDataSource({"generator": PLANT})
+    element_ids = [
+        i["elementId"]
+        for i in source.get_instances()
+        if source.store.get_series(i["elementId"]) and isinstance(source.store.get_series(i["elementId"]).latest()["value"], float)
+    ][:SETPOINTS]
+    values = [float(n) for n in range(len(element_ids))]
+    app = FastAPI()
+    app.include_router(update)
+    app.state.data_source = source
+    client = TestClient(app)
+
+    print(f"{len(element_ids):,} setpoints")
+    timed("update_instance_value each", lambda: [source.update_instance_value(e, v) for e, v in zip(element_ids, values)])
+    timed("update_instance_values", lambda: source.update_instance_values(element_ids, values))
+    timed("PUT /objects/value", lambda: client.put("/objects/value", json={"elementIds": element_ids, "values": values}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark reading the history of many elements in one request.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_batch
+
+Pulls a trend of 500 tags of a generated plant, as a dashboard would, with one
+GET /objects/{elementId}/history per tag and with one POST /objects/history,
+as JSON and as NDJSON.
+"""
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from history_jobs import HistoryJobs
+from routers.objects import query
+
+TAGS = 500
+PLANT = {"sites": 2, "lines": 5, "equipment": 10, "measurements": 3, "records": 1000}
+RANGE = {"startTime": "2025-01-01T06:00:00Z", "endTime": "2025-01-01T12:00:00Z"}
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    records = func()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000:>10.1f} ms  {records:>9,} records")
+
+
+def main():
+    source = MockDataSource({"generator": PLANT})
+    tags = [i["elementId"] for i in source.get_instances() if source.store.get_series(i["elementId"])][:TAGS]
+    app = FastAPI()
+    app.include_router(query)
+    app.state.data_source = source
+    app.state.HISTORY_JOBS = HistoryJobs()
+    client = TestClient(app)
+    body = {"elementIds": tags, **RANGE}
+
+    print(f"{len(tags):,} tags")
+    timed(
+        "GET /objects/{elementId}/history each",
+        lambda: sum(len(client.get(f"/objects/{tag}/history", params=RANGE).json()) for tag in tags),
+    )
+    timed("POST /objects/history", lambda: sum(len(h) for h in client.post("/objects/history", json=body).json()))
+    timed(
+        "POST /objects/history?stream=true",
+        lambda: len(client.post("/objects/history?stream=true", json=body).text.splitlines()),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark writing historical values.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_ingest
+
+Backfills a day of one-second values for tags of a generated plant, as a
+historian migration would: 1M points through update_instance_history, merged
+into histories that already hold newer values, and 100k points through
+PUT /objects/history. Points are shuffled across tags, as they arrive from a
+collector, and each run starts from a fresh plant.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.objects import update
+
+TAGS = 100
+PLANT = {"sites": 1, "lines": 4, "equipment": 10, "measurements": 3, "records": 2}
+START = datetime(2024, 12, 31, tzinfo=timezone.utc)
+
+
+def build(points):
+    """A fresh plant and points shuffled across its float tags, older than its history"""
+    source = MockDataSource({"generator": PLANT, "history": {"capacity": 1_000_000, "max_records": 100_000_000}})
+    tags = [
+        i["elementId"]
+        for i in source.get_instances()
+        if source.store.get_series(i["elementId"]) and isinstance(source.store.get_series(i["elementId"]).latest()["value"], float)
+    ][:TAGS]
+    per_tag = points // len(tags)
+    updates = [
+        {"elementId": tag, "timestamp": (START + timedelta(seconds=s)).strftime("%Y-%m-%dT%H:%M:%SZ"), "value": float(s % 97)}
+        for s in range(per_tag)
+        for tag in tags
+    ]
+    random.Random(0).shuffle(updates)
+    return source, updates
+
+
+def timed(label, points, func):
+    start = time.perf_counter()
+    results = func()
+    elapsed = time.perf_counter() - start
+    stored = sum(1 for r in results if r["success"])
+    print(f"{label:<36} {elapsed * 1000:>9.1f} ms  {points / elapsed:>10,.0f} points/s  {stored:>9,} stored")
+
+
+def main():
+    source, updates = build(1_000_000)
+    timed("update_instance_history", len(updates), lambda: source.update_instance_history(updates))
+
+    source, updates = build(100_000)
+    app = FastAPI()
+    app.include_router(update)
+    app.state.data_source = source
+    client = TestClient(app)
+    timed("PUT /objects/history", len(updates), lambda: client.put("/objects/history", json=updates).json())
+
+
+if __name__ == "__main__":
+    main()
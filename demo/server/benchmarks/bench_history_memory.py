@@ -0,0 +1,83 @@
+"""
+Benchmark memory held per history sample.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_memory
+
+Compares the records kept as dicts (as written by the updater) with the same
+records in a columnar RecordSeries, for a scalar value and a structured one.
+Then compares a generated plant as data dicts with the same plant end to end in
+a MockDataStore, which takes the seed records out of the dicts.
+"""
+import time
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+from data_sources.mock.mock_generator import generate_plant
+from data_sources.mock.mock_store import MockDataStore
+from data_sources.mock.record_series import RecordSeries
+
+SAMPLES = 100_000
+PLANT = {"lines": 2, "equipment": 10, "records": 1000, "seed": 1}
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def scalar_record(i: int, timestamp: str):
+    return {"value": 20.0 + (i % 100) / 10, "quality": "GOOD", "timestamp": timestamp}
+
+
+def structured_record(i: int, timestamp: str):
+    return {
+        "value": {"!value": 20.0 + (i % 100) / 10, "unit": "C", "limits": [0.0, 100.0], "count": i, "Timestamp": timestamp},
+        "quality": "GOOD",
+        "timestamp": timestamp,
+    }
+
+
+def traced(func):
+    """Return what func returns and the bytes it left allocated"""
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    timestamps = [(START + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ") for i in range(SAMPLES)]
+    print(f"{SAMPLES:,} samples")
+    for label, make in (("scalar", scalar_record), ("structured", structured_record)):
+        records, dict_bytes = traced(lambda: [make(i, timestamps[i]) for i in range(SAMPLES)])
+
+        def columnar():
+            series = RecordSeries()
+            for record in records:
+                series.append(record)
+            return series
+
+        series, columnar_bytes = traced(columnar)
+        start = time.perf_counter()
+        window = series.window_records(
+            (START + timedelta(seconds=1000)).timestamp(), (START + timedelta(seconds=4599)).timestamp()
+        )
+        window_ms = (time.perf_counter() - start) * 1000
+        assert window[0] == records[4599]
+
+        print(
+            f"{label:<12} dicts {dict_bytes / SAMPLES:>7.1f} B/sample   "
+            f"columnar {columnar_bytes / SAMPLES:>6.1f} B/sample   "
+            f"1h window {window_ms:.2f} ms"
+        )
+
+    data, data_bytes = traced(lambda: generate_plant(PLANT))
+    plant_samples = sum(len(instance.get("records", [])) for instance in data["instances"])
+    del data
+    _, store_bytes = traced(lambda: MockDataStore(generate_plant(PLANT), {"capacity": PLANT["records"]}))
+    print(
+        f"{'plant':<12} dicts {data_bytes / plant_samples:>7.1f} B/sample   "
+        f"store    {store_bytes / plant_samples:>6.1f} B/sample   "
+        f"({plant_samples:,} samples)"
+    )
+
+
+if __name__ == "__main__":
+    main()
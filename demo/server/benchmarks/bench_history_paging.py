@@ -0,0 +1,64 @@
+"""
+Benchmark cursor pagination of /history and /objects.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_paging
+
+Fetches pages of 1000 at increasing depth in a 1M-record history and a 100k
+object listing. MockDataSource resumes from the cursor with a binary search
+(history) or a list position (objects); the I3XDataSource defaults, which count
+from the start for every page, are shown for comparison.
+"""
+import time
+from data_sources.data_interface import I3XDataSource, encode_cursor
+from data_sources.mock.mock_data_source import MockDataSource
+from benchmarks.bench_history_range import build_data as build_history
+from benchmarks.bench_instance_lookup import build_data as build_objects
+
+PAGE = 1000
+DEPTHS = (0, 10_000, 500_000, 990_000)
+OBJECT_DEPTHS = (0, 10_000, 90_000)
+RUNS = 5
+
+
+def timed(func):
+    """Best of RUNS, in ms"""
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def history_cursor(source, depth):
+    """The cursor the mock source hands out after depth records"""
+    if depth == 0:
+        return None
+    _, cursor = source.get_instance_history_page("sensor-0", None, None, 1, depth)
+    return cursor
+
+
+def main():
+    source = MockDataSource(data=build_history())
+    print(f"history, {PAGE} records per page")
+    for depth in DEPTHS:
+        cursor = history_cursor(source, depth)
+        position = encode_cursor(depth) if depth else None
+        mock_ms = timed(lambda: source.get_instance_history_page("sensor-0", None, None, 1, PAGE, cursor))
+        default_ms = timed(
+            lambda: I3XDataSource.get_instance_history_page(source, "sensor-0", None, None, 1, PAGE, position)
+        )
+        print(f"  after {depth:>9,}  cursor {mock_ms:>8.2f} ms   count from start {default_ms:>9.2f} ms")
+
+    source = MockDataSource(data=build_objects(100_000))
+    print(f"objects, {PAGE} per page")
+    for depth in OBJECT_DEPTHS:
+        cursor = encode_cursor(depth) if depth else None
+        mock_ms = timed(lambda: source.get_instances_page(None, PAGE, cursor))
+        default_ms = timed(lambda: I3XDataSource.get_instances_page(source, None, PAGE, cursor))
+        print(f"  after {depth:>9,}  cursor {mock_ms:>8.2f} ms   list every page  {default_ms:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark /history range queries and last known values on long record series.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_range
+
+Builds instances with 1M records each (one per second) and compares a bisected
+window query against the previous approach of parsing and scanning every record.
+Also aggregates the whole series to 500 points, as a dashboard would.
+"""
+import time
+from datetime import datetime, timezone, timedelta
+from data_sources.mock.mock_data_source import MockDataSource
+
+INSTANCES = 2
+RECORDS_PER_INSTANCE = 1_000_000
+QUERIES = 1_000
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def build_data():
+    """Build instances whose records are one second apart, most recent first like mock_data.py"""
+    timestamps = [
+        (START + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for i in range(RECORDS_PER_INSTANCE)
+    ]
+    instances = []
+    for n in range(INSTANCES):
+        records = [
+            {"value": float(i % 100), "quality": "GOOD", "timestamp": timestamps[i]}
+            for i in range(RECORDS_PER_INSTANCE - 1, -1, -1)
+        ]
+        instances.append(
+            {
+                "elementId": f"sensor-{n}",
+                "displayName": f"Sensor {n}",
+                "namespaceUri": "https://thinkiq.com/equipment",
+                "typeId": "sensor-type",
+                "parentId": "/",
+                "isComposition": False,
+                "records": records,
+            }
+        )
+    return {"namespaces": [], "objectTypes": [], "relationshipTypes": [], "instances": instances}
+
+
+def linear_window(records, start_time, end_time):
+    """The per-call parse and scan used before records were kept time ordered"""
+    start_dt = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+    end_dt = datetime.fromisoformat(end_time.replace("Z", "+00:00"))
+    return [
+        r
+        for r in records
+        if start_dt <= datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00")) <= end_dt
+    ]
+
+
+def iso(seconds: int) -> str:
+    return (START + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def main():
+    data = build_data()
+    # The store takes the records out of data, so keep a list to scan for comparison
+    records = data["instances"][0]["records"]
+    start = time.perf_counter()
+    source = MockDataSource(data=data)
+    print(f"Indexed {INSTANCES} x {RECORDS_PER_INSTANCE:,} records in {time.perf_counter() - start:.2f}s")
+
+    # One hour windows spread over the series
+    step = (RECORDS_PER_INSTANCE - 3600) // QUERIES
+    windows = [(iso(i * step), iso(i * step + 3599)) for i in range(QUERIES)]
+
+    start = time.perf_counter()
+    for start_time, end_time in windows:
+        result = source.get_instance_values_by_id("sensor-0", start_time, end_time, returnHistory=True)
+    bisect_ms = (time.perf_counter() - start) / QUERIES * 1000
+    assert len(result) == 3600
+
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        source.get_instance_values_by_id("sensor-1")
+    latest_us = (time.perf_counter() - start) / QUERIES * 1_000_000
+
+    start = time.perf_counter()
+    linear_window(records, *windows[0])
+    linear_ms = (time.perf_counter() - start) * 1000
+
+    interval = RECORDS_PER_INSTANCE / 500
+    aggregate_ms = {}
+    for aggregate in ("avg", "lttb"):
+        start = time.perf_counter()
+        points = source.get_aggregated_values_by_id("sensor-0", None, None, interval, aggregate)
+        aggregate_ms[aggregate] = (time.perf_counter() - start) * 1000
+        assert len(points) <= 501
+
+    start = time.perf_counter()
+    source.get_instance_values_by_id("sensor-0", returnHistory=True)
+    full_ms = (time.perf_counter() - start) * 1000
+
+    print(f"1h window, bisect:      {bisect_ms:10.3f} ms/query")
+    print(f"1h window, linear scan: {linear_ms:10.3f} ms/query")
+    print(f"last known value:       {latest_us:10.3f} us/query")
+    print(f"500 points, avg:        {aggregate_ms['avg']:10.3f} ms/query")
+    print(f"500 points, lttb:       {aggregate_ms['lttb']:10.3f} ms/query")
+    print(f"full series:            {full_ms:10.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
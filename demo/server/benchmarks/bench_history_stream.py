@@ -0,0 +1,100 @@
+"""
+Benchmark streaming /history as NDJSON against the JSON response.
+
+Run from demo/server:
+    python -m benchmarks.bench_history_stream
+
+Calls the /history endpoint function for the full history of an instance with
+many records and produces the response body both ways, as the server would,
+reporting the time to the first chunk, the total time and the peak traced
+allocation. (TestClient buffers whole responses, so it is not used here.)
+"""
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.objects import get_historical_values
+
+RECORDS = 200_000
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def build_data():
+    """One sensor with a record per second, most recent first like mock_data.py"""
+    records = [
+        {"value": float(i % 100), "quality": "GOOD", "timestamp": (START + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        for i in range(RECORDS - 1, -1, -1)
+    ]
+    instance = {
+        "elementId": "sensor-0",
+        "displayName": "Sensor 0",
+        "namespaceUri": "https://thinkiq.com/equipment",
+        "typeId": "sensor-type",
+        "parentId": "/",
+        "isComposition": False,
+        "records": records,
+    }
+    return {"namespaces": [], "objectTypes": [], "relationshipTypes": [], "instances": [instance]}
+
+
+def history(source, **options):
+    return get_historical_values(
+        elementId="sensor-0", startTime=None, endTime=None, maxDepth=1, interval=None,
+        aggregate=None, timeout=None, limit=None, cursor=None, data_source=source, history_jobs=None, **options,
+    )
+
+
+def json_body(source):
+    """The list response, encoded the way FastAPI does for response_model=Any"""
+    yield JSONResponse(jsonable_encoder(history(source, stream=False, accept=None))).body
+
+
+def ndjson_body(source):
+    response = history(source, stream=True, accept=None)
+
+    async def consume():
+        async for chunk in response.body_iterator:
+            yield chunk
+
+    loop = asyncio.new_event_loop()
+    chunks = consume()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.close()
+
+
+def measure(label, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_ms = None
+    size = 0
+    for chunk in body:
+        if first_ms is None:
+            first_ms = (time.perf_counter() - start) * 1000
+        size += len(chunk)
+    total_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<8} {size / 1024 / 1024:>7.1f} MiB  first chunk {first_ms:>9.1f} ms  "
+        f"total {total_ms:>9.1f} ms  peak {peak / 1024 / 1024:>7.1f} MiB"
+    )
+
+
+def main():
+    source = MockDataSource(data=build_data())
+    print(f"{RECORDS:,} records")
+    measure("json", json_body(source))
+    measure("ndjson", ndjson_body(source))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark MockDataSource lookups by elementId as the address space grows.
+
+Run from demo/server:
+    python -m benchmarks.bench_instance_lookup
+
+Lookup time per call should stay flat as the instance count grows.
+"""
+import random
+import time
+from data_sources.mock.mock_data_source import MockDataSource
+
+SIZES = [1_000, 10_000, 100_000, 250_000]
+LOOKUPS = 100_000
+
+
+def build_data(instance_count: int):
+    """Build a flat address space of sensors with one record each"""
+    instances = []
+    for i in range(instance_count):
+        instances.append(
+            {
+                "elementId": f"sensor-{i}",
+                "displayName": f"Sensor {i}",
+                "namespaceUri": "https://thinkiq.com/equipment",
+                "typeId": "sensor-type",
+                "parentId": "/",
+                "isComposition": False,
+                "relationships": {"HasParent": "/"},
+                "records": [
+                    {"value": 20.0, "quality": "GOOD", "timestamp": "2025-10-28T10:15:30Z"}
+                ],
+            }
+        )
+    return {"namespaces": [], "objectTypes": [], "relationshipTypes": [], "instances": instances}
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'instances':>10} {'build (ms)':>12} {'lookup (us)':>12}")
+    for size in SIZES:
+        data = build_data(size)
+        start = time.perf_counter()
+        source = MockDataSource(data=data)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        ids = [f"sensor-{rng.randrange(size)}" for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for element_id in ids:
+            source.get_instance_by_id(element_id)
+        lookup_us = (time.perf_counter() - start) / LOOKUPS * 1_000_000
+
+        print(f"{size:>10} {build_ms:>12.1f} {lookup_us:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
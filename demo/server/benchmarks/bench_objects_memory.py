@@ -0,0 +1,56 @@
+"""
+Benchmark memory allocated when listing objects.
+
+Run from demo/server:
+    python -m benchmarks.bench_objects_memory
+
+Measures MockDataSource.get_instances / get_all_instances, which return stored
+metadata without per-instance copies, and the full /objects endpoint.
+"""
+import time
+import tracemalloc
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.objects import explore
+from benchmarks.bench_instance_lookup import build_data
+
+INSTANCE_COUNT = 100_000
+
+
+def measure(label, func):
+    """Print time and peak traced allocation for one call of func"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed_ms:>10.1f} ms {peak / 1024 / 1024:>10.2f} MiB peak")
+
+
+def copying_get_instances(data):
+    """The per-call records-stripping copy used before metadata was stored separately"""
+    return [{k: v for k, v in i.items() if k != "records"} for i in data["instances"]]
+
+
+def main():
+    data = build_data(INSTANCE_COUNT)
+    source = MockDataSource(data=data)
+
+    app = FastAPI()
+    app.include_router(explore)
+    app.state.data_source = source
+    client = TestClient(app)
+
+    print(f"{INSTANCE_COUNT:,} instances")
+    measure("copy per instance (previous)", lambda: copying_get_instances(data))
+    measure("get_instances()", source.get_instances)
+    measure("get_instances(typeId)", lambda: source.get_instances("sensor-type"))
+    measure("get_all_instances()", source.get_all_instances)
+    measure("GET /objects", lambda: client.get("/objects"))
+    measure("GET /objects?includeMetadata=true", lambda: client.get("/objects?includeMetadata=true"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark broadcasting updates to QoS0 streams.
+
+Run from demo/server:
+    python -m benchmarks.bench_qos0_broadcast
+
+2000 QoS0 subscriptions watch one composition, as many HMI clients on one
+equipment would, and get its 30 measurements with every update.
+Updates of the tag are dispatched from a data source thread to per-stream
+queues on an event loop, as register_monitored_items sets them up, until every
+stream has read every update. Previously the update dict was queued with
+run_coroutine_threadsafe and each stream encoded it itself; now it is encoded
+once in the dispatcher and the bytes are queued with call_soon_threadsafe.
+The middle run queues with call_soon_threadsafe but still encodes per stream,
+to separate the two.
+"""
+import asyncio
+import json
+import threading
+import time
+from routers.subscriptions import Subscription, handle_data_source_update
+from subscription_registry import SubscriptionRegistry
+
+STREAMS = 2000
+UPDATES = 200
+MEASUREMENTS = 30
+TAG = "tag-0"
+
+
+def previous_stream(queue, loop):
+    """The previous QoS0 setup: dicts queued per stream, encoded by each stream"""
+
+    async def event_stream():
+        for _ in range(UPDATES):
+            update = await queue.get()
+            filtered_update = {k: v for k, v in update.items() if v is not None}
+            yield json.dumps([filtered_update]) + "\n"
+
+    def push_update_to_client(update):
+        asyncio.run_coroutine_threadsafe(queue.put(update), loop)
+
+    return event_stream, push_update_to_client
+
+
+def unshared_stream(queue, loop):
+    """Dicts queued with call_soon_threadsafe, still encoded by each stream"""
+    event_stream, _ = previous_stream(queue, loop)
+    return event_stream, lambda update: loop.call_soon_threadsafe(queue.put_nowait, update)
+
+
+def shared_stream(queue, loop):
+    """The current QoS0 setup: encoded bytes queued per stream"""
+
+    async def event_stream():
+        for _ in range(UPDATES):
+            yield await queue.get()
+
+    def push_update_to_client(data):
+        loop.call_soon_threadsafe(queue.put_nowait, data)
+
+    return event_stream, push_update_to_client
+
+
+def run(label, setup, deliver):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    remaining = [STREAMS]
+    done = threading.Event()
+    registry = SubscriptionRegistry()
+
+    async def consume(event_stream):
+        async for _ in event_stream():
+            pass
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            done.set()
+
+    for _ in range(STREAMS):
+        queue = asyncio.run_coroutine_threadsafe(_make_queue(), loop).result()
+        event_stream, handler = setup(queue, loop)
+        sub = Subscription(subscriptionId=registry.new_id(), qos="QoS0", created="2025-01-01T00:00:00Z")
+        sub.handler = handler
+        registry.add(sub.subscriptionId, sub)
+        registry.watch(sub.subscriptionId, [TAG])
+        asyncio.run_coroutine_threadsafe(consume(event_stream), loop)
+
+    start = time.perf_counter()
+    for n in range(UPDATES):
+        value = {f"measurement-{m}": {"value": float(n + m), "quality": "GOOD"} for m in range(MEASUREMENTS)}
+        deliver(registry, {"value": value, "quality": "GOOD", "timestamp": "2025-01-01T00:00:00Z"})
+    done.wait()
+    elapsed = time.perf_counter() - start
+    loop.call_soon_threadsafe(loop.stop)
+    print(f"{label:<28} {elapsed * 1000:>9.1f} ms  {STREAMS * UPDATES / elapsed:>12,.0f} deliveries/s")
+
+
+async def _make_queue():
+    return asyncio.Queue()
+
+
+def previous_deliver(registry, record):
+    """The previous dispatch: the update dict handed to each stream"""
+    update = {"elementId": TAG, **record}
+    for sub in registry.watching(TAG):
+        sub.handler(update)
+
+
+def main():
+    print(f"{STREAMS:,} QoS0 streams on one composition of {MEASUREMENTS} measurements, {UPDATES} updates")
+    run("encoded per stream", previous_stream, previous_deliver)
+    run("queued without a coroutine", unshared_stream, previous_deliver)
+    run("encoded once, shared", shared_stream, lambda registry, record: handle_data_source_update({"elementId": TAG}, record, registry, None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark expanding monitored items on subscription registration.
+
+Run from demo/server:
+    python -m benchmarks.bench_register_tree
+
+Registers every equipment of a generated site with maxDepth=0, as a site
+overview dashboard would. The previous expansion recursed once per instance,
+looked up children through a get_child_instances that scans every instance
+(the I3XDataSource default, used by sources without a parent index) and
+appended to a list with a membership check. It is compared with get_instance_trees,
+both the I3XDataSource default (one listing, indexed by parentId) and the
+mock source's parent index walk, and with the whole POST
+/subscriptions/{subscriptionId}/objects.
+"""
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.data_interface import I3XDataSource
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.subscriptions import subs
+from subscription_registry import SubscriptionRegistry
+
+PLANT = {"sites": 1, "lines": 20, "equipment": 30, "measurements": 4, "records": 2}
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    count = func()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:>9.1f} ms  {count:>7,} items")
+
+
+def previous_expansion(source, root_ids):
+    """The previous registration: recursive collection, list of monitored items"""
+
+    def collect(element_id, depth=0):
+        instance = source.get_instance_by_id(element_id)
+        if not instance:
+            return []
+        collected = [instance]
+        if instance.get("isComposition"):
+            for child in I3XDataSource.get_child_instances(source, element_id):
+                collected.extend(collect(child["elementId"], depth + 1))
+        return collected
+
+    monitored = []
+    for element_id in {i["elementId"] for root_id in root_ids for i in collect(root_id)}:
+        if element_id not in monitored:
+            monitored.append(element_id)
+    return len(monitored)
+
+
+def main():
+    source = MockDataSource({"generator": PLANT})
+    by_id = {i["elementId"]: i for i in source.get_all_instances()}
+    # Equipment are the outermost compositions; sites and lines are not expanded
+    root_ids = [
+        i["elementId"]
+        for i in by_id.values()
+        if i.get("isComposition") and not by_id.get(i.get("parentId"), {}).get("isComposition")
+    ]
+    app = FastAPI()
+    app.include_router(subs)
+    app.state.data_source = source
+    app.state.I3X_DATA_SUBSCRIPTIONS = SubscriptionRegistry()
+    client = TestClient(app)
+
+    def register():
+        subscription_id = client.post("/subscriptions", json={"qos": "QoS2"}).json()["subscriptionId"]
+        client.post(f"/subscriptions/{subscription_id}/objects", json={"elementIds": root_ids, "maxDepth": 0})
+        return len(app.state.I3X_DATA_SUBSCRIPTIONS.get(subscription_id).monitoredItems)
+
+    print(f"{len(by_id):,} instances, registering {len(root_ids):,} equipment with maxDepth=0")
+    timed("previous, scanning for children", lambda: previous_expansion(source, root_ids))
+    timed("get_instance_trees, default", lambda: len(I3XDataSource.get_instance_trees(source, root_ids, 0)))
+    timed("get_instance_trees, parent index", lambda: len(source.get_instance_trees(root_ids, 0)))
+    timed("POST /subscriptions/{id}/objects", register)
+
+
+if __name__ == "__main__":
+    main()
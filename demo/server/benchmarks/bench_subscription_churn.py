@@ -0,0 +1,78 @@
+"""
+Benchmark subscription create/sync/delete churn.
+
+Run from demo/server:
+    python -m benchmarks.bench_subscription_churn
+
+Keeps 10k live QoS2 subscriptions, as many open dashboards would, and times
+short-lived subscriptions being created, synced and deleted through the
+endpoints. The lookup and delete cost alone is compared against the list with
+a linear scan per call that subscriptions used to be kept in.
+"""
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.subscriptions import subs, Subscription
+from subscription_registry import SubscriptionRegistry
+
+LIVE = 10_000
+CYCLES = 1000
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:>9.1f} ms  {elapsed / CYCLES * 1e6:>9.1f} us/cycle")
+
+
+def subscription(subscription_id):
+    return Subscription(subscriptionId=subscription_id, qos="QoS2", created="2025-01-01T00:00:00Z")
+
+
+def list_churn(subscriptions):
+    """The previous list: ids from len(), a scan per lookup and per delete"""
+    for _ in range(CYCLES):
+        subscription_id = str(len(subscriptions))
+        subscriptions.append(subscription(subscription_id))
+        next((s for s in subscriptions if str(s.subscriptionId) == subscription_id), None)
+        index = next((i for i, s in enumerate(subscriptions) if str(s.subscriptionId) == subscription_id), None)
+        subscriptions.pop(index)
+
+
+def registry_churn(registry):
+    for _ in range(CYCLES):
+        subscription_id = registry.new_id()
+        registry.add(subscription_id, subscription(subscription_id))
+        registry.get(subscription_id)
+        registry.remove(subscription_id)
+
+
+def endpoint_churn(client):
+    for _ in range(CYCLES):
+        subscription_id = client.post("/subscriptions", json={"qos": "QoS2"}).json()["subscriptionId"]
+        client.post(f"/subscriptions/{subscription_id}/sync")
+        client.delete(f"/subscriptions/{subscription_id}")
+
+
+def main():
+    registry = SubscriptionRegistry()
+    for _ in range(LIVE):
+        subscription_id = registry.new_id()
+        registry.add(subscription_id, subscription(subscription_id))
+    app = FastAPI()
+    app.include_router(subs)
+    app.state.data_source = MockDataSource()
+    app.state.I3X_DATA_SUBSCRIPTIONS = registry
+    client = TestClient(app)
+
+    print(f"{LIVE:,} live subscriptions, {CYCLES:,} create/lookup/delete cycles")
+    subscriptions = [subscription(str(i)) for i in range(LIVE)]
+    timed("list, linear scans", lambda: list_churn(subscriptions))
+    timed("SubscriptionRegistry", lambda: registry_churn(registry))
+    timed("POST, sync, DELETE /subscriptions", lambda: endpoint_churn(client))
+
+
+if __name__ == "__main__":
+    main()
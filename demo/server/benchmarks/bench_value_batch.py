@@ -0,0 +1,41 @@
+"""
+Benchmark reading many last known values in one request.
+
+Run from demo/server:
+    python -m benchmarks.bench_value_batch
+
+Reads the values of 3000 elements of a generated plant, as an HMI screen
+refresh would, with one GET /objects/{elementId}/value per element and with
+one POST /objects/value.
+"""
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data_sources.mock.mock_data_source import MockDataSource
+from routers.objects import query
+
+ELEMENTS = 3000
+PLANT = {"sites": 4, "lines": 5, "equipment": 12, "measurements": 3, "composition_depth": 1, "records": 2}
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+def main():
+    source = MockDataSource({"generator": PLANT})
+    element_ids = [i["elementId"] for i in source.get_instances()][:ELEMENTS]
+    app = FastAPI()
+    app.include_router(query)
+    app.state.data_source = source
+    client = TestClient(app)
+
+    print(f"{len(element_ids):,} elements")
+    timed("GET /objects/{elementId}/value each", lambda: [client.get(f"/objects/{e}/value") for e in element_ids])
+    timed("POST /objects/value", lambda: client.post("/objects/value", json={"elementIds": element_ids}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,88 @@
+import base64
+import binascii
+import json
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any, Callable
+from typing import List, Optional, Dict, Any, Callable, Iterator, Tuple
 from models import Namespace, ObjectType, ObjectInstance
 
 
+def encode_cursor(state: Any) -> str:
+    """Return an opaque page cursor for JSON serializable paging state"""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Return the paging state of a cursor from encode_cursor, raising ValueError if it is malformed"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
+
+
+def decode_position_cursor(cursor: Optional[str]) -> int:
+    """Return the list position held by a cursor, 0 for the first page"""
+    if cursor is None:
+        return 0
+    position = decode_cursor(cursor)
+    if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return position
+
+
+
+def notify_updates(update_callback: Callable, changes: List[Tuple[Dict[str, Any], Any]]) -> None:
+    """Report a batch of (instance, value) changes to a data source update callback. A callback
+    with a batch method gets the whole batch, so it can share work between the changes;
+    others are called once per change."""
+    batch = getattr(update_callback, "batch", None)
+    if batch is not None:
+        batch(changes)
+    else:
+        for instance, value in changes:
+            update_callback(instance, value)
+
+
+def walk_instance_trees(
+    element_ids: List[str],
+    max_depth: int,
+    get_instance: Callable[[str], Optional[Dict[str, Any]]],
+    get_children: Callable[[str], List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """Return the instances of element_ids and their descendants, each once, expanding
+    compositions through get_children to max_depth levels below each root (0 for no limit).
+    Unknown elementIds are skipped.
+
+    The walk is iterative, so deep trees cannot overflow the stack. An instance is expanded
+    again only when reached closer to a root than before, so cyclic parent links end.
+    """
+    collected: List[Dict[str, Any]] = []
+    depths: Dict[str, int] = {}  # elementId -> shallowest depth expanded from
+    for root_id in element_ids:
+        root = get_instance(root_id)
+        if root is None:
+            continue
+        pending = [(root, 0)]
+        while pending:
+            instance, depth = pending.pop()
+            element_id = instance["elementId"]
+            previous = depths.get(element_id)
+            if previous is None:
+                collected.append(instance)
+            elif previous <= depth:
+                continue
+            depths[element_id] = depth
+            if instance.get("isComposition") and (max_depth == 0 or depth < max_depth):
+                # Without a depth limit, where an instance was reached from does not matter
+                child_depth = depth + 1 if max_depth else 0
+                children = [
+                    child
+                    for child in get_children(element_id)
+                    if depths.get(child["elementId"], child_depth + 1) > child_depth
+                ]
+                pending.extend((child, child_depth) for child in reversed(children))
+    return collected
+
+
 class I3XDataSource(ABC):
     """Abstract interface for I3X data sources"""
 
@@ -50,11 +130,52 @@ class I3XDataSource(ABC):
         """Return array of instance objects, optionally filtered by Type ElementId"""
         pass
 
+    def get_instances_page(
+        self, type_id: Optional[str], limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return up to limit instances, as get_instances, and the cursor of the next page or
+        None after the last page. The cursor holds the position in the listing.
+
+        Raises ValueError for a malformed cursor. Sources with an ordered instance listing
+        should override this; the default lists all instances for every page.
+        """
+        position = decode_position_cursor(cursor)
+        instances = self.get_instances(type_id)
+        end = position + limit
+        return instances[position:end], encode_cursor(end) if end < len(instances) else None
+
     @abstractmethod
     def get_instance_by_id(self, element_id: str) -> Optional[Dict[str, Any]]:
         """Return instance object by ElementId"""
         pass
 
+    def get_child_instances(self, element_id: str) -> List[Dict[str, Any]]:
+        """Return array of instance objects whose parentId is the requested ElementId.
+
+        Sources with a parent index should override this; the default scans get_all_instances.
+        """
+        return [
+            instance
+            for instance in self.get_all_instances()
+            if instance.get("parentId") == element_id
+        ]
+
+    def get_instance_trees(self, element_ids: List[str], maxDepth: int = 1) -> List[Dict[str, Any]]:
+        """Return the instances of element_ids and their descendants by parentId, each once, with
+        compositions expanded as maxDepth allows (0 for no limit), as subscriptions monitor them.
+        Unknown elementIds are skipped.
+
+        Sources with a parent index should override this; the default lists all instances once
+        and indexes them by parentId.
+        """
+        instances = self.get_all_instances()
+        by_id = {instance["elementId"]: instance for instance in instances}
+        children_by_parent: Dict[Any, List[Dict[str, Any]]] = {}
+        for instance in instances:
+            children_by_parent.setdefault(instance.get("parentId"), []).append(instance)
+        return walk_instance_trees(element_ids, maxDepth, by_id.get, lambda element_id: children_by_parent.get(element_id, []))
+
     @abstractmethod
     def get_instance_values_by_id(
         self,
@@ -79,6 +200,140 @@ class I3XDataSource(ABC):
         """
         pass
 
+    def get_last_known_values(
+        self, element_ids: List[str], maxDepth: int = 1
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Return the last known values of many elements, in the order of element_ids.
+
+        Each item is {"elementId", "isComposition", "value"} as for one element, or None for
+        an element that does not exist. Sources that can read many values at once should
+        override this; the default looks up each element in turn.
+        """
+        results = []
+        for element_id in element_ids:
+            instance = self.get_instance_by_id(element_id)
+            if not instance:
+                results.append(None)
+                continue
+            results.append(
+                {
+                    "elementId": element_id,
+                    "isComposition": instance.get("isComposition", False),
+                    "value": self.get_instance_values_by_id(element_id, maxDepth=maxDepth, returnHistory=False),
+                }
+            )
+        return results
+
+    def get_aggregated_values_by_id(
+        self,
+        element_id: str,
+        startTime: Optional[str],
+        endTime: Optional[str],
+        interval: float,
+        aggregate: str,
+        maxDepth: int = 1,
+    ) -> Optional[Any]:
+        """
+        Return historical values of an element aggregated into buckets of interval seconds.
+
+        Sources aggregate where the history is stored, so the full series is never built.
+        Sources without history aggregation raise NotImplementedError (the default).
+
+        Args:
+            element_id: The element to get values for
+            startTime: Optional start time for filtering
+            endTime: Optional end time for filtering
+            interval: Bucket width in seconds
+            aggregate: One of avg, min, max, first, last, count or lttb
+            maxDepth: Controls recursion through HasComponent relationships, as in get_instance_values_by_id
+        """
+        raise NotImplementedError("History aggregation is not supported by this data source")
+
+    def iter_instance_history(
+        self,
+        element_id: str,
+        startTime: Optional[str] = None,
+        endTime: Optional[str] = None,
+        maxDepth: int = 1,
+        interval: Optional[float] = None,
+        aggregate: Optional[str] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield the historical values of an element in chunks, for streaming responses.
+
+        Each record is a VQT with the elementId it belongs to. Records of an element come most
+        recent first, followed by its HasComponent children as maxDepth allows. With interval,
+        the values are aggregated as in get_aggregated_values_by_id.
+
+        Sources that can read history incrementally should override this; the default builds
+        the whole result and splits it up.
+        """
+        if interval is not None:
+            values = self.get_aggregated_values_by_id(element_id, startTime, endTime, interval, aggregate or "avg", maxDepth)
+        else:
+            values = self.get_instance_values_by_id(element_id, startTime, endTime, maxDepth, returnHistory=True)
+
+        pending = [(element_id, values)]
+        while pending:
+            current_id, current = pending.pop()
+            if isinstance(current, dict):
+                # A composition: its own values under "_value", children under their elementIds
+                children = [(k, v) for k, v in current.items() if k != "_value"]
+                pending.extend(reversed(children))
+                current = current.get("_value")
+            if isinstance(current, list) and current:
+                yield [{"elementId": current_id, **record} for record in current]
+
+    def iter_histories(
+        self,
+        element_ids: List[str],
+        startTime: Optional[str] = None,
+        endTime: Optional[str] = None,
+        maxDepth: int = 1,
+    ) -> Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+        """
+        Yield the historical values of many elements as (position in element_ids, chunk) pairs,
+        in request order, with the chunks of each element as from iter_instance_history. The
+        chunk is None for an element that does not exist.
+
+        Sources that can read many histories in one pass (one scan, one query) should override
+        this; the default reads each element in turn.
+        """
+        for position, element_id in enumerate(element_ids):
+            if not self.get_instance_by_id(element_id):
+                yield position, None
+                continue
+            for chunk in self.iter_instance_history(element_id, startTime, endTime, maxDepth):
+                yield position, chunk
+
+    def get_instance_history_page(
+        self,
+        element_id: str,
+        startTime: Optional[str],
+        endTime: Optional[str],
+        maxDepth: int,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return up to limit historical values in the order of iter_instance_history, each with
+        its elementId, and the cursor of the next page or None after the last page.
+
+        Raises ValueError for a malformed cursor. Sources that can seek in their history
+        should override this; the default counts records from the start for every page.
+        """
+        position = decode_position_cursor(cursor)
+        records: List[Dict[str, Any]] = []
+        seen = 0
+        for chunk in self.iter_instance_history(element_id, startTime, endTime, maxDepth):
+            if seen + len(chunk) > position:
+                records.extend(chunk[max(0, position - seen) :])
+                if len(records) > limit:
+                    return records[:limit], encode_cursor(position + limit)
+            seen += len(chunk)
+        return records, None
+
     @abstractmethod
     def get_related_instances(
         self, element_id: str, relationship_type: Optional[str] = None
@@ -93,6 +348,28 @@ class I3XDataSource(ABC):
         """Update values for specified element IDs"""
         pass
 
+    def update_instance_values(
+        self, element_ids: List[str], values: List[Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Write values[i] to element_ids[i] and return an UpdateResult-shaped dict per write,
+        in request order.
+
+        Sources that can apply many writes at once should override this; the default writes
+        each value in turn.
+        """
+        return [self.update_instance_value(element_id, value) for element_id, value in zip(element_ids, values)]
+
+    def update_instance_history(self, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write historical values, each a dict with elementId, timestamp and value, into the
+        history of their elements and return a HistoricalUpdateResult-shaped dict per value,
+        in request order.
+
+        Sources without history writes raise NotImplementedError (the default).
+        """
+        raise NotImplementedError("Historical value writes are not supported by this data source")
+
     @abstractmethod
     def get_all_instances(self) -> List[Dict[str, Any]]:
         """Return all instances (used by subscription worker)"""
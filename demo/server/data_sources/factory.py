@@ -35,7 +35,7 @@ class DataSourceFactory:
     def _create_single_source(data_source_type: str, data_source_config: Dict[str, Any]) -> I3XDataSource:
         """Create a single data source instance"""
         if data_source_type == "mock":
-            return MockDataSource()
+            return MockDataSource(data_source_config)
         elif data_source_type == "mqtt":
             return MQTTDataSource(data_source_config)
         else:
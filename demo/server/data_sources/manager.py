@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
 from .data_interface import I3XDataSource
 
 
@@ -114,16 +114,56 @@ class DataSourceManager(I3XDataSource):
         source = self._get_source_for_operation("get_instances")
         return source.get_instances(type_id)
 
+    def get_instances_page(self, type_id: Optional[str], limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return a page of instance objects and the cursor of the next page"""
+        source = self._get_source_for_operation("get_instances")
+        return source.get_instances_page(type_id, limit, cursor)
+
     def get_instance_by_id(self, element_id: str) -> Optional[Dict[str, Any]]:
         """Return instance object by ElementId"""
         source = self._get_source_for_operation("get_instance_by_id")
         return source.get_instance_by_id(element_id)
 
+    def get_child_instances(self, element_id: str) -> List[Dict[str, Any]]:
+        """Return array of instance objects whose parentId is the requested ElementId"""
+        source = self._get_source_for_operation("get_child_instances")
+        return source.get_child_instances(element_id)
+
+    def get_instance_trees(self, element_ids: List[str], maxDepth: int = 1) -> List[Dict[str, Any]]:
+        """Return instances and their descendants as maxDepth allows, from the source serving children"""
+        source = self._get_source_for_operation("get_child_instances")
+        return source.get_instance_trees(element_ids, maxDepth)
+
     def get_instance_values_by_id(self, element_id: str, startTime: Optional[str] = None, endTime: Optional[str] = None, maxDepth: int = 1, returnHistory: bool = False) -> Optional[Dict[str, Any]]:
         """Return instance values by ElementId. If maxDepth=0, follows HasComponent relationships infinitely. If maxDepth>1, recurses to that depth. If returnHistory is True and no time range specified, returns all historical values."""
         source = self._get_source_for_operation("get_instance_by_id")
         return source.get_instance_values_by_id(element_id, startTime, endTime, maxDepth, returnHistory)
 
+    def get_last_known_values(self, element_ids: List[str], maxDepth: int = 1) -> List[Optional[Dict[str, Any]]]:
+        """Return the last known values of many elements, from the source serving values"""
+        source = self._get_source_for_operation("get_instance_by_id")
+        return source.get_last_known_values(element_ids, maxDepth)
+
+    def get_aggregated_values_by_id(self, element_id: str, startTime: Optional[str], endTime: Optional[str], interval: float, aggregate: str, maxDepth: int = 1) -> Optional[Any]:
+        """Return historical values aggregated into buckets of interval seconds, from the source serving values"""
+        source = self._get_source_for_operation("get_instance_by_id")
+        return source.get_aggregated_values_by_id(element_id, startTime, endTime, interval, aggregate, maxDepth)
+
+    def iter_instance_history(self, element_id: str, startTime: Optional[str] = None, endTime: Optional[str] = None, maxDepth: int = 1, interval: Optional[float] = None, aggregate: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield historical values in chunks, from the source serving values"""
+        source = self._get_source_for_operation("get_instance_by_id")
+        return source.iter_instance_history(element_id, startTime, endTime, maxDepth, interval, aggregate)
+
+    def iter_histories(self, element_ids: List[str], startTime: Optional[str] = None, endTime: Optional[str] = None, maxDepth: int = 1) -> Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+        """Yield the historical values of many elements in chunks, from the source serving values"""
+        source = self._get_source_for_operation("get_instance_by_id")
+        return source.iter_histories(element_ids, startTime, endTime, maxDepth)
+
+    def get_instance_history_page(self, element_id: str, startTime: Optional[str], endTime: Optional[str], maxDepth: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return a page of historical values and the cursor of the next page, from the source serving values"""
+        source = self._get_source_for_operation("get_instance_by_id")
+        return source.get_instance_history_page(element_id, startTime, endTime, maxDepth, limit, cursor)
+
     def get_related_instances(
         self, element_id: str, relationship_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
@@ -138,6 +178,18 @@ class DataSourceManager(I3XDataSource):
         source = self._get_source_for_operation("update_instance_value")
         return source.update_instance_value(element_id, value)
 
+    def update_instance_values(
+        self, element_ids: List[str], values: List[Any]
+    ) -> List[Dict[str, Any]]:
+        """Write many values at once"""
+        source = self._get_source_for_operation("update_instance_value")
+        return source.update_instance_values(element_ids, values)
+
+    def update_instance_history(self, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Write historical values"""
+        source = self._get_source_for_operation("update_instance_value")
+        return source.update_instance_history(updates)
+
     def get_all_instances(self) -> List[Dict[str, Any]]:
         """Return all instances (used by subscription worker)"""
         # For subscriptions, we might want to aggregate from all sources
@@ -1,88 +1,64 @@
-from datetime import datetime
-from typing import List, Optional, Dict, Any, Callable
-import json
-import os
-from ..data_interface import I3XDataSource
-from .mock_data import I3X_DATA
+from typing import List, Optional, Dict, Any, Callable, Iterator, Tuple
+from ..data_interface import I3XDataSource, encode_cursor, decode_cursor, decode_position_cursor, notify_updates, walk_instance_trees
+from .mock_store import MockDataStore
+from .record_series import RecordSeries, parse_timestamp
 from .mock_updater import MockDataUpdater
 
+# Marks a cache miss, since None is a valid assembled value
+_NOT_CACHED = object()
+# Records per chunk when streaming history
+HISTORY_CHUNK_SIZE = 1000
+
 
 class MockDataSource(I3XDataSource):
     """Mock data implementation of I3XDataSource"""
 
-    def __init__(self):
-        self.data = I3X_DATA
-        self.updater = MockDataUpdater(self)
-        self.update_callback = None
-        # Cache for loaded schema files
-        self._schema_cache = {}
-
-    def _load_schema_definition(self, type_definition: Dict[str, Any]) -> Dict[str, Any]:
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ):
         """
-        Load the full type definition from the schema file referenced in type_definition.
-
         Args:
-            type_definition: Dict with elementId, displayName, namespaceUri, and schema pointer
-
-        Returns:
-            Complete type definition with schema pointer replaced by actual schema dict
+            config: Optional settings. A "generator" entry replaces mock_data.py with a
+                    synthetic plant (see mock_generator.DEFAULT_GENERATOR_CONFIG).
+                    A "simulation" entry sets update rates per type or instance
+                    (see mock_updater.DEFAULT_SIMULATION_CONFIG). A "history" entry bounds
+                    the live history kept per instance (see mock_store.DEFAULT_HISTORY_CONFIG)
+            data: Optional address space to serve instead of mock_data.py. Its store takes the
+                  records out of data["instances"] (see MockDataStore)
         """
-        schema_pointer = type_definition.get("schema", "")
-        if not schema_pointer:
-            # If no schema pointer, return metadata as-is
-            return type_definition
-
-        # If schema is already a dict (not a string pointer), return as-is
-        if isinstance(schema_pointer, dict):
-            return type_definition
-
-        # Parse schema pointer: "Namespaces/abelara.json#types/state-type"
-        if "#" not in schema_pointer:
-            return type_definition
-
-        file_path, json_pointer = schema_pointer.split("#", 1)
-
-        # Load schema file (with caching)
-        if file_path not in self._schema_cache:
-            # Construct full path relative to this file's directory
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            full_path = os.path.join(current_dir, file_path)
-
-            try:
-                with open(full_path, 'r') as f:
-                    self._schema_cache[file_path] = json.load(f)
-            except Exception as e:
-                print(f"Error loading schema file {full_path}: {e}")
-                return type_definition
-
-        schema_data = self._schema_cache[file_path]
-
-        # Navigate JSON pointer: "types/state-type" -> schema_data["types"]["state-type"]
-        pointer_parts = json_pointer.strip("/").split("/")
-        current = schema_data
-        for part in pointer_parts:
-            if isinstance(current, dict) and part in current:
-                current = current[part]
-            else:
-                print(f"Could not resolve JSON pointer {json_pointer} in {file_path}")
-                return type_definition
-
-        # Replace the schema pointer string with the actual schema definition
-        result = type_definition.copy()
-        result["schema"] = current
-
-        return result
+        self.config = config or {}
+        # Indexes over self.data, shared with other sources built on the same data or generator settings
+        generator_config = self.config.get("generator")
+        if data is not None:
+            self.store = MockDataStore.for_data(data, self.config.get("history"))
+        elif generator_config is not None:
+            self.store = MockDataStore.for_generator(generator_config, self.config.get("history"))
+        else:
+            self.store = MockDataStore.for_sample(self.config.get("history"))
+        self.data = self.store.data
+        self.updater = MockDataUpdater(self, self.config.get("simulation"))
+        self.update_callback = None
 
     def start(
         self, update_callback: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> None:
         """Initialize mock data source and start background updates"""
         self.update_callback = update_callback
+        # Sources sharing a store share one updater, so each change is simulated and reported once
+        with self.store.lock:
+            if self.store.updater is not None and self.store.updater.running:
+                return
+            self.store.updater = self.updater
         self.updater.start(self.update_callback)
 
     def stop(self) -> None:
         """Stop mock data source and cleanup background updates"""
         self.updater.stop()
+        with self.store.lock:
+            if self.store.updater is self.updater:
+                self.store.updater = None
 
     def get_namespaces(self) -> List[Dict[str, Any]]:
         return self.data["namespaces"]
@@ -90,30 +66,11 @@ class MockDataSource(I3XDataSource):
     def get_object_types(
         self, namespace_uri: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        # Filter by namespace if specified
-        type_definition_list = self.data["objectTypes"]
-        if namespace_uri:
-            type_definition_list = [
-                t
-                for t in type_definition_list
-                if t["namespaceUri"] == namespace_uri
-            ]
-
-        # Load full schema definitions for each type
-        result = []
-        for type_definition in type_definition_list:
-            full_type_def = self._load_schema_definition(type_definition)
-            result.append(full_type_def)
-
-        return result
+        # Schemas are resolved once by the store's type registry
+        return self.store.types.get_types(namespace_uri)
 
     def get_object_type_by_id(self, element_id: str) -> Optional[Dict[str, Any]]:
-        # Find the type metadata
-        for type_definition in self.data["objectTypes"]:
-            if type_definition["elementId"] == element_id:
-                # Load and return the full schema definition
-                return self._load_schema_definition(type_definition)
-        return None
+        return self.store.types.get(element_id)
 
     def get_relationship_types(
         self, namespace_uri: Optional[str] = None
@@ -134,22 +91,25 @@ class MockDataSource(I3XDataSource):
         return None
 
     def get_instances(self, type_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        instances = self.data["instances"]
-        results = []
+        # The store holds instance metadata apart from records, so no per-instance copy is needed
         if type_id:
-            for instance in instances:
-                if instance["typeId"] == type_id:
-                    results.append(instance)
-        else:
-            results = instances
+            return self.store.get_instances_by_type(type_id)
+        return self.store.get_all_instances()
+
+    def get_instances_page(
+        self, type_id: Optional[str], limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        position = decode_position_cursor(cursor)
+        instances, total = self.store.get_instances_page(type_id, position, limit)
+        end = position + limit
+        return instances, encode_cursor(end) if end < total else None
 
-        # Filter out records member from each instance before returning (unique to mock data)
-        filtered_results = []
-        for instance in results:
-            filtered_instance = {k: v for k, v in instance.items() if k != "records"}
-            filtered_results.append(filtered_instance)
+    def get_child_instances(self, element_id: str) -> List[Dict[str, Any]]:
+        return self.store.get_children(element_id)
 
-        return filtered_results
+    def get_instance_trees(self, element_ids: List[str], maxDepth: int = 1) -> List[Dict[str, Any]]:
+        # Walks the store's parent index, one children lookup per expanded instance
+        return walk_instance_trees(element_ids, maxDepth, self.store.get_instance, self.store.get_children)
 
     def get_instance_values_by_id(
         self,
@@ -159,13 +119,235 @@ class MockDataSource(I3XDataSource):
         maxDepth: int = 1,
         returnHistory: bool = False,
     ):
-        instance = self.get_instance_by_id(element_id, values=True)
+        # Last known values are cached per (elementId, maxDepth) until the element or one of
+        # its HasComponent descendants is written
+        if returnHistory or (startTime and endTime):
+            return self._assemble_values(element_id, startTime, endTime, maxDepth, returnHistory)
+        if self.store.get_instance(element_id) is None:
+            return None
+
+        cached = self.store.get_cached_value(element_id, maxDepth, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+        generation = self.store.value_generation(element_id)
+        value = self._assemble_values(element_id, startTime, endTime, maxDepth, returnHistory)
+        self.store.cache_value(element_id, maxDepth, value, generation)
+        return value
+
+    def get_last_known_values(
+        self, element_ids: List[str], maxDepth: int = 1
+    ) -> List[Optional[Dict[str, Any]]]:
+        # One lock acquisition for the batch, so the values are a consistent snapshot and a
+        # repeated elementId is assembled once
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        with self.store.lock:
+            for element_id in element_ids:
+                if element_id in results:
+                    continue
+                instance = self.store.get_instance(element_id)
+                results[element_id] = None if instance is None else {
+                    "elementId": element_id,
+                    "isComposition": instance.get("isComposition", False),
+                    "value": self.get_instance_values_by_id(element_id, maxDepth=maxDepth),
+                }
+        return [results[element_id] for element_id in element_ids]
+
+    def get_aggregated_values_by_id(
+        self,
+        element_id: str,
+        startTime: Optional[str],
+        endTime: Optional[str],
+        interval: float,
+        aggregate: str,
+        maxDepth: int = 1,
+    ):
+        # Buckets are reduced over the RecordSeries columns; only the buckets become records
+        return self._assemble_values(
+            element_id, startTime, endTime, maxDepth, True, (interval, aggregate)
+        )
+
+    def iter_instance_history(
+        self,
+        element_id: str,
+        startTime: Optional[str] = None,
+        endTime: Optional[str] = None,
+        maxDepth: int = 1,
+        interval: Optional[float] = None,
+        aggregate: Optional[str] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        # Pages through each RecordSeries, holding the store lock for one chunk at a time
+        start = parse_timestamp(startTime) if startTime and endTime else float("-inf")
+        end = parse_timestamp(endTime) if startTime and endTime else float("inf")
+        for path in self._history_elements(element_id, maxDepth):
+            current_id = path[-1]
+            series = self.store.get_series(current_id)
+            if not series:
+                continue
+            if interval is not None:
+                records = self._process_records(series, startTime, endTime, True, (interval, aggregate or "avg"))
+                for i in range(0, len(records), HISTORY_CHUNK_SIZE):
+                    yield [{"elementId": current_id, **r} for r in records[i : i + HISTORY_CHUNK_SIZE]]
+                continue
+            cursor = None
+            while True:
+                with self.store.lock:
+                    records, cursor = series.page(start, end, HISTORY_CHUNK_SIZE, cursor)
+                chunk = self._history_chunk(current_id, records)
+                if chunk:
+                    yield chunk
+                if cursor is None:
+                    break
+
+    def iter_histories(
+        self,
+        element_ids: List[str],
+        startTime: Optional[str] = None,
+        endTime: Optional[str] = None,
+        maxDepth: int = 1,
+    ) -> Iterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+        # Reads as many series as fit in a chunk under one lock acquisition, so a batch of short
+        # histories is read in one pass as a consistent snapshot, and yields them after releasing it
+        start = parse_timestamp(startTime) if startTime and endTime else float("-inf")
+        end = parse_timestamp(endTime) if startTime and endTime else float("inf")
+
+        def elements():
+            for position, element_id in enumerate(element_ids):
+                if self.store.get_instance(element_id) is None:
+                    yield position, None
+                    continue
+                for path in self._history_elements(element_id, maxDepth):
+                    yield position, path[-1]
+
+        pending = elements()
+        current = next(pending, None)
+        cursor = None
+        while current is not None:
+            ready = []
+            filled = 0
+            with self.store.lock:
+                while current is not None and filled < HISTORY_CHUNK_SIZE:
+                    position, current_id = current
+                    series = self.store.get_series(current_id) if current_id is not None else None
+                    if current_id is None:
+                        ready.append((position, None))
+                    elif series:
+                        records, cursor = series.page(start, end, HISTORY_CHUNK_SIZE - filled, cursor)
+                        filled += len(records)
+                        chunk = self._history_chunk(current_id, records)
+                        if chunk:
+                            ready.append((position, chunk))
+                        if cursor is not None:
+                            continue
+                    current = next(pending, None)
+                    cursor = None
+            yield from ready
+
+    def get_instance_history_page(
+        self,
+        element_id: str,
+        startTime: Optional[str],
+        endTime: Optional[str],
+        maxDepth: int,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # The cursor holds the HasComponent path to the element being read and the (time, skip)
+        # position in its RecordSeries, so a page resumes with a binary search
+        start = parse_timestamp(startTime) if startTime and endTime else float("-inf")
+        end = parse_timestamp(endTime) if startTime and endTime else float("inf")
+        path, position = (element_id,), None
+        if cursor is not None:
+            state = decode_cursor(cursor)
+            try:
+                path, position = tuple(state[0]), state[1]
+                if position is not None:
+                    position = (int(position[0]), int(position[1]))
+            except (TypeError, ValueError, IndexError, KeyError) as e:
+                raise ValueError(f"Invalid cursor '{cursor}'") from e
+
+        records: List[Dict[str, Any]] = []
+        elements = self._history_elements(element_id, maxDepth, path)
+        for current_path in elements:
+            series = self.store.get_series(current_path[-1])
+            while series and len(records) < limit:
+                with self.store.lock:
+                    rows, position = series.page(start, end, limit - len(records), position)
+                records.extend(self._history_chunk(current_path[-1], rows))
+                if position is None:
+                    break
+            if len(records) >= limit:
+                if position is None:
+                    current_path = next(elements, None)
+                return records, None if current_path is None else encode_cursor([list(current_path), position])
+            position = None
+        return records, None
+
+    @staticmethod
+    def _history_chunk(element_id: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Tag the records that have a value with their elementId, as VQTs"""
+        return [
+            {"elementId": element_id, "value": r["value"], "quality": r.get("quality"), "timestamp": r.get("timestamp")}
+            for r in records
+            if "value" in r
+        ]
+
+    def _history_elements(
+        self, element_id: str, maxDepth: int, resume: Optional[Tuple[str, ...]] = None
+    ) -> Iterator[Tuple[str, ...]]:
+        """Yield the HasComponent path from element_id to each element whose history is read,
+        depth first in the order _assemble_values builds values, as maxDepth allows.
+
+        resume is the path of the element to start from; the elements before it are not
+        visited, so resuming costs one children lookup per level. Raises ValueError if the
+        path is not in the tree.
+        """
+        def expands(level: int) -> bool:
+            return maxDepth == 0 or maxDepth - level > 1
+
+        def composed_of(instance_id: str) -> List[str]:
+            instance = self.store.get_instance(instance_id)
+            children = instance.get("relationships", {}).get("HasComponent", []) if instance else []
+            return [children] if isinstance(children, str) else children
+
+        pending = [(element_id,)]
+        if resume is not None and resume != (element_id,):
+            if not resume or resume[0] != element_id:
+                raise ValueError(f"Invalid cursor path {list(resume)}")
+            pending = []
+            for level in range(len(resume) - 1):
+                children = composed_of(resume[level])
+                if not expands(level) or resume[level + 1] not in children:
+                    raise ValueError(f"Invalid cursor path {list(resume)}")
+                later = children[children.index(resume[level + 1]) + 1 :]
+                pending.extend(resume[: level + 1] + (child_id,) for child_id in reversed(later))
+            pending.append(resume)
+
+        while pending:
+            path = pending.pop()
+            if self.store.get_instance(path[-1]) is None:
+                continue
+            if expands(len(path) - 1):
+                pending.extend(path + (child_id,) for child_id in reversed(composed_of(path[-1])))
+            yield path
+
+    def _assemble_values(
+        self,
+        element_id: str,
+        startTime: Optional[str],
+        endTime: Optional[str],
+        maxDepth: int,
+        returnHistory: bool,
+        aggregation: Optional[Tuple[float, str]] = None,
+    ):
+        """Build the value of an element, recursing into HasComponent children as maxDepth allows.
+        aggregation is an optional (interval, aggregate) applied to the history."""
+        instance = self.store.get_instance(element_id)
 
         if not instance:
             return None
 
-        # Get the records array
-        records_array = instance.get("records")
+        # Get the time ordered records
+        series = self.store.get_series(element_id)
 
         # Check if this element has HasComponent relationships (is a composition)
         relationships = instance.get("relationships", {})
@@ -184,9 +366,9 @@ class MockDataSource(I3XDataSource):
             result = {}
 
             # Include this element's own value if it has records
-            if records_array and isinstance(records_array, list):
+            if series:
                 # Process this element's records
-                own_value = self._process_records(records_array, startTime, endTime, returnHistory)
+                own_value = self._process_records(series, startTime, endTime, returnHistory, aggregation)
                 if own_value is not None:
                     result["_value"] = own_value
 
@@ -196,13 +378,18 @@ class MockDataSource(I3XDataSource):
             # Recursively fetch each composed child's value
             # Always include composed children, even if they have no value
             for child_id in composed_of:
-                child_value = self.get_instance_values_by_id(
-                    child_id,
-                    startTime,
-                    endTime,
-                    next_depth,
-                    returnHistory
-                )
+                if aggregation:
+                    child_value = self._assemble_values(
+                        child_id, startTime, endTime, next_depth, returnHistory, aggregation
+                    )
+                else:
+                    child_value = self.get_instance_values_by_id(
+                        child_id,
+                        startTime,
+                        endTime,
+                        next_depth,
+                        returnHistory
+                    )
                 # Always include the child in the result
                 # Use null/empty dict as placeholder if no value
                 result[child_id] = child_value if child_value is not None else {}
@@ -210,7 +397,7 @@ class MockDataSource(I3XDataSource):
             return result
 
         # If no records and no HasComponent relationships, return None
-        if not records_array or not isinstance(records_array, list):
+        if not series:
             # For composition elements with children but maxDepth=1 (no recursion),
             # return empty object to indicate there's a structure but it wasn't expanded
             if composed_of:
@@ -218,49 +405,37 @@ class MockDataSource(I3XDataSource):
             return None
 
         # No recursion needed, just process and return the records
-        return self._process_records(records_array, startTime, endTime, returnHistory)
+        return self._process_records(series, startTime, endTime, returnHistory, aggregation)
 
-    def _process_records(self, records_array, startTime, endTime, returnHistory):
-        """Helper method to process records array and return value with metadata"""
+    def _process_records(self, series: RecordSeries, startTime, endTime, returnHistory, aggregation=None):
+        """Helper method to process an instance's records and return value with metadata"""
         returned_records = None
 
-        # Filter based on time range
-        if startTime and endTime:
-            # Parse time strings to datetime objects for comparison
-            start_dt = datetime.fromisoformat(startTime.replace("Z", "+00:00"))
-            end_dt = datetime.fromisoformat(endTime.replace("Z", "+00:00"))
-
-            # Filter records array to only include items within time range
-            filtered_records = []
-            for record in records_array:
-                if "timestamp" in record:
-                    value_dt = datetime.fromisoformat(
-                        record["timestamp"].replace("Z", "+00:00")
-                    )
-                    if start_dt <= value_dt <= end_dt:
-                        filtered_records.append(record)
-
-            returned_records = filtered_records
-        else:
-            # No time range specified
-            if returnHistory:
-                # Return all historical values for /history endpoint
-                returned_records = records_array
+        # The series' columns are rewritten in place by writers, so read under the store lock
+        with self.store.lock:
+            if aggregation:
+                # One record per bucket, within the time range if given
+                interval, aggregate = aggregation
+                returned_records = series.aggregate(
+                    parse_timestamp(startTime) if startTime else None,
+                    parse_timestamp(endTime) if endTime else None,
+                    interval,
+                    aggregate,
+                )
+            # Filter based on time range
+            elif startTime and endTime:
+                # Records are time ordered, so the range is found by bisection
+                returned_records = series.window_records(
+                    parse_timestamp(startTime), parse_timestamp(endTime)
+                )
             else:
-                # Return only most recent value for /value endpoint
-                most_recent = None
-                most_recent_dt = None
-
-                for record in records_array:
-                    if "timestamp" in record:
-                        value_dt = datetime.fromisoformat(
-                            record["timestamp"].replace("Z", "+00:00")
-                        )
-                        if most_recent_dt is None or value_dt > most_recent_dt:
-                            most_recent_dt = value_dt
-                            most_recent = record
-
-                returned_records = most_recent
+                # No time range specified
+                if returnHistory:
+                    # Return all historical values for /history endpoint
+                    returned_records = series.all()
+                else:
+                    # Return only most recent value for /value endpoint
+                    returned_records = series.latest()
 
         # Extract the value(s) from the records
         if isinstance(returned_records, list):
@@ -277,194 +452,198 @@ class MockDataSource(I3XDataSource):
         else:
             return None
 
-    def _handle_no_recurse(self, instance, records_array, startTime, endTime, returnHistory):
+    def _handle_no_recurse(self, instance, series, startTime, endTime, returnHistory):
         """Handle the case when recurseDepth == 0"""
         # If no records, return None
-        if not records_array or not isinstance(records_array, list):
+        if not series:
             return None
 
         # Process and return the records
-        return self._process_records(records_array, startTime, endTime, returnHistory)
-
-    def get_instance_by_id(
-        self, element_id: str, values: bool = False
-    ) -> Optional[Dict[str, Any]]:
-        for instance in self.data["instances"]:
-            if instance["elementId"] == element_id:
-                if values:
-                    # Return instance with records included
-                    return instance
-                else:
-                    # Filter out records member from each instance before returning (unique to mock data)
-                    filtered_instance = {
-                        k: v for k, v in instance.items() if k != "records"
-                    }
-                    return filtered_instance
-        return None
+        return self._process_records(series, startTime, endTime, returnHistory)
+
+    def get_instance_by_id(self, element_id: str) -> Optional[Dict[str, Any]]:
+        # Records are held by the store's RecordSeries, not on the instance
+        return self.store.get_instance(element_id)
 
     def get_related_instances(
         self, element_id: str, relationship_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        related_objects = []
-
-        # Get the source instance directly from data (not filtered) to preserve relationships
-        source_instance = None
-        for instance in self.data["instances"]:
-            if instance["elementId"] == element_id:
-                source_instance = instance
-                break
-
-        if not source_instance:
-            return related_objects
-
-        # Check if instance has explicit relationship metadata
-        relationships_metadata = source_instance.get("relationships", {})
+        if self.store.get_instance(element_id) is None:
+            return []
 
+        # The store's relationship graph holds declared and inverse (reverseOf) edges.
         # If no relationship_type specified, return all related instances
-        if relationship_type is None:
-            # Collect all related IDs from all relationships
-            all_related_ids = set()
-            for rel_type, related_ids in relationships_metadata.items():
-                if isinstance(related_ids, list):
-                    all_related_ids.update(related_ids)
-                elif isinstance(related_ids, str):
-                    all_related_ids.add(related_ids)
-
-            # Get all related instances
-            related_objects = [
-                i for i in self.data["instances"] if i["elementId"] in all_related_ids
-            ]
-        else:
-            # Look for the specific relationship type (case-insensitive match)
-            matching_key = None
-            for key in relationships_metadata.keys():
-                if key.lower() == relationship_type.lower():
-                    matching_key = key
-                    break
-
-            if matching_key:
-                # Return instances based on explicit relationship declarations
-                related_ids = relationships_metadata[matching_key]
-                if isinstance(related_ids, list):
-                    # Get instances directly from data for list of IDs
-                    related_objects = [
-                        i for i in self.data["instances"] if i["elementId"] in related_ids
-                    ]
-                else:
-                    # Handle single ID case - get directly from data
-                    for instance in self.data["instances"]:
-                        if instance["elementId"] == related_ids:
-                            related_objects = [instance]
-                            break
-            # Fallback: Handle non-hierarchical relationships dynamically
-            else:
-                related_objects = self._process_non_hierarchical_relations(
-                    element_id, relationship_type.lower()
-                )
-
-        # Filter out records member from each instance before returning (unique to mock data)
-        filtered_results = []
-        for instance in related_objects:
-            filtered_instance = {k: v for k, v in instance.items() if k != "records"}
-            filtered_results.append(filtered_instance)
-
-        return filtered_results
-
-    def _process_non_hierarchical_relations(
-        self, element_id: str, relationship_type: str
-    ) -> List[Dict[str, Any]]:
-        """Fallback for dynamically determining relationships not found in metadata"""
-        # This method can be extended in the future for semantic pattern matching
-        # For now, return empty list since relationships should be explicit
-        return []
+        related_ids = self.store.get_related_ids(element_id, relationship_type)
+        return self._resolve_instances(related_ids)
+
+    def _resolve_instances(self, element_ids) -> List[Dict[str, Any]]:
+        """Look up instances for a collection of elementIds, skipping unknown ids"""
+        resolved = []
+        for related_id in element_ids:
+            instance = self.store.get_instance(related_id)
+            if instance is not None:
+                resolved.append(instance)
+        return resolved
 
     def update_instance_value(
         self, element_id: str, value: Any
     ) -> Dict[str, Any]:
-        from datetime import datetime, timezone
+        return self.update_instance_values([element_id], [value])[0]
 
-        # Note this is a hack for now as the code below can handle multiple updates but for now we just want one
-        element_ids = [element_id]
-        values = [value]
+    def update_instance_values(
+        self, element_ids: List[str], values: List[Any]
+    ) -> List[Dict[str, Any]]:
+        from datetime import datetime, timezone
 
+        # One timestamp, one lock acquisition and one history append for the batch; subscribers
+        # are notified after the lock is released
+        current_timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
         results = []
-        for element_id, value in zip(element_ids, values):
-            instance = self.get_instance_by_id(element_id, values=True)
-            if not instance:
-                results.append(
-                    {
-                        "elementId": element_id,
-                        "success": False,
-                        "message": "Element not found",
-                    }
-                )
-                continue
+        writes = []
+        with self.store.lock:
+            # The latest record per element, including earlier writes of this batch
+            latest: Dict[str, Dict[str, Any]] = {}
+            for element_id, value in zip(element_ids, values):
+                instance = self.store.get_instance(element_id)
+                if not instance:
+                    results.append(
+                        {
+                            "elementId": element_id,
+                            "success": False,
+                            "message": "Element not found",
+                        }
+                    )
+                    continue
+
+                try:
+                    current_record = latest.get(element_id)
+                    if current_record is None:
+                        series = self.store.get_series(element_id)
+                        current_record = series.latest() if series else None
+                    if current_record is None:
+                        raise Exception("Element has no value to update")
+                    record = self._write_record(current_record, value, current_timestamp)
+                    latest[element_id] = record
+                    writes.append((element_id, record))
+
+                    results.append(
+                        {
+                            "elementId": element_id,
+                            "success": True,
+                            "message": "Updated successfully",
+                        }
+                    )
+                except Exception as e:
+                    results.append(
+                        {
+                            "elementId": element_id,
+                            "success": False,
+                            "message": f"Update failed: {str(e)}",
+                        }
+                    )
+            self.store.append_records(writes)
+            self.store.update_instance_fields(list(latest), {"timestamp": current_timestamp})
+
+        if self.update_callback:
+            notify_updates(self.update_callback, [(self.store.get_instance(element_id), record) for element_id, record in writes])
+        return results
+
+    def update_instance_history(self, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Values are checked against each element's latest record, then merged into the
+        # history per element under one lock acquisition
+        results: List[Optional[Dict[str, Any]]] = [None] * len(updates)
+        indexes_by_element: Dict[str, List[int]] = {}
+        for index, update in enumerate(updates):
+            indexes_by_element.setdefault(update["elementId"], []).append(index)
+
+        def fail(index: int, message: str) -> None:
+            update = updates[index]
+            results[index] = {"elementId": update["elementId"], "timestamp": update["timestamp"], "success": False, "message": message}
+
+        records_by_element: Dict[str, List[Dict[str, Any]]] = {}
+        accepted_by_element: Dict[str, List[int]] = {}
+        with self.store.lock:
+            for element_id, indexes in indexes_by_element.items():
+                series = self.store.get_series(element_id)
+                current_record = series.latest() if series else None
+                if self.store.get_instance(element_id) is None or current_record is None:
+                    message = "Element not found" if self.store.get_instance(element_id) is None else "Element has no value to update"
+                    for index in indexes:
+                        fail(index, message)
+                    continue
+                records, accepted = [], []
+                for index in indexes:
+                    try:
+                        records.append(self._write_record(current_record, updates[index]["value"], updates[index]["timestamp"]))
+                        accepted.append(index)
+                    except Exception as e:
+                        fail(index, f"Update failed: {str(e)}")
+                if records:
+                    records_by_element[element_id] = records
+                    accepted_by_element[element_id] = accepted
+            retained = self.store.merge_records(records_by_element)
+
+        for element_id, accepted in accepted_by_element.items():
+            for index, kept in zip(accepted, retained[element_id].tolist()):
+                if kept:
+                    update = updates[index]
+                    results[index] = {"elementId": element_id, "timestamp": update["timestamp"], "success": True, "message": "Updated successfully"}
+                elif not self._valid_timestamp(updates[index]["timestamp"]):
+                    fail(index, "Invalid timestamp")
+                else:
+                    fail(index, "Older than the history retained for the element")
+        return results
+
+    @staticmethod
+    def _valid_timestamp(timestamp: Optional[str]) -> bool:
+        try:
+            return parse_timestamp(timestamp) != float("-inf")
+        except (TypeError, ValueError):
+            return False
+
+    def _write_record(self, current_record: Dict[str, Any], value: Any, current_timestamp: str) -> Dict[str, Any]:
+        """Return the record written for value, coerced to the schema of the current record"""
+        # Validate the write schema matches the instance schema
+        # Now records have structure: {value: {...}, quality: "...", timestamp: "..."}
+        current_value = current_record["value"]
+        coerced_value = value
+        if type(value) is type(current_value) and not isinstance(value, (dict, list)):
+            # Same primitive type, nothing to check or coerce
+            value_schema = instance_schema = None
+        else:
+            value_schema = self._get_schema(value)
+            instance_schema = self._get_schema(current_value)
+
+        # Try to coerce value to match instance schema for primitive types
+        if value_schema != instance_schema:
+            # Attempt type coercion for numeric types
+            if instance_schema == "int" and value_schema in ["str", "float"]:
+                try:
+                    coerced_value = int(float(value))
+                except (ValueError, TypeError):
+                    raise Exception(f"Cannot coerce value to int: {value}")
+            elif instance_schema == "float" and value_schema in ["str", "int"]:
+                try:
+                    coerced_value = float(value)
+                except (ValueError, TypeError):
+                    raise Exception(f"Cannot coerce value to float: {value}")
+            elif instance_schema == "str" and value_schema in ["int", "float"]:
+                coerced_value = str(value)
+            else:
+                raise Exception(f"Value schema ({value_schema}) does not match instance schema ({instance_schema})")
 
-            try:
-                # Validate the write schema matches the instance schema
-                # Now records have structure: {value: {...}, quality: "...", timestamp: "..."}
-                current_value = instance["records"][0]["value"]
-                value_schema = self._get_schema(value)
-                instance_schema = self._get_schema(current_value)
-
-                print(f"Value schema: {value_schema}")
-                print(f"Instance schema: {instance_schema}")
-
-                # Try to coerce value to match instance schema for primitive types
-                coerced_value = value
-                if value_schema != instance_schema:
-                    # Attempt type coercion for numeric types
-                    if instance_schema == "int" and value_schema in ["str", "float"]:
-                        try:
-                            coerced_value = int(float(value))
-                            print(f"Coerced {value} ({value_schema}) to int")
-                        except (ValueError, TypeError):
-                            raise Exception(f"Cannot coerce value to int: {value}")
-                    elif instance_schema == "float" and value_schema in ["str", "int"]:
-                        try:
-                            coerced_value = float(value)
-                            print(f"Coerced {value} ({value_schema}) to float")
-                        except (ValueError, TypeError):
-                            raise Exception(f"Cannot coerce value to float: {value}")
-                    elif instance_schema == "str" and value_schema in ["int", "float"]:
-                        coerced_value = str(value)
-                        print(f"Coerced {value} ({value_schema}) to str")
-                    else:
-                        raise Exception(f"Value schema ({value_schema}) does not match instance schema ({instance_schema})")
-
-                # Update the value and timestamp in the record
-                current_timestamp = datetime.now(timezone.utc).strftime(
-                    "%Y-%m-%dT%H:%M:%SZ"
-                )
-                instance["records"][0]["value"] = coerced_value
-                instance["records"][0]["timestamp"] = current_timestamp
-
-                # Also update timestamp inside value if it exists
-                if isinstance(coerced_value, dict):
-                    if "Timestamp" in coerced_value:
-                        instance["records"][0]["value"]["Timestamp"] = current_timestamp
-                    elif "timestamp" in coerced_value:
-                        instance["records"][0]["value"]["timestamp"] = current_timestamp
-
-                instance["timestamp"] = current_timestamp
-
-                results.append(
-                    {
-                        "elementId": element_id,
-                        "success": True,
-                        "message": "Updated successfully",
-                    }
-                )
-            except Exception as e:
-                results.append(
-                    {
-                        "elementId": element_id,
-                        "success": False,
-                        "message": f"Update failed: {str(e)}",
-                    }
-                )
+        # Update the value and timestamp in the record
+        record = dict(current_record)
+        record["value"] = coerced_value
+        record["timestamp"] = current_timestamp
 
-        return results[0]
+        # Also update timestamp inside value if it exists
+        if isinstance(coerced_value, dict):
+            if "Timestamp" in coerced_value:
+                record["value"]["Timestamp"] = current_timestamp
+            elif "timestamp" in coerced_value:
+                record["value"]["timestamp"] = current_timestamp
+        return record
 
     def _get_schema(self, obj):
         """Helper to get the schema for dictionaries"""
@@ -478,9 +657,4 @@ class MockDataSource(I3XDataSource):
             return type(obj).__name__
 
     def get_all_instances(self) -> List[Dict[str, Any]]:
-        # Filter out records member from each instance before returning (unique to mock data)
-        filtered_results = []
-        for instance in self.data["instances"]:
-            filtered_instance = {k: v for k, v in instance.items() if k != "records"}
-            filtered_results.append(filtered_instance)
-        return filtered_results
+        return self.store.get_all_instances()
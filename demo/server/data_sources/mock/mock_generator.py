@@ -0,0 +1,202 @@
+import copy
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Callable
+from .mock_data import I3X_DATA
+
+ISA95_NAMESPACE = "https://isa.org/isa95"
+ABELARA_NAMESPACE = "https://abelara.com/equipment"
+THINKIQ_NAMESPACE = "https://thinkiq.com/equipment"
+
+# Defaults for data_sources.<name>.config.generator
+DEFAULT_GENERATOR_CONFIG = {
+    "sites": 1,  # ISA95 work centers attached to the root
+    "lines": 2,  # work centers per site
+    "equipment": 5,  # work units per line
+    "measurements": 2,  # children per measurements group
+    "composition_depth": 1,  # nested measurements groups under each work unit
+    "sensors": 1,  # sensors monitoring each work unit
+    "relationship_fanout": 1,  # SuppliesTo edges from each work unit to the next ones on its line
+    "records": 10,  # records per instance with values
+    "record_interval": 60,  # seconds between records
+    "start_time": "2025-01-01T00:00:00+00:00",  # timestamp of the oldest record
+    "seed": 0,
+}
+
+STATES = [
+    (1, "Operating", "Equipment operating normally", "#00FF00"),
+    (2, "Idle", "Equipment idle", "#808080"),
+    (3, "Starved", "Equipment starved", "#FFFF00"),
+    (4, "Fault", "Equipment faulted", "#FF0000"),
+    (5, "Maintenance", "Equipment under maintenance", "#800080"),
+]
+
+
+class _PlantBuilder:
+    """Builds instances and records for generate_plant"""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.rng = random.Random(settings["seed"])
+        self.instances: List[Dict[str, Any]] = []
+        start = datetime.fromisoformat(settings["start_time"].replace("Z", "+00:00"))
+        interval = timedelta(seconds=settings["record_interval"])
+        # Most recent first, the order used by mock_data.py
+        self.timestamps = [
+            (start + interval * i).isoformat()
+            for i in range(settings["records"] - 1, -1, -1)
+        ]
+
+    def add(
+        self,
+        element_id: str,
+        display_name: str,
+        type_id: str,
+        namespace_uri: str,
+        parent_id: str,
+        is_composition: bool,
+        relationships: Dict[str, Any],
+        payload: Optional[Callable[[str], Any]] = None,
+    ) -> Dict[str, Any]:
+        instance = {
+            "elementId": element_id,
+            "displayName": display_name,
+            "namespaceUri": namespace_uri,
+            "typeId": type_id,
+            "parentId": parent_id,
+            "isComposition": is_composition,
+            "relationships": relationships,
+        }
+        if payload is not None:
+            instance["records"] = [
+                {"value": payload(timestamp), "quality": "GOOD", "timestamp": timestamp}
+                for timestamp in self.timestamps
+            ]
+        self.instances.append(instance)
+        return instance
+
+    # Payload shapes for the types in Namespaces/*.json
+
+    def state_payload(self, asset_id: int, asset_name: str) -> Callable[[str], Any]:
+        def payload(timestamp: str) -> Dict[str, Any]:
+            state_id, name, description, color = self.rng.choice(STATES)
+            return {
+                "timestamp": timestamp,
+                "description": description,
+                "color": color,
+                "type": {"id": state_id, "name": name, "description": description},
+                "metadata": {
+                    "source": "plc-controller",
+                    "uri": f"opc://plc{asset_id}/DB1.DBW0",
+                    "asset": {"id": asset_id, "name": asset_name, "description": asset_name},
+                },
+            }
+
+        return payload
+
+    def measurement_payload(self) -> Callable[[str], Any]:
+        tolerance = round(self.rng.uniform(1.0, 10.0), 1)
+        return lambda timestamp: {"inTolerance": self.rng.random() > 0.1, "tolerance": tolerance}
+
+    def number_payload(self, low: float, high: float) -> Callable[[str], Any]:
+        base = self.rng.uniform(low, high)
+        return lambda timestamp: round(base * self.rng.uniform(0.9, 1.1), 2)
+
+    def health_payload(self) -> Callable[[str], Any]:
+        return lambda timestamp: self.rng.randint(0, 100)
+
+
+def generate_plant(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate a mock address space of sites x lines x equipment.
+
+    Each work unit is composed of a state and a tree of measurements groups
+    (composition_depth levels, measurements children each) ending in measurements with a
+    value and health child. Work units supply the next relationship_fanout units on their
+    line and are monitored by sensors. The same config (including seed) always produces
+    the same data.
+
+    Args:
+        config: Generator settings, see DEFAULT_GENERATOR_CONFIG
+
+    Returns:
+        Data in the shape of mock_data.I3X_DATA, with the same namespaces and types
+    """
+    settings = {**DEFAULT_GENERATOR_CONFIG, **config}
+    builder = _PlantBuilder(settings)
+    asset_counter = 0
+
+    def add_measurements_group(group_id: str, parent_id: str, level: int) -> None:
+        children = [f"{group_id}-{k}" for k in range(settings["measurements"])]
+        builder.add(
+            group_id, group_id, "measurements-type", ABELARA_NAMESPACE, parent_id, True,
+            {"ComponentOf": parent_id, "HasComponent": children},
+        )
+        for child_id in children:
+            if level < settings["composition_depth"]:
+                add_measurements_group(child_id, group_id, level + 1)
+                continue
+            value_id, health_id = f"{child_id}-value", f"{child_id}-health"
+            builder.add(
+                child_id, child_id, "measurement-type", ABELARA_NAMESPACE, group_id, True,
+                {"ComponentOf": group_id, "HasComponent": [value_id, health_id]},
+                builder.measurement_payload(),
+            )
+            builder.add(
+                value_id, value_id, "measurement-value-type", ABELARA_NAMESPACE, child_id, False,
+                {"ComponentOf": child_id}, builder.number_payload(20.0, 120.0),
+            )
+            builder.add(
+                health_id, health_id, "measurement-health-type", ABELARA_NAMESPACE, child_id, False,
+                {"ComponentOf": child_id}, builder.health_payload(),
+            )
+
+    site_ids = [f"site-{s}" for s in range(settings["sites"])]
+    for site_id in site_ids:
+        line_ids = [f"{site_id}-line-{l}" for l in range(settings["lines"])]
+        builder.add(
+            site_id, site_id, "work-center-type", ISA95_NAMESPACE, "/", False,
+            {"HasParent": "/", "HasChildren": line_ids},
+        )
+        for line_id in line_ids:
+            equipment_ids = [f"{line_id}-eq-{e}" for e in range(settings["equipment"])]
+            builder.add(
+                line_id, line_id, "work-center-type", ISA95_NAMESPACE, site_id, False,
+                {"HasParent": site_id, "HasChildren": equipment_ids},
+            )
+            for index, equipment_id in enumerate(equipment_ids):
+                asset_counter += 1
+                state_id = f"{equipment_id}-state"
+                measurements_id = f"{equipment_id}-measurements"
+                sensor_ids = [f"{equipment_id}-sensor-{k}" for k in range(settings["sensors"])]
+                supplies_to = equipment_ids[index + 1 : index + 1 + settings["relationship_fanout"]]
+
+                relationships = {
+                    "HasParent": line_id,
+                    "HasComponent": [state_id, measurements_id],
+                    "HasChildren": sensor_ids,
+                }
+                if supplies_to:
+                    relationships["SuppliesTo"] = supplies_to
+                builder.add(
+                    equipment_id, equipment_id, "work-unit-type", ISA95_NAMESPACE, line_id, True,
+                    relationships,
+                )
+                builder.add(
+                    state_id, f"{equipment_id} State", "state-type", ABELARA_NAMESPACE, equipment_id, False,
+                    {"ComponentOf": equipment_id}, builder.state_payload(asset_counter, equipment_id),
+                )
+                add_measurements_group(measurements_id, equipment_id, 1)
+                for sensor_id in sensor_ids:
+                    builder.add(
+                        sensor_id, sensor_id, "sensor-type", THINKIQ_NAMESPACE, equipment_id, False,
+                        {"HasParent": equipment_id, "Monitors": equipment_id},
+                        builder.number_payload(0.0, 100.0),
+                    )
+
+    return {
+        "namespaces": copy.deepcopy(I3X_DATA["namespaces"]),
+        "objectTypes": copy.deepcopy(I3X_DATA["objectTypes"]),
+        "relationshipTypes": copy.deepcopy(I3X_DATA["relationshipTypes"]),
+        "instances": builder.instances,
+    }
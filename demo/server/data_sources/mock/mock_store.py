@@ -0,0 +1,442 @@
+import copy
+import json
+import os
+import threading
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from .mock_data import I3X_DATA
+from .mock_generator import DEFAULT_GENERATOR_CONFIG, generate_plant
+from .record_series import RecordSeries
+from .type_registry import TypeRegistry
+
+# Defaults for data_sources.<name>.config.history
+DEFAULT_HISTORY_CONFIG = {
+    "capacity": 10_000,  # most records kept per instance
+    "window": None,  # seconds of history kept before each instance's latest record, None for no limit
+    "max_records": 10_000_000,  # most records kept over all instances
+    "audit_log": None,  # JSON lines file that history writes are also logged to, None for memory only
+    "audit_entries": 10_000,  # most recent audit log entries kept in memory
+}
+
+
+class MockDataStore:
+    """In-memory indexes over the mock address space
+
+    Several MockDataSource instances may be created over the same data dict (see the
+    multi-source configuration), so stores are shared per data dict. Writes made through
+    one source are then visible through all of them, as they were before indexing. Generated
+    plants, and the copy of mock_data.py served by default, are shared the same way.
+
+    Instance metadata and records are held separately: data["instances"] is read once when the
+    store is built, the store keeps a metadata dict (without "records") per instance and a
+    RecordSeries per instance with records. The records are taken out of data["instances"] then,
+    so each sample is held once, in its series; a store built later over the same dict finds no
+    records. Read methods return the stored metadata dicts without copying, so callers must
+    treat them as read-only.
+    """
+
+    # Stores live as long as a source uses them; a live store keeps its data (and so its id) alive
+    _shared_stores: "weakref.WeakValueDictionary[int, MockDataStore]" = weakref.WeakValueDictionary()
+    # What data was built from (canonical generator settings, or the sample data) -> its store
+    _built_stores: "weakref.WeakValueDictionary[str, MockDataStore]" = weakref.WeakValueDictionary()
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def for_generator(cls, config: Dict[str, Any], history: Optional[Dict[str, Any]] = None) -> "MockDataStore":
+        """Return the store for the plant generated from config, generating it on first use with the
+        given history limits. The same settings (seed and sizes) always generate the same plant, so
+        sources configured alike share one plant, store and updater."""
+        key = json.dumps({**DEFAULT_GENERATOR_CONFIG, **config}, sort_keys=True)
+        return cls._for_built(key, lambda: generate_plant(config), history)
+
+    @classmethod
+    def for_sample(cls, history: Optional[Dict[str, Any]] = None) -> "MockDataStore":
+        """Return the store for a copy of mock_data.I3X_DATA, copied on first use with the given history
+        limits. The store takes the records out of its data, so I3X_DATA itself is left whole."""
+        return cls._for_built("mock_data", lambda: copy.deepcopy(I3X_DATA), history)
+
+    @classmethod
+    def _for_built(cls, key: str, build, history: Optional[Dict[str, Any]]) -> "MockDataStore":
+        with cls._shared_lock:
+            store = cls._built_stores.get(key)
+            if store is None:
+                store = cls(build(), history)
+                cls._built_stores[key] = store
+                cls._shared_stores[id(store.data)] = store
+            return store
+
+    @classmethod
+    def for_data(cls, data: Dict[str, Any], history: Optional[Dict[str, Any]] = None) -> "MockDataStore":
+        """Return the store for a data dict, building it on first use with the given history limits"""
+        with cls._shared_lock:
+            store = cls._shared_stores.get(id(data))
+            if store is None or store.data is not data:
+                store = cls(data, history)
+                cls._shared_stores[id(data)] = store
+            return store
+
+    def __init__(self, data: Dict[str, Any], history: Optional[Dict[str, Any]] = None):
+        self.data = data
+        # Guards writes to the data and indexes; reads rely on atomic dict lookups
+        self.lock = threading.RLock()
+        # elementId -> instance metadata
+        self.instances_by_id: Dict[str, Dict[str, Any]] = {}
+        # Secondary indexes map a key to {elementId: instance}, an insertion ordered set
+        self.instances_by_type: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.children_by_parent: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # typeId (None for all) -> instance list, for paging by position; cleared when instances are
+        # added or replaced. Metadata written by update_instance_fields is swapped in at its position.
+        self.listings: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self.listing_positions: Dict[Optional[str], Dict[str, int]] = {}
+
+        # Relationship graph: elementId -> lower-cased relationship type -> {related elementId: edge count}.
+        # Every declared edge is stored with its reverseOf edge on the target, so inverse
+        # relationships are answered without being written on both instances. Counts let an
+        # edge declared on both sides survive when one side is removed.
+        self.reverse_of: Dict[str, Optional[str]] = {
+            rt["elementId"]: rt.get("reverseOf") for rt in data["relationshipTypes"]
+        }
+        self.relations: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+        # elementId -> time ordered records, for instances that have records. Each series is a
+        # ring bounded by the per-instance capacity and window, and by an even share of max_records.
+        self.history = {**DEFAULT_HISTORY_CONFIG, **(history or {})}
+        self.series: Dict[str, RecordSeries] = {}
+        self.series_capacity: Optional[int] = None
+        # The latest history writes, oldest dropped first; entries are never changed. The
+        # audit_log file, if any, keeps them all and is appended to outside the store lock.
+        self.audit_log: "deque[Dict[str, Any]]" = deque(maxlen=self.history["audit_entries"])
+        self._audit_file_lock = threading.Lock()
+
+        # Assembled last known values: elementId -> maxDepth -> value. A write invalidates the
+        # written element and its HasComponent ancestors, bumping their generation so a value
+        # assembled while the write happened is not cached. A maxDepth reaching below the
+        # element's deepest component is cached as 0, so clients cannot grow the cache with
+        # arbitrary depths.
+        self.value_cache: Dict[str, Dict[int, Any]] = {}
+        # elementId -> levels of HasComponent descendants below it; cleared when instances change
+        self.component_heights: Dict[str, float] = {}
+        self.value_generations: Dict[str, int] = {}
+        self.cache_epoch = 0
+
+        # The MockDataUpdater simulating this data; sources sharing the store share one updater
+        self.updater = None
+
+        for instance in data["instances"]:
+            # The series holds the records from here on, so they are not also kept as dicts
+            self._index_instance(self._metadata(instance), instance.pop("records", None))
+        self._apply_history_limits()
+
+        # Object types with schema pointers resolved against the Namespaces files next to this module
+        self.types = TypeRegistry(data["objectTypes"], os.path.dirname(os.path.abspath(__file__)))
+
+    @staticmethod
+    def _metadata(instance: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the instance without its records member (unique to mock data)"""
+        return {k: v for k, v in instance.items() if k != "records"}
+
+    def _index_instance(self, instance: Dict[str, Any], records: Optional[List[Dict[str, Any]]] = None) -> None:
+        element_id = instance["elementId"]
+        self._clear_listings()
+        self.instances_by_id[element_id] = instance
+        self.instances_by_type.setdefault(instance.get("typeId"), {})[element_id] = instance
+        self.children_by_parent.setdefault(instance.get("parentId"), {})[element_id] = instance
+        if isinstance(records, list):
+            self.series[element_id] = self._new_series(records)
+        self._link_edges(instance)
+
+    def _replace_instance(self, existing: Dict[str, Any], instance: Dict[str, Any]) -> None:
+        """Index instance in place of existing, the metadata of the same elementId. Reassigning an
+        existing key keeps the instance's position in each index; existing itself is left unchanged."""
+        element_id = instance["elementId"]
+        self._clear_listings()
+        self.instances_by_id[element_id] = instance
+        for index, field in ((self.instances_by_type, "typeId"), (self.children_by_parent, "parentId")):
+            if existing.get(field) != instance.get(field):
+                index.get(existing.get(field), {}).pop(element_id, None)
+            index.setdefault(instance.get(field), {})[element_id] = instance
+        self._unlink_edges(existing)
+        self._link_edges(instance)
+
+    def _link_edges(self, instance: Dict[str, Any]) -> None:
+        element_id = instance["elementId"]
+        for relationship_type, target_id in self._declared_edges(instance):
+            self._add_edge(element_id, relationship_type, target_id)
+            reverse = self.reverse_of.get(relationship_type)
+            if reverse:
+                self._add_edge(target_id, reverse, element_id)
+
+    def _unlink_edges(self, instance: Dict[str, Any]) -> None:
+        element_id = instance["elementId"]
+        for relationship_type, target_id in self._declared_edges(instance):
+            self._remove_edge(element_id, relationship_type, target_id)
+            reverse = self.reverse_of.get(relationship_type)
+            if reverse:
+                self._remove_edge(target_id, reverse, element_id)
+
+    @staticmethod
+    def _declared_edges(instance: Dict[str, Any]):
+        """Yield (relationship type, target elementId) for the relationships declared on an instance"""
+        for relationship_type, target_ids in instance.get("relationships", {}).items():
+            if isinstance(target_ids, str):
+                target_ids = [target_ids]
+            for target_id in target_ids:
+                yield relationship_type, target_id
+
+    def _add_edge(self, source_id: str, relationship_type: str, target_id: str) -> None:
+        targets = self.relations.setdefault(source_id, {}).setdefault(relationship_type.lower(), {})
+        targets[target_id] = targets.get(target_id, 0) + 1
+
+    def _remove_edge(self, source_id: str, relationship_type: str, target_id: str) -> None:
+        edges = self.relations.get(source_id, {})
+        targets = edges.get(relationship_type.lower(), {})
+        if target_id not in targets:
+            return
+        targets[target_id] -= 1
+        if targets[target_id] <= 0:
+            del targets[target_id]
+            if not targets:
+                del edges[relationship_type.lower()]
+
+    def update_instance_fields(self, element_ids: List[str], fields: Dict[str, Any]) -> None:
+        """Set fields on the metadata of instances. Readers use the metadata dicts without the
+        lock, so each is replaced by an updated copy rather than changed in place."""
+        with self.lock:
+            for element_id in element_ids:
+                current = self.instances_by_id.get(element_id)
+                if current is None:
+                    continue
+                instance = {**current, **fields}
+                # Reassigning an existing key keeps the instance's position in each index
+                self.instances_by_id[element_id] = instance
+                self.instances_by_type[instance.get("typeId")][element_id] = instance
+                self.children_by_parent[instance.get("parentId")][element_id] = instance
+                # Writes never change which instances are listed or their order
+                for type_id in (None, instance.get("typeId")):
+                    listing = self.listings.get(type_id)
+                    if listing is not None:
+                        listing[self.listing_positions[type_id][element_id]] = instance
+
+    def _clear_listings(self) -> None:
+        self.listings.clear()
+        self.listing_positions.clear()
+
+    def get_instance(self, element_id: str) -> Optional[Dict[str, Any]]:
+        """Return the instance metadata for an elementId"""
+        return self.instances_by_id.get(element_id)
+
+    def get_all_instances(self) -> List[Dict[str, Any]]:
+        """Return the metadata of every instance"""
+        return list(self.instances_by_id.values())
+
+    def get_instances_by_type(self, type_id: str) -> List[Dict[str, Any]]:
+        """Return the metadata of the instances of a type"""
+        return list(self.instances_by_type.get(type_id, {}).values())
+
+    def get_instances_page(
+        self, type_id: Optional[str], position: int, limit: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Return the instances (of a type, or all) from position on, at most limit, and the total count"""
+        listing = self.listings.get(type_id)
+        if listing is None:
+            with self.lock:
+                listing = self.get_instances_by_type(type_id) if type_id else self.get_all_instances()
+                self.listing_positions[type_id] = {instance["elementId"]: i for i, instance in enumerate(listing)}
+                self.listings[type_id] = listing
+        return listing[position : position + limit], len(listing)
+
+    def get_children(self, parent_id: str) -> List[Dict[str, Any]]:
+        """Return the metadata of the instances whose parentId is parent_id"""
+        return list(self.children_by_parent.get(parent_id, {}).values())
+
+    def get_related_ids(
+        self, element_id: str, relationship_type: Optional[str] = None
+    ) -> List[str]:
+        """Return elementIds related to element_id, in both directions, optionally for one relationship type (case-insensitive)"""
+        edges = self.relations.get(element_id, {})
+        if relationship_type is not None:
+            return list(edges.get(relationship_type.lower(), {}))
+        related_ids = {}
+        for targets in edges.values():
+            related_ids.update(targets)
+        return list(related_ids)
+
+    def get_series(self, element_id: str) -> Optional[RecordSeries]:
+        """Return the time ordered records of an instance, or None if it has no records"""
+        return self.series.get(element_id)
+
+    def _new_series(self, records: Optional[List[Dict[str, Any]]] = None) -> RecordSeries:
+        return RecordSeries(records or (), self.series_capacity, self.history["window"])
+
+    def _apply_history_limits(self) -> None:
+        """Share max_records evenly between the series, within the per-instance capacity"""
+        capacity = self.history["capacity"]
+        max_records = self.history["max_records"]
+        if max_records is not None:
+            share = max(1, max_records // max(1, len(self.series)))
+            capacity = share if capacity is None else min(capacity, share)
+        self.series_capacity = None if capacity is None else max(1, capacity)
+        for series in self.series.values():
+            series.capacity = self.series_capacity
+
+    def append_record(self, element_id: str, record: Dict[str, Any]) -> None:
+        """Append a record to the live history of an instance"""
+        self.append_records([(element_id, record)])
+
+    def append_records(self, writes: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Append records to the live history of many instances under one lock acquisition"""
+        with self.lock:
+            added = False
+            for element_id, record in writes:
+                series = self.series.get(element_id)
+                if series is None:
+                    series = self.series[element_id] = self._new_series()
+                    added = True
+                series.append(record)
+            if added:
+                self._apply_history_limits()
+            self.invalidate_values_many([element_id for element_id, _ in writes])
+
+    def merge_records(self, records_by_element: Dict[str, List[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+        """Merge records into the history of many instances, in time order, under one lock
+        acquisition, and log the write to the audit log. Returns whether each record is
+        retained within the history limits, per instance."""
+        with self.lock:
+            added = False
+            for element_id in records_by_element:
+                if element_id not in self.series:
+                    self.series[element_id] = self._new_series()
+                    added = True
+            if added:
+                self._apply_history_limits()
+            retained = {
+                element_id: self.series[element_id].merge(records)
+                for element_id, records in records_by_element.items()
+            }
+            self.invalidate_values_many(list(records_by_element))
+        logged_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        self.log_audit(
+            [
+                {
+                    "loggedAt": logged_at,
+                    "operation": "history",
+                    "elementId": element_id,
+                    "records": len(records),
+                    "retained": int(retained[element_id].sum()),
+                }
+                for element_id, records in records_by_element.items()
+            ]
+        )
+        return retained
+
+    def log_audit(self, entries: List[Dict[str, Any]]) -> None:
+        """Append entries to the audit log, and to the audit_log file if configured. The file
+        is written under its own lock, so readers and writers of the store do not wait on it."""
+        with self.lock:
+            self.audit_log.extend(entries)
+        path = self.history["audit_log"]
+        if path:
+            with self._audit_file_lock:
+                try:
+                    with open(path, "a") as f:
+                        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+                except OSError as e:
+                    print(f"Failed to write audit log {path}: {e}")
+
+    def get_cached_value(self, element_id: str, max_depth: int, default: Any = None) -> Any:
+        """Return the assembled last known value cached for (element_id, max_depth)"""
+        return self.value_cache.get(element_id, {}).get(self._cache_depth(element_id, max_depth), default)
+
+    def _cache_depth(self, element_id: str, max_depth: int) -> int:
+        """Return the maxDepth a value is cached under: 0 if max_depth reaches every component"""
+        if max_depth != 0 and max_depth > self.component_height(element_id):
+            return 0
+        return max_depth
+
+    def component_height(self, element_id: str) -> float:
+        """Return the levels of HasComponent descendants below element_id, 0 for an element
+        without components, or infinity if its components form a cycle. A component id without an
+        instance counts as a level, as values list it (empty) once maxDepth reaches it."""
+        heights = self.component_heights
+        height = heights.get(element_id)
+        if height is not None:
+            return height
+        # Under the lock, so the heights are not cleared by add_instance meanwhile
+        with self.lock:
+            entered = set()
+            stack = [element_id]
+            while stack:
+                current = stack[-1]
+                if current in heights:
+                    stack.pop()
+                    continue
+                instance = self.instances_by_id.get(current)
+                children = instance.get("relationships", {}).get("HasComponent", []) if instance else []
+                if isinstance(children, str):
+                    children = [children]
+                if current not in entered:
+                    entered.add(current)
+                    pending = [child for child in children if child not in heights]
+                    # An entered element without a height is on the path to current
+                    if not any(child in entered for child in pending):
+                        stack.extend(pending)
+                        continue
+                    heights[current] = float("inf")
+                else:
+                    heights[current] = 1 + max((heights[child] for child in children), default=-1)
+                stack.pop()
+            return heights[element_id]
+
+    def value_generation(self, element_id: str) -> Tuple[int, int]:
+        """Return a token that changes whenever the cached values of element_id are invalidated"""
+        return self.cache_epoch, self.value_generations.get(element_id, 0)
+
+    def cache_value(self, element_id: str, max_depth: int, value: Any, generation: Tuple[int, int]) -> None:
+        """Cache an assembled value, unless element_id was invalidated since generation was read"""
+        with self.lock:
+            if self.value_generation(element_id) == generation:
+                self.value_cache.setdefault(element_id, {})[self._cache_depth(element_id, max_depth)] = value
+
+    def invalidate_values(self, element_id: str) -> None:
+        """Drop cached values of element_id and every element it is a component of"""
+        self.invalidate_values_many([element_id])
+
+    def invalidate_values_many(self, element_ids: List[str]) -> None:
+        """Drop cached values of the element_ids and their ancestors, visiting shared ancestors once"""
+        with self.lock:
+            pending = list(element_ids)
+            visited = set()
+            while pending:
+                current = pending.pop()
+                if current in visited:
+                    continue
+                visited.add(current)
+                self.value_cache.pop(current, None)
+                self.value_generations[current] = self.value_generations.get(current, 0) + 1
+                pending.extend(self.relations.get(current, {}).get("componentof", {}))
+
+    def _clear_value_cache(self) -> None:
+        self.cache_epoch += 1
+        self.value_cache.clear()
+        self.component_heights.clear()
+
+    def add_instance(self, instance: Dict[str, Any]) -> None:
+        """Add an instance, or replace the existing instance with the same elementId. A replaced
+        instance keeps its position in listings, and its history unless the new one has records."""
+        with self.lock:
+            # The composition may change, so every assembled value is stale
+            self._clear_value_cache()
+            metadata = self._metadata(instance)
+            records = instance.get("records")
+            existing = self.instances_by_id.get(metadata["elementId"])
+            if existing is None:
+                self._index_instance(metadata, records)
+            else:
+                # Readers use the existing dict without the lock, so it is replaced rather than changed
+                self._replace_instance(existing, metadata)
+                if isinstance(records, list):
+                    self.series[metadata["elementId"]] = self._new_series(records)
+            self._apply_history_limits()
@@ -1,18 +1,176 @@
+import heapq
 import threading
 import time
-import random
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any, Callable
+from typing import List, Optional, Dict, Any, Callable, Tuple
+import numpy as np
+from ..data_interface import notify_updates
+
+
+def _numeric_leaves(value: Any, path: Tuple = ()):
+    """Yield (path, number) for every int/float leaf in a record value (booleans excluded)"""
+    if isinstance(value, bool):
+        return
+    if isinstance(value, (int, float)):
+        yield path, value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from _numeric_leaves(v, path + (k,))
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from _numeric_leaves(v, path + (i,))
+
+
+def _clone_containers(value: Any) -> Any:
+    """Copy the dicts and lists of a value; leaves are immutable and shared"""
+    if isinstance(value, dict):
+        return {k: _clone_containers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone_containers(v) for v in value]
+    return value
+
+
+# Defaults for data_sources.<name>.config.simulation
+DEFAULT_SIMULATION_CONFIG = {
+    "interval": 1.0,  # seconds between updates of a tag
+    "change_probability": 1.0,  # chance that an instance changes when its tags are due
+    "types": {},  # typeId -> {"interval": ..., "change_probability": ...}
+    "instances": {},  # elementId -> {"interval": ..., "change_probability": ...}, overrides types
+}
+
+
+class _RateGroup:
+    """Simulated instances that share an update interval and change probability"""
+
+    def __init__(self, interval: float, change_probability: float):
+        self.interval = interval
+        self.change_probability = change_probability
+        self._owners: List[int] = []
+        self._leaves: List[int] = []
+        self._counts: List[int] = []
+
+    def add(self, owner: int, first_leaf: int, leaf_count: int) -> None:
+        self._owners.append(owner)
+        self._leaves.extend(range(first_leaf, first_leaf + leaf_count))
+        self._counts.append(leaf_count)
+
+    def finish(self) -> None:
+        self.owners = np.array(self._owners, dtype=np.int64)
+        self.leaves = np.array(self._leaves, dtype=np.int64)
+        self.counts = np.array(self._counts, dtype=np.int64)
+        del self._owners, self._leaves, self._counts
+
+    def pick_leaves(self, rng: np.random.Generator) -> np.ndarray:
+        """Leaves of the instances chosen to change this time, drawn per instance"""
+        if self.change_probability >= 1.0:
+            return self.leaves
+        chosen = rng.random(len(self.owners)) < self.change_probability
+        return self.leaves[np.repeat(chosen, self.counts)]
+
+
+class _CompiledLeaves:
+    """Numeric leaves of the latest record of every simulated instance
+
+    Leaves are stored instance by instance, so the leaves of one instance are contiguous.
+    Instances are grouped by their (interval, change_probability) rate. Each instance keeps
+    the version of its RecordSeries the leaves were read from or last written at, and, once
+    the updater has written its latest record, the series columns of its leaves, so later
+    writes go straight into the columns.
+    """
+
+    def __init__(self):
+        self.element_ids: List[str] = []
+        self.series: List[Any] = []
+        self.versions: List[int] = []
+        self.first_leaves: List[int] = []  # index of each instance's first leaf
+        self.paths: List[Tuple] = []
+        self.groups: Dict[Tuple[float, float], _RateGroup] = {}
+        owners, values, is_int = [], [], []
+        self._columns = (owners, values, is_int)
+
+    def add(self, instance: Dict[str, Any], series, record: Dict[str, Any], rate: Tuple[float, float]) -> None:
+        leaves = list(_numeric_leaves(record["value"]))
+        if not leaves:
+            return
+        owners, values, is_int = self._columns
+        index = len(self.element_ids)
+        group = self.groups.get(rate)
+        if group is None:
+            group = self.groups[rate] = _RateGroup(*rate)
+        group.add(index, len(self.paths), len(leaves))
+        self.element_ids.append(instance["elementId"])
+        self.series.append(series)
+        self.versions.append(series.version)
+        self.first_leaves.append(len(self.paths))
+        for path, value in leaves:
+            self.paths.append(path)
+            owners.append(index)
+            values.append(float(value))
+            is_int.append(isinstance(value, int))
+
+    def finish(self) -> None:
+        owners, values, is_int = self._columns
+        self.owners = np.array(owners, dtype=np.int64)
+        self.values = np.array(values, dtype=np.float64)
+        self.is_int = np.array(is_int, dtype=bool)
+        # Series column of each leaf, -1 until the updater has written the instance's latest record
+        self.columns = np.full(len(self.paths), -1, dtype=np.int64)
+        self.first_leaves.append(len(self.paths))
+        for group in self.groups.values():
+            group.finish()
+        del self._columns
+
+    def leaves_of(self, owner: int) -> range:
+        return range(self.first_leaves[owner], self.first_leaves[owner + 1])
+
+    def refresh(self, owner: int, series) -> bool:
+        """Reread the leaves of an instance whose series was written by someone else. Returns
+        False if its latest record no longer has the same numeric leaf paths."""
+        record = series.latest() if series is not None else None
+        if not isinstance(record, dict) or "value" not in record:
+            return False
+        leaves = self.leaves_of(owner)
+        found = list(_numeric_leaves(record["value"]))
+        if [path for path, _ in found] != self.paths[leaves.start : leaves.stop]:
+            return False
+        self.values[leaves.start : leaves.stop] = [float(value) for _, value in found]
+        self.is_int[leaves.start : leaves.stop] = [isinstance(value, int) for _, value in found]
+        self.columns[leaves.start : leaves.stop] = -1
+        self.series[owner] = series
+        self.versions[owner] = series.version
+        return True
 
 
 class MockDataUpdater:
-    """Handles random value generation for mock data source to simulate real-time updates"""
+    """Handles random value generation for mock data source to simulate real-time updates
 
-    def __init__(self, data_source):
+    The numeric leaf paths of every non-static instance's latest record are compiled once
+    into NumPy arrays, grouped by update rate. A timer heap holds the next due time of each
+    rate group, and the thread sleeps until the earliest one, so tags that are not due cost
+    nothing. Due groups are perturbed in one vectorized step and only the instances whose
+    values changed are written back, straight into the columns of their RecordSeries. A
+    client write to a simulated instance makes its compiled leaves stale; they are reread
+    after the tick, and everything is recompiled only if the instance's leaves changed shape.
+    """
+
+    def __init__(self, data_source, simulation: Optional[Dict[str, Any]] = None, seed: Optional[int] = None):
+        """
+        Args:
+            data_source: The MockDataSource whose store is updated
+            simulation: Optional update rates (see DEFAULT_SIMULATION_CONFIG)
+            seed: Optional seed for reproducible updates
+        """
         self.data_source = data_source
+        self.simulation = {**DEFAULT_SIMULATION_CONFIG, **(simulation or {})}
         self.running = False
         self.thread = None
         self.update_callback = None
+        self.rng = np.random.default_rng(seed)
+        self._compiled: Optional[_CompiledLeaves] = None
+        self._stop_event = threading.Event()
+        # (due time, rate) entries, one per scheduled rate group
+        self._schedule: List[Tuple[float, Tuple[float, float]]] = []
+        self._scheduled = set()
 
     def start(self, update_callback: Optional[Callable] = None):
         """Start the background thread that generates random updates"""
@@ -21,93 +179,193 @@ class MockDataUpdater:
 
         self.update_callback = update_callback
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._update_loop, daemon=True)
         self.thread.start()
 
     def stop(self):
         """Stop the background update thread"""
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join()
 
     def _update_loop(self):
-        """Main loop that generates random updates"""
+        """Main loop that wakes up only when a rate group is due"""
         while self.running:
-            # Get all instances with records (directly from data, not through get_all_instances which filters out records)
-            instances = self.data_source.data["instances"]
+            if self._compiled is None:
+                self.compile()
+            now = time.monotonic()
+            due = self.pop_due(now)
+            if due:
+                self.update_once(due)
+                continue
+            timeout = self._schedule[0][0] - now if self._schedule else DEFAULT_SIMULATION_CONFIG["interval"]
+            self._stop_event.wait(timeout)
 
-            # Generate random updates for non-static instances
-            for instance in instances:
-                # Skip instances with "static" flag set to True
-                if instance.get("static", False):
-                    continue
+    def rate_for(self, instance: Dict[str, Any]) -> Tuple[float, float]:
+        """The (interval, change_probability) of an instance: its own entry, then its type's, then the default"""
+        settings = self.simulation["instances"].get(instance["elementId"])
+        if settings is None:
+            settings = self.simulation["types"].get(instance.get("typeId"), {})
+        interval = float(settings.get("interval", self.simulation["interval"]))
+        change_probability = float(settings.get("change_probability", self.simulation["change_probability"]))
+        if interval <= 0:
+            print(f"Invalid simulation interval {interval} for {instance['elementId']}, using the default")
+            interval = float(self.simulation["interval"])
+        return interval, min(max(change_probability, 0.0), 1.0)
 
-                # Check if instance has a records array
-                records_array = instance.get("records")
-                if (
-                    not records_array
-                    or not isinstance(records_array, list)
-                    or len(records_array) == 0
-                ):
-                    continue
+    def compile(self) -> _CompiledLeaves:
+        """Collect the numeric leaves of the latest record of every non-static instance"""
+        store = self.data_source.store
+        compiled = _CompiledLeaves()
+        for instance in store.get_all_instances():
+            # Skip instances with "static" flag set to True
+            if instance.get("static", False):
+                continue
+            series = store.get_series(instance["elementId"])
+            record = series.latest() if series else None
+            # Skip if record doesn't have the expected structure
+            if not isinstance(record, dict) or "value" not in record:
+                continue
+            compiled.add(instance, series, record, self.rate_for(instance))
+        compiled.finish()
+        self._compiled = compiled
+
+        # Schedule rate groups that are new; existing ones keep their due time
+        now = time.monotonic()
+        for rate in compiled.groups:
+            if rate not in self._scheduled:
+                self._scheduled.add(rate)
+                heapq.heappush(self._schedule, (now + rate[0], rate))
+        return compiled
 
-                # Get the most recent record (first element in array)
-                current_record = records_array[0]
+    def pop_due(self, now: float) -> List[Tuple[float, float]]:
+        """Pop the rate groups due at now and schedule their next update"""
+        due = []
+        groups = self._compiled.groups if self._compiled else {}
+        while self._schedule and self._schedule[0][0] <= now:
+            due_time, rate = heapq.heappop(self._schedule)
+            if rate not in groups:
+                # No instances have this rate anymore
+                self._scheduled.discard(rate)
+                continue
+            due.append(rate)
+            # Keep the cadence, but do not replay updates missed while falling behind
+            next_time = due_time + rate[0]
+            heapq.heappush(self._schedule, (next_time if next_time > now else now + rate[0], rate))
+        return due
 
-                # Skip if record doesn't have the expected structure
-                if not isinstance(current_record, dict) or "value" not in current_record:
+    def update_once(self, rates: Optional[List[Tuple[float, float]]] = None) -> int:
+        """Perturb the numeric leaves of the given rate groups (all by default) by up to +/-10% and write back changed instances. Returns the number of changed instances."""
+        compiled = self._compiled or self.compile()
+        groups = compiled.groups.values() if rates is None else [compiled.groups[r] for r in rates if r in compiled.groups]
+        picked = [group.pick_leaves(self.rng) for group in groups]
+        if not picked:
+            return 0
+        # Groups are disjoint, so sorting keeps the leaves of one instance contiguous
+        leaves = np.sort(np.concatenate(picked))
+        if not len(leaves):
+            return 0
+
+        # One vectorized step for the due leaves; ints are truncated like int() would
+        old_values = compiled.values[leaves]
+        new_values = old_values + old_values * self.rng.uniform(-0.1, 0.1, len(old_values))
+        is_int = compiled.is_int[leaves]
+        new_values[is_int] = np.trunc(new_values[is_int])
+        changed_mask = new_values != old_values
+        changed = leaves[changed_mask]
+        if not len(changed):
+            return 0
+        compiled.values[changed] = new_values[changed_mask]
+
+        store = self.data_source.store
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        changed_owners = compiled.owners[changed].tolist()
+        changed_values = new_values[changed_mask].tolist()
+        changed_columns = compiled.columns[changed].tolist()
+        changed_leaves = changed.tolist()
+        changed_is_int = is_int[changed_mask].tolist()
+
+        written = []
+        stale = []
+        changes = []
+        # Check and write under the store lock, so a client write cannot come in between
+        with store.lock:
+            position = 0
+            while position < len(changed_leaves):
+                owner = changed_owners[position]
+                end = position
+                while end < len(changed_leaves) and changed_owners[end] == owner:
+                    end += 1
+
+                series = store.get_series(compiled.element_ids[owner])
+                if series is not compiled.series[owner] or series.version != compiled.versions[owner]:
+                    # Written by someone else since compiling; pick up the new value after the tick
+                    stale.append(owner)
+                    position = end
                     continue
 
-                # Make a copy to detect changes
-                old_record = current_record.copy()
-
-                # Randomize numeric values in the current record's value
-                # Handle both primitive values and complex objects
-                if isinstance(current_record["value"], (int, float)):
-                    # For primitive numeric values, randomize directly
-                    v = current_record["value"]
-                    variation = v * 0.1
-                    new_val = v + random.uniform(-variation, variation)
-                    current_record["value"] = int(new_val) if isinstance(v, int) else new_val
-                elif isinstance(current_record["value"], (dict, list)):
-                    # For complex objects, randomize recursively
-                    self.randomize_numeric_values(current_record["value"])
-
-                # Update timestamp at record level
-                current_record["timestamp"] = datetime.now(timezone.utc).strftime(
-                    "%Y-%m-%dT%H:%M:%SZ"
-                )
-
-                # Also update timestamp inside value if it exists (check for both "Timestamp" and "timestamp")
-                if isinstance(current_record["value"], dict):
-                    if "Timestamp" in current_record["value"]:
-                        current_record["value"]["Timestamp"] = current_record["timestamp"]
-                    elif "timestamp" in current_record["value"]:
-                        current_record["value"]["timestamp"] = current_record["timestamp"]
-
-                # If callback is provided, notify about the update
-                if self.update_callback and old_record != current_record:
-                    self.update_callback(instance, current_record)
-
-            time.sleep(1)  # Update every second
-
-    def randomize_numeric_values(self, obj):
-        """Simulate data changes by changing numeric values in the data"""
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if isinstance(v, (int, float)):
-                    # Change numeric value randomly +/- up to 10%
-                    variation = v * 0.1
-                    new_val = v + random.uniform(-variation, variation)
-                    # If original was int, convert back to int
-                    obj[k] = int(new_val) if isinstance(v, int) else new_val
-                elif isinstance(v, dict) or isinstance(v, list):
-                    self.randomize_numeric_values(v)
-        elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                if isinstance(item, (int, float)):
-                    variation = item * 0.1
-                    new_val = item + random.uniform(-variation, variation)
-                    obj[i] = int(new_val) if isinstance(item, int) else new_val
-                elif isinstance(item, dict) or isinstance(item, list):
-                    self.randomize_numeric_values(item)
+                columns = changed_columns[position:end]
+                if columns[0] < 0 or not series.append_leaves(timestamp, columns, changed_values[position:end]):
+                    series.append(
+                        self._apply_leaves(
+                            series.latest(),
+                            [compiled.paths[i] for i in changed_leaves[position:end]],
+                            [
+                                int(v) if as_int else v
+                                for v, as_int in zip(changed_values[position:end], changed_is_int[position:end])
+                            ],
+                            timestamp,
+                        )
+                    )
+                    # Records written by the updater can be written through their columns from now on
+                    leaves = compiled.leaves_of(owner)
+                    leaf_columns = series.leaf_columns(compiled.paths[leaves.start : leaves.stop])
+                    if leaf_columns is not None:
+                        compiled.columns[leaves.start : leaves.stop] = leaf_columns
+                compiled.versions[owner] = series.version
+                written.append(owner)
+                position = end
+
+            store.invalidate_values_many([compiled.element_ids[owner] for owner in written])
+            if self.update_callback:
+                # Client writes replace instance metadata, so it is looked up rather than kept from compiling
+                changes = [
+                    (store.get_instance(compiled.element_ids[owner]), compiled.series[owner].latest()) for owner in written
+                ]
+            for owner in stale:
+                if not compiled.refresh(owner, store.get_series(compiled.element_ids[owner])):
+                    self._compiled = None
+                    break
+
+        # If callback is provided, notify about the update
+        if self.update_callback:
+            notify_updates(self.update_callback, changes)
+        return len(written)
+
+    @staticmethod
+    def _apply_leaves(record: Dict[str, Any], paths: List[Tuple], values: List[Any], timestamp: str) -> Dict[str, Any]:
+        """Return a new record with the leaves at paths set to values and the timestamp updated"""
+        new_record = dict(record)
+        if paths == [()]:
+            # Primitive value
+            new_record["value"] = values[0]
+        else:
+            new_value = _clone_containers(record["value"])
+            for path, value in zip(paths, values):
+                target = new_value
+                for key in path[:-1]:
+                    target = target[key]
+                target[path[-1]] = value
+            # Also update timestamp inside value if it exists (check for both "Timestamp" and "timestamp")
+            if isinstance(new_value, dict):
+                if "Timestamp" in new_value:
+                    new_value["Timestamp"] = timestamp
+                elif "timestamp" in new_value:
+                    new_value["timestamp"] = timestamp
+            new_record["value"] = new_value
+
+        # Update timestamp at record level
+        new_record["timestamp"] = timestamp
+        return new_record
@@ -0,0 +1,875 @@
+from datetime import datetime
+from functools import lru_cache
+import threading
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+import numpy as np
+
+
+def parse_timestamp(timestamp: Optional[str]) -> float:
+    """Convert an ISO 8601 timestamp to epoch seconds. Missing timestamps sort first."""
+    if not timestamp:
+        return float("-inf")
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+# Records without a timestamp sort before every other record
+_MISSING_TIME = np.iinfo(np.int64).min
+
+
+def _to_micros(seconds: float) -> int:
+    """Convert epoch seconds to the int64 microseconds stored in the time column"""
+    if seconds == float("-inf"):
+        return _MISSING_TIME
+    if seconds == float("inf"):
+        return np.iinfo(np.int64).max
+    return round(seconds * 1_000_000)
+
+
+class _Marker:
+    """Placeholder in a record template for a value kept in a column"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<{self.name}>"
+
+
+_DICT = _Marker("dict")
+_LIST = _Marker("list")
+_INT = _Marker("int")
+_FLOAT = _Marker("float")
+_STRING = _Marker("string")
+_QUALITY = _Marker("quality")
+_TIMESTAMP = _Marker("timestamp")
+
+# Units of the timestamp strings that can be rebuilt exactly from the time column, by their
+# number of fraction digits
+_UNITS = {0: "s", 3: "ms", 6: "us"}
+# Timestamp formats seen so far, as (numpy unit, UTC offset suffix, offset in microseconds).
+# Templates refer to them by index. There are few: one per unit and offset in use.
+_TIMESTAMP_FORMATS: List[Tuple[str, str, int]] = []
+_TIMESTAMP_FORMAT_IDS: Dict[Tuple[str, str], int] = {}
+_TIMESTAMP_FORMATS_LOCK = threading.Lock()
+
+# Larger ints would lose precision in a float64 column
+_MAX_EXACT_INT = 2**53
+# Quality codes are int8; further distinct qualities are kept in a string column
+_MAX_QUALITIES = 127
+
+AGGREGATES = ("avg", "min", "max", "first", "last", "count", "lttb")
+# Quality of an aggregated bucket whose records do not share one quality
+MIXED_QUALITY = "UNCERTAIN"
+
+
+def _offset_suffix(timestamp: str) -> Optional[str]:
+    """Return the UTC offset a timestamp string ends with, Z or +HH:MM/-HH:MM, if any"""
+    if timestamp.endswith("Z"):
+        return "Z"
+    suffix = timestamp[-6:]
+    if (
+        len(timestamp) > 6
+        and suffix[0] in "+-"
+        and suffix[3] == ":"
+        and suffix[1:3].isdigit()
+        and suffix[4:].isdigit()
+        and int(suffix[1:3]) < 24
+        and int(suffix[4:]) < 60
+    ):
+        return suffix
+    return None
+
+
+def _offset_micros(suffix: str) -> int:
+    if suffix == "Z":
+        return 0
+    micros = (int(suffix[1:3]) * 3600 + int(suffix[4:]) * 60) * 1_000_000
+    return -micros if suffix[0] == "-" else micros
+
+
+def _unit(local: str) -> Optional[str]:
+    """Return the numpy unit of a timestamp string without its offset, by its fraction digits"""
+    dot = local.rfind(".")
+    return _UNITS.get(len(local) - dot - 1 if dot >= 0 else 0)
+
+
+def _format_index(unit: str, suffix: str) -> int:
+    """Return the _TIMESTAMP_FORMATS index of a format, adding it when first seen"""
+    key = (unit, suffix)
+    index = _TIMESTAMP_FORMAT_IDS.get(key)
+    if index is None:
+        with _TIMESTAMP_FORMATS_LOCK:
+            index = _TIMESTAMP_FORMAT_IDS.get(key)
+            if index is None:
+                _TIMESTAMP_FORMATS.append((unit, suffix, _offset_micros(suffix)))
+                index = _TIMESTAMP_FORMAT_IDS[key] = len(_TIMESTAMP_FORMATS) - 1
+    return index
+
+
+# Aggregated buckets of records without a timestamp format are stamped in whole seconds, UTC
+_BUCKET_FORMAT = _format_index("s", "Z")
+
+
+def _timestamp_format(timestamp: str, time: int) -> Optional[int]:
+    """Return the _TIMESTAMP_FORMATS index that rebuilds timestamp from time, if any"""
+    suffix = _offset_suffix(timestamp)
+    if suffix is None:
+        return None
+    local = timestamp[: -len(suffix)]
+    unit = _unit(local)
+    if unit is None:
+        return None
+    if np.datetime_as_string(np.datetime64(time + _offset_micros(suffix), "us"), unit=unit) != local:
+        return None
+    return _format_index(unit, suffix)
+
+
+@lru_cache(maxsize=1024)
+def _parse_time(timestamp: str) -> Tuple[int, Optional[int]]:
+    """Return the time column value of a timestamp string and its _TIMESTAMP_FORMATS index.
+    Cached, since every record written in one update tick has the same timestamp."""
+    time = _to_micros(parse_timestamp(timestamp))
+    return time, _timestamp_format(timestamp, time) if time != _MISSING_TIME else None
+
+
+def _parse_times(timestamps: List[Any]) -> Tuple[np.ndarray, List[Optional[int]]]:
+    """_parse_time for many timestamps at once. Timestamps with a UTC offset are parsed by
+    numpy in one pass; the rest are parsed one by one. Invalid timestamps get the missing time."""
+    count = len(timestamps)
+    times = np.full(count, _MISSING_TIME, dtype=np.int64)
+    formats = np.full(count, -1)
+    rows, local, suffix_codes, others = [], [], [], []
+    suffixes: Dict[str, int] = {}  # offset suffix -> code
+    for i, timestamp in enumerate(timestamps):
+        suffix = _offset_suffix(timestamp) if isinstance(timestamp, str) else None
+        if suffix is None:
+            others.append(i)
+            continue
+        rows.append(i)
+        local.append(timestamp[: -len(suffix)])
+        suffix_codes.append(suffixes.setdefault(suffix, len(suffixes)))
+    if rows:
+        try:
+            parsed = np.array(local, dtype="datetime64[us]")
+        except ValueError:
+            others, rows = list(range(count)), []
+    if rows:
+        offset_rows = np.array(rows)
+        codes = np.array(suffix_codes)
+        offsets = np.array([_offset_micros(suffix) for suffix in suffixes], dtype=np.int64)
+        times[offset_rows] = parsed.astype(np.int64) - offsets[codes]
+        local_strings = np.array(local)
+        dots = np.char.rfind(local_strings, ".")
+        digits = np.where(dots >= 0, np.char.str_len(local_strings) - dots - 1, 0)
+        suffix_list = list(suffixes)
+        # Exact when the string is what numpy writes back in its unit
+        for fraction_digits, unit in _UNITS.items():
+            in_unit = np.flatnonzero(digits == fraction_digits)
+            exact = in_unit[np.datetime_as_string(parsed[in_unit], unit=unit) == local_strings[in_unit]]
+            for code in np.unique(codes[exact]).tolist():
+                formats[offset_rows[exact[codes[exact] == code]]] = _format_index(unit, suffix_list[code])
+    format_list: List[Optional[int]] = [None if f < 0 else f for f in formats.tolist()]
+    for i in others:
+        if isinstance(timestamps[i], str):
+            try:
+                times[i], format_list[i] = _parse_time(timestamps[i])
+            except ValueError:
+                pass  # Left as a missing time
+    return times, format_list
+
+
+def _shape(value: Any, timestamp: Optional[str], leaves: List[float], strings: List[str]) -> Any:
+    """Return the template shape of a value, appending its numeric leaves to leaves and its
+    string leaves to strings. Strings equal to timestamp are marked so they are rebuilt from
+    the time column."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        leaves.append(value)
+        return _FLOAT
+    if isinstance(value, int) and abs(value) <= _MAX_EXACT_INT:
+        leaves.append(float(value))
+        return _INT
+    if isinstance(value, str):
+        if value == timestamp:
+            return _TIMESTAMP
+        strings.append(value)
+        return _STRING
+    if isinstance(value, dict):
+        return (_DICT, tuple((k, _shape(v, timestamp, leaves, strings)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (_LIST, tuple(_shape(v, timestamp, leaves, strings) for v in value))
+    return value
+
+
+def _leaf_paths(node: Any, kinds: Tuple[_Marker, ...], path: Tuple = ()):
+    """Yield the path of every leaf of a template shape marked as one of kinds, in leaf order"""
+    if isinstance(node, _Marker):
+        if node in kinds:
+            yield path
+    elif type(node) is tuple:
+        kind, items = node
+        if kind is _DICT:
+            for key, value in items:
+                yield from _leaf_paths(value, kinds, path + (key,))
+        else:
+            for i, value in enumerate(items):
+                yield from _leaf_paths(value, kinds, path + (i,))
+
+
+def _format_times(times: np.ndarray, timestamp_format: int) -> List[str]:
+    unit, suffix, offset = _TIMESTAMP_FORMATS[timestamp_format]
+    local = (times + offset).astype("datetime64[us]")
+    return [t + suffix for t in np.datetime_as_string(local, unit=unit).tolist()]
+
+
+@lru_cache(maxsize=1024)
+def _format_time(time: int, timestamp_format: int) -> str:
+    """_format_times for one time. Cached, since the records written in one update tick share their time."""
+    return _format_times(np.array([time], dtype=np.int64), timestamp_format)[0]
+
+
+class _Template:
+    """The shape and fixed fields shared by records of an instance
+
+    build(leaves, strings, timestamp, quality) rebuilds a record from its numeric and string
+    leaf values in column order, its timestamp string and its quality. build_float does the
+    same but keeps int leaves as floats, for averages. key is the template's key in
+    RecordSeries._template_ids_by_shape.
+    """
+
+    def __init__(
+        self, shape: Any, columns: List[int], string_columns: List[int], timestamp_format: Optional[int], key: Any
+    ):
+        self.columns = columns
+        self.string_columns = string_columns
+        self.timestamp_format = timestamp_format
+        self.key = key
+        self.build = self._compile(shape, [0, 0], True)
+        self.build_float = self._compile(shape, [0, 0], False)
+
+    def _compile(self, node: Any, counts: List[int], exact_ints: bool):
+        """counts are the numbers of numeric and string leaves compiled so far"""
+        if type(node) is tuple:
+            kind, items = node
+            if kind is _DICT:
+                parts = [(key, self._compile(value, counts, exact_ints)) for key, value in items]
+                return lambda leaves, strings, timestamp, quality: {
+                    key: part(leaves, strings, timestamp, quality) for key, part in parts
+                }
+            parts = [self._compile(value, counts, exact_ints) for value in items]
+            return lambda leaves, strings, timestamp, quality: [
+                part(leaves, strings, timestamp, quality) for part in parts
+            ]
+        if node is _FLOAT or node is _INT:
+            index = counts[0]
+            counts[0] += 1
+            if node is _INT and exact_ints:
+                return lambda leaves, strings, timestamp, quality: int(leaves[index])
+            return lambda leaves, strings, timestamp, quality: leaves[index]
+        if node is _STRING:
+            index = counts[1]
+            counts[1] += 1
+            return lambda leaves, strings, timestamp, quality: strings[index]
+        if node is _QUALITY:
+            return lambda leaves, strings, timestamp, quality: quality
+        if node is _TIMESTAMP:
+            return lambda leaves, strings, timestamp, quality: timestamp
+        return lambda leaves, strings, timestamp, quality: node
+
+
+class RecordSeries:
+    """Records (VQTs) of one instance kept in time order, stored by column
+
+    Each record is split into a time (int64 microseconds), a quality code, a float64 value
+    per numeric leaf path, a string per string leaf path, and a template holding everything
+    else: the record's shape, its timestamp format and its other fields, with markers where
+    the columns go. Templates are interned, so records of the same shape share one, and
+    counted by row, so a template is dropped once its last row is evicted. Record dicts are
+    rebuilt from the columns when read, in the same shape they were written in. Range queries bisect the time column and
+    the last known value is the final row. Records are returned most recent first, the
+    order used by the mock data.
+
+    New records are appended as live history. The columns are a ring: eviction advances a
+    head offset, and the evicted rows are reclaimed when the columns are full. Appending
+    keeps at most capacity records and nothing older than window seconds before the latest
+    record. Seed records are kept until live records push them out.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Dict[str, Any]] = (),
+        capacity: Optional[int] = None,
+        window: Optional[float] = None,
+    ):
+        self.capacity = capacity
+        self.window = window
+        self._start = 0  # row of the oldest retained record
+        self._size = 0  # rows in use, including evicted rows before _start
+        self._times = np.empty(16, dtype=np.int64)
+        self._template_ids = np.empty(16, dtype=np.int32)
+        self._quality_ids = np.empty(16, dtype=np.int8)
+        self._columns: List[np.ndarray] = []
+        self._column_ids: Dict[Tuple, int] = {}  # numeric leaf path -> column
+        self._string_columns: List[np.ndarray] = []
+        self._string_column_ids: Dict[Tuple, int] = {}  # string leaf path -> string column
+        self._templates: List[_Template] = []
+        self._template_ids_by_shape: Dict[Any, int] = {}
+        self._template_rows: List[int] = []  # rows retained per template
+        self._free_template_ids: List[int] = []  # ids of dropped templates, to reuse
+        self._qualities: List[Any] = []
+        self._quality_ids_by_value: Dict[Any, int] = {}
+        # The most recent record as written, so latest() returns the same object until the next write
+        self._latest: Optional[Dict[str, Any]] = None
+        # Bumped by every write, so a writer can tell whether the series changed since it last wrote
+        self.version = 0
+
+        for record in sorted(records, key=lambda r: parse_timestamp(r.get("timestamp"))):
+            self.insert(record)
+
+    def __len__(self) -> int:
+        return self._size - self._start
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Return the most recent record, or None if no record has a timestamp"""
+        if len(self) == 0 or self._times[self._size - 1] == _MISSING_TIME:
+            return None
+        if self._latest is None:
+            self._latest = self._record(self._size - 1)
+        return self._latest
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Return every record, most recent first"""
+        return self._rows(self._start, self._size)
+
+    def window_records(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """Return records with start <= timestamp <= end (epoch seconds), most recent first"""
+        return self._rows(*self.window_bounds(start, end))
+
+    def window_bounds(self, start: float, end: float) -> Tuple[int, int]:
+        """Return the rows [lo, hi) with start <= timestamp <= end (epoch seconds)"""
+        times = self._times[self._start : self._size]
+        lo = self._start + int(np.searchsorted(times, _to_micros(start), "left"))
+        hi = self._start + int(np.searchsorted(times, _to_micros(end), "right"))
+        return lo, max(lo, hi)
+
+    def page(
+        self, start: float, end: float, limit: int, cursor: Optional[Tuple[int, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Return up to limit records with start <= timestamp <= end (epoch seconds), most recent
+        first, and the cursor of the next page or None after the last page.
+
+        A cursor (time, skip) continues with the records older than time, and those at time
+        except the skip most recent, so pages stay consistent while records are appended.
+        """
+        lo, hi = self.window_bounds(start, end)
+        skip = 0
+        if cursor is not None:
+            cursor_time, skip = cursor
+            times = self._times[self._start : self._size]
+            hi = min(hi, self._start + int(np.searchsorted(times, cursor_time, "right")) - skip)
+        page_lo = max(lo, hi - limit)
+        records = self._rows(page_lo, hi)
+        if page_lo <= lo:
+            return records, None
+        oldest = int(self._times[page_lo])
+        same_time = int(np.count_nonzero(self._times[page_lo:hi] == oldest))
+        if cursor is not None and oldest == cursor[0]:
+            same_time += skip
+        return records, (oldest, same_time)
+
+    def aggregate(
+        self, start: Optional[float], end: Optional[float], interval: float, aggregate: str
+    ) -> List[Dict[str, Any]]:
+        """Aggregate the records with start <= timestamp <= end (epoch seconds, None for no bound)
+        into buckets of interval seconds aligned to the epoch, most recent bucket first.
+
+        avg, min and max apply to every numeric leaf of the values, over the bucket's records
+        that have that leaf; the rest of each value comes from the bucket's last record.
+        first and last return that record, count the number of records. Each bucket has the
+        bucket start as its timestamp and the quality its records share, or MIXED_QUALITY.
+        lttb downsamples to as many real records as there are occupied buckets, with their
+        own timestamps, by Largest-Triangle-Three-Buckets over the first numeric leaf. LTTB
+        splits the records into equal counts, not equal times, so a returned record need not
+        fall in a distinct interval. It always keeps the first record, and the last when
+        more than one is returned.
+        """
+        lo, hi = self.window_bounds(
+            float("-inf") if start is None else start, float("inf") if end is None else end
+        )
+        # Records without a timestamp cannot be put in a bucket
+        lo += int(np.searchsorted(self._times[lo:hi], _MISSING_TIME, "right"))
+        if lo >= hi:
+            return []
+
+        width = max(1, round(interval * 1_000_000))
+        buckets = self._times[lo:hi] // width
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        ends = np.append(starts[1:], hi - lo)
+        if aggregate == "lttb":
+            return self._lttb(lo, hi, len(starts))
+
+        last_rows = (lo + ends - 1).tolist()
+        bucket_times = (buckets[starts] * width).tolist()
+        quality_ids = self._quality_ids[lo:hi]
+        uniform = np.minimum.reduceat(quality_ids, starts) == np.maximum.reduceat(quality_ids, starts)
+        qualities = self._qualities + [None]
+        bucket_qualities = [
+            qualities[q] if same else MIXED_QUALITY
+            for q, same in zip(quality_ids[starts].tolist(), uniform.tolist())
+        ]
+
+        formatted: Dict[int, List[str]] = {}
+        bucket_timestamps = []
+        for k, row in enumerate(last_rows):
+            timestamp_format = self._templates[self._template_ids[row]].timestamp_format
+            if timestamp_format is None:
+                timestamp_format = _BUCKET_FORMAT
+            if timestamp_format not in formatted:
+                formatted[timestamp_format] = _format_times(np.array(bucket_times, dtype=np.int64), timestamp_format)
+            bucket_timestamps.append(formatted[timestamp_format][k])
+
+        if aggregate in ("first", "last"):
+            rows = (lo + starts).tolist() if aggregate == "first" else last_rows
+            records = [self._rows(row, row + 1)[0] for row in rows]
+            for record, quality in zip(records, bucket_qualities):
+                record["quality"] = quality
+        elif aggregate == "count":
+            records = [{"value": count, "quality": quality} for count, quality in zip((ends - starts).tolist(), bucket_qualities)]
+        else:
+            aggregated = self._aggregate_columns(lo, hi, starts, aggregate)
+            records = []
+            for k, (row, timestamp, quality) in enumerate(zip(last_rows, bucket_timestamps, bucket_qualities)):
+                template = self._templates[self._template_ids[row]]
+                leaves = [aggregated[column_id][k] for column_id in template.columns]
+                strings = [self._string_columns[column_id][row] for column_id in template.string_columns]
+                build = template.build_float if aggregate == "avg" else template.build
+                records.append(build(leaves, strings, timestamp, quality))
+
+        for record, timestamp in zip(records, bucket_timestamps):
+            record["timestamp"] = timestamp
+        records.reverse()
+        return records
+
+    def _aggregate_columns(self, lo: int, hi: int, starts: np.ndarray, aggregate: str) -> Dict[int, List[float]]:
+        """Reduce every leaf column over the buckets beginning at starts, skipping rows without the leaf"""
+        template_ids = self._template_ids[lo:hi]
+        aggregated = {}
+        for column_id, column in enumerate(self._columns):
+            with_column = [i for i, template in enumerate(self._templates) if column_id in template.columns]
+            present = np.isin(template_ids, with_column)
+            values = column[lo:hi]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if aggregate == "avg":
+                    sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+                    result = sums / np.add.reduceat(present.astype(np.int64), starts)
+                elif aggregate == "min":
+                    result = np.fmin.reduceat(np.where(present, values, np.nan), starts)
+                else:
+                    result = np.fmax.reduceat(np.where(present, values, np.nan), starts)
+            aggregated[column_id] = result.tolist()
+        return aggregated
+
+    def _lttb(self, lo: int, hi: int, threshold: int) -> List[Dict[str, Any]]:
+        """Downsample rows [lo, hi) to threshold records with Largest-Triangle-Three-Buckets"""
+        first_columns = np.array([t.columns[0] if t.columns else -1 for t in self._templates], dtype=np.int64)
+        row_columns = first_columns[self._template_ids[lo:hi]]
+        rows = lo + np.flatnonzero(row_columns >= 0)
+        row_columns = row_columns[row_columns >= 0]
+        y = np.empty(len(rows))
+        for column_id in np.unique(row_columns).tolist():
+            mask = row_columns == column_id
+            y[mask] = self._columns[column_id][rows[mask]]
+        x = (self._times[rows] - self._times[lo]).astype(np.float64)
+
+        count = len(rows)
+        if threshold >= count:
+            selected = np.arange(count)
+        elif threshold < 3:
+            selected = [0, count - 1][:threshold]
+        else:
+            selected = [0]
+            every = (count - 2) / (threshold - 2)
+            a = 0
+            for i in range(threshold - 2):
+                # The average of the next bucket is the third point of the triangle
+                next_start = int((i + 1) * every) + 1
+                next_end = min(int((i + 2) * every) + 1, count)
+                next_x = x[next_start:next_end].mean()
+                next_y = y[next_start:next_end].mean()
+                start = int(i * every) + 1
+                end = int((i + 1) * every) + 1
+                areas = np.abs(
+                    (x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a])
+                )
+                a = start + int(np.argmax(areas))
+                selected.append(a)
+            selected.append(count - 1)
+        return [self._rows(row, row + 1)[0] for row in reversed(rows[selected].tolist())]
+
+    def insert(self, record: Dict[str, Any]) -> None:
+        """Add a record at its position in time"""
+        time, template_id, quality_id, leaves, strings = self._encode(record)
+        self._ensure_room()
+        size = self._size
+        if size == self._start or time >= self._times[size - 1]:
+            row = size
+            self._latest = record
+        else:
+            row = self._start + int(np.searchsorted(self._times[self._start : size], time, "right"))
+            # Shift the later rows up by one; numpy copies overlapping slices correctly
+            for column in self._all_columns():
+                column[row + 1 : size + 1] = column[row:size]
+        self._times[row] = time
+        self._template_ids[row] = template_id
+        self._template_rows[template_id] += 1
+        self._quality_ids[row] = quality_id
+        for column_id, value in leaves:
+            self._columns[column_id][row] = value
+        for column_id, value in strings:
+            self._string_columns[column_id][row] = value
+        self._size = size + 1
+        self.version += 1
+
+    def merge(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """Add many records at their positions in time in one pass, then evict as trim does.
+        Records without a valid timestamp are not added. Returns whether each record is
+        retained, in the order given."""
+        retained = np.zeros(len(records), dtype=bool)
+        if not records:
+            return retained
+        self.version += 1
+        times, template_ids, quality_ids, leaves, strings = self._encode_many(records)
+        # Stable, so records with the same time keep the order they were given in; rows
+        # without a time are left out
+        order = np.argsort(times, kind="stable")
+        order = order[np.searchsorted(times[order], _MISSING_TIME, "right") :]
+        count = len(order)
+        template_ids = np.array(template_ids, dtype=np.int32)
+        added_ids, added_rows = np.unique(template_ids[order], return_counts=True)
+        for template_id, rows in zip(added_ids.tolist(), added_rows.tolist()):
+            self._template_rows[template_id] += rows
+        # Templates made only for the records without a time are not kept
+        for template_id in set(template_ids.tolist()) - set(added_ids.tolist()):
+            if self._template_rows[template_id] == 0:
+                self._drop_template(template_id)
+        if count == 0:
+            return retained
+        quality_ids = np.array(quality_ids, dtype=np.int8)
+        # Columns are only created while encoding, so every leaf has its column by now
+        leaf_rows, leaf_columns, leaf_values = leaves
+        leaves = np.full((len(self._columns), len(records)), np.nan)
+        leaves[leaf_columns, leaf_rows] = leaf_values
+        string_rows, string_columns, string_values = strings
+        strings = np.full((len(self._string_columns), len(records)), None, dtype=object)
+        strings[string_columns, string_rows] = string_values
+
+        # Each new row goes after the retained rows with the same or an earlier time
+        size = len(self)
+        new_times = times[order]
+        positions = np.searchsorted(self._times[self._start : self._size], new_times, "right")
+        if size == 0 or new_times[-1] >= self._times[self._size - 1]:
+            self._latest = records[order[-1]]
+
+        length = max(16, 1 << (size + count).bit_length())
+        merged = []
+        for column, new_values in (
+            (self._times, new_times),
+            (self._template_ids, template_ids[order]),
+            (self._quality_ids, quality_ids[order]),
+            *((column, leaves[column_id][order]) for column_id, column in enumerate(self._columns)),
+            *((column, strings[column_id][order]) for column_id, column in enumerate(self._string_columns)),
+        ):
+            grown = np.empty(length, dtype=column.dtype)
+            grown[: size + count] = np.insert(column[self._start : self._size], positions, new_values)
+            merged.append(grown)
+        self._times, self._template_ids, self._quality_ids, *merged = merged
+        self._columns = merged[: len(self._columns)]
+        self._string_columns = merged[len(self._columns) :]
+        self._start = 0
+        self._size = size + count
+        self.trim()
+
+        retained[order] = positions + np.arange(count) >= self._start
+        return retained
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Add a live record and evict the oldest records beyond capacity or window"""
+        self.insert(record)
+        self.trim()
+
+    def append_leaves(self, timestamp: str, columns: List[int], values: List[float]) -> bool:
+        """Append a live record like the latest one, with the numeric leaves in columns set to
+        values, written straight into the columns without building a record. The latest
+        record's template is reused, so strings in it that matched its timestamp take the new
+        timestamp. Returns False, appending nothing, when the latest record has no timestamp,
+        a later one, or one in another format than timestamp."""
+        if not len(self):
+            return False
+        row = self._size - 1
+        template_id = int(self._template_ids[row])
+        template = self._templates[template_id]
+        time, timestamp_format = _parse_time(timestamp)
+        if timestamp_format is None or template.timestamp_format != timestamp_format or time < self._times[row]:
+            return False
+        self._ensure_room()
+        row = self._size  # the new row; _ensure_room may have moved the latest one
+        self._times[row] = time
+        self._template_ids[row] = template_id
+        self._quality_ids[row] = self._quality_ids[row - 1]
+        for column_id in template.columns:
+            column = self._columns[column_id]
+            column[row] = column[row - 1]
+        for column_id in template.string_columns:
+            column = self._string_columns[column_id]
+            column[row] = column[row - 1]
+        for column_id, value in zip(columns, values):
+            self._columns[column_id][row] = value
+        self._template_rows[template_id] += 1
+        self._size = row + 1
+        self._latest = None
+        self.version += 1
+        self.trim()
+        return True
+
+    def leaf_columns(self, paths: List[Tuple]) -> Optional[List[int]]:
+        """Return the columns of the numeric leaves at paths in the latest record's value, or
+        None if one of them is not kept in a column of its template"""
+        if not len(self):
+            return None
+        template = self._templates[self._template_ids[self._size - 1]]
+        columns = []
+        for path in paths:
+            column_id = self._column_ids.get(("value",) + path)
+            if column_id is None or column_id not in template.columns:
+                return None
+            columns.append(column_id)
+        return columns
+
+    def trim(self) -> None:
+        """Evict the oldest records beyond capacity or window"""
+        start = self._start
+        if self.capacity is not None:
+            start = max(start, self._size - self.capacity)
+        if self.window is not None and len(self):
+            cutoff = self._times[self._size - 1] - round(self.window * 1_000_000)
+            start += int(np.searchsorted(self._times[start : self._size], cutoff, "left"))
+        if start > self._start:
+            self._release(self._start, start)
+        self._start = start
+
+    def _release(self, lo: int, hi: int) -> None:
+        """Take the evicted rows [lo, hi) off their templates, dropping templates left without rows"""
+        evicted = self._template_ids[lo:hi]
+        if hi - lo == 1:
+            template_ids, rows = [int(evicted[0])], [1]
+        else:
+            unique_ids, counts = np.unique(evicted, return_counts=True)
+            template_ids, rows = unique_ids.tolist(), counts.tolist()
+        for template_id, count in zip(template_ids, rows):
+            self._template_rows[template_id] -= count
+            if self._template_rows[template_id] == 0:
+                self._drop_template(template_id)
+
+    def _drop_template(self, template_id: int) -> None:
+        """Forget a template no retained row uses, so its id is reused by the next new shape"""
+        del self._template_ids_by_shape[self._templates[template_id].key]
+        self._free_template_ids.append(template_id)
+
+    def _all_columns(self) -> List[np.ndarray]:
+        return [self._times, self._template_ids, self._quality_ids, *self._columns, *self._string_columns]
+
+    def _ensure_room(self) -> None:
+        """Make room for one more row, reclaiming evicted rows before growing the columns"""
+        length = len(self._times)
+        if self._size < length:
+            return
+        count = len(self)
+        if self._start * 2 >= length:
+            for column in self._all_columns():
+                column[:count] = column[self._start : self._size]
+        else:
+            length *= 2
+            self._times = self._grow(self._times, length)
+            self._template_ids = self._grow(self._template_ids, length)
+            self._quality_ids = self._grow(self._quality_ids, length)
+            self._columns = [self._grow(column, length) for column in self._columns]
+            self._string_columns = [self._grow(column, length) for column in self._string_columns]
+            if self._start:
+                for column in self._all_columns():
+                    column[:count] = column[self._start : self._size]
+        self._start = 0
+        self._size = count
+
+    @staticmethod
+    def _grow(column: np.ndarray, length: int) -> np.ndarray:
+        grown = np.empty(length, dtype=column.dtype)
+        grown[: len(column)] = column
+        return grown
+
+    def _encode(
+        self, record: Dict[str, Any], parsed: Optional[Tuple[int, Optional[int]]] = None
+    ) -> Tuple[int, int, int, List[Tuple[int, float]], List[Tuple[int, str]]]:
+        """Split a record into its time, template, quality, and numeric and string leaf values
+        by column. parsed is the record's (time, timestamp format) if already known."""
+        timestamp = record.get("timestamp")
+        if parsed is not None:
+            time, timestamp_format = parsed
+        else:
+            time, timestamp_format = _parse_time(timestamp) if isinstance(timestamp, str) else (_MISSING_TIME, None)
+        marked_timestamp = timestamp if timestamp_format is not None else None
+
+        leaves: List[float] = []
+        strings: List[str] = []
+        quality = record.get("quality")
+        quality_id = -1
+        items = []
+        for key, value in record.items():
+            if key == "quality" and isinstance(quality, str) and (
+                quality in self._quality_ids_by_value or len(self._qualities) < _MAX_QUALITIES
+            ):
+                quality_id = self._quality_ids_by_value.get(quality)
+                if quality_id is None:
+                    quality_id = self._quality_ids_by_value[quality] = len(self._qualities)
+                    self._qualities.append(quality)
+                items.append((key, _QUALITY))
+            else:
+                items.append((key, _shape(value, marked_timestamp, leaves, strings)))
+        record_shape = (_DICT, tuple(items))
+
+        # Records of one shape written with different timestamp formats need their own template
+        template_key = (record_shape, timestamp_format)
+        template_id = self._template_ids_by_shape.get(template_key)
+        if template_id is None:
+            columns = [self._column_id(path) for path in _leaf_paths(record_shape, (_FLOAT, _INT))]
+            string_columns = [self._string_column_id(path) for path in _leaf_paths(record_shape, (_STRING,))]
+            template = _Template(record_shape, columns, string_columns, timestamp_format, template_key)
+            if self._free_template_ids:
+                template_id = self._free_template_ids.pop()
+                self._templates[template_id] = template
+            else:
+                template_id = len(self._templates)
+                self._templates.append(template)
+                self._template_rows.append(0)
+            self._template_ids_by_shape[template_key] = template_id
+        template = self._templates[template_id]
+        return (
+            time,
+            template_id,
+            quality_id,
+            list(zip(template.columns, leaves)),
+            list(zip(template.string_columns, strings)),
+        )
+
+    def _encode_many(
+        self, records: List[Dict[str, Any]]
+    ) -> Tuple[
+        np.ndarray, List[int], List[int], Tuple[List[int], List[int], List[float]], Tuple[List[int], List[int], List[str]]
+    ]:
+        """_encode for many records, with the times parsed at once. Returns the times, template
+        ids and quality ids, and the numeric and string leaves each as (rows, columns, values).
+        A plain VQT with a number value, shaped like the one before it, reuses its template
+        without being walked."""
+        times, formats = _parse_times([record.get("timestamp") for record in records])
+        template_ids, quality_ids = [], []
+        leaf_rows, leaf_columns, leaf_values = [], [], []
+        string_rows, string_columns, string_values = [], [], []
+        previous = None  # signature of the last plain VQT
+        for row, (record, timestamp_format) in enumerate(zip(records, formats)):
+            value = record.get("value")
+            value_type = type(value)
+            # The timestamp must come from the time column, or it would be a string leaf
+            plain = (
+                (value_type is float or (value_type is int and abs(value) <= _MAX_EXACT_INT))
+                and len(record) <= 3
+                and timestamp_format is not None
+            )
+            if plain:
+                signature = (tuple(record), value_type, record.get("quality"), timestamp_format)
+                if signature == previous:
+                    template_ids.append(template_id)
+                    quality_ids.append(quality_id)
+                    leaf_rows.append(row)
+                    leaf_columns.append(column_id)
+                    leaf_values.append(value)
+                    continue
+            _, template_id, quality_id, leaves, strings = self._encode(record, (int(times[row]), timestamp_format))
+            template_ids.append(template_id)
+            quality_ids.append(quality_id)
+            for column_id, leaf in leaves:
+                leaf_rows.append(row)
+                leaf_columns.append(column_id)
+                leaf_values.append(leaf)
+            for column_id, string in strings:
+                string_rows.append(row)
+                string_columns.append(column_id)
+                string_values.append(string)
+            previous = signature if plain and len(leaves) == 1 and not strings else None
+        return (
+            times,
+            template_ids,
+            quality_ids,
+            (leaf_rows, leaf_columns, leaf_values),
+            (string_rows, string_columns, string_values),
+        )
+
+    def _column_id(self, path: Tuple) -> int:
+        column_id = self._column_ids.get(path)
+        if column_id is None:
+            column_id = self._column_ids[path] = len(self._columns)
+            self._columns.append(np.full(len(self._times), np.nan))
+        return column_id
+
+    def _string_column_id(self, path: Tuple) -> int:
+        column_id = self._string_column_ids.get(path)
+        if column_id is None:
+            column_id = self._string_column_ids[path] = len(self._string_columns)
+            self._string_columns.append(np.full(len(self._times), None, dtype=object))
+        return column_id
+
+    def _record(self, row: int) -> Dict[str, Any]:
+        """Rebuild the record of one row; _rows for a single row without the batching overhead"""
+        template = self._templates[self._template_ids[row]]
+        leaves = [float(self._columns[column_id][row]) for column_id in template.columns]
+        strings = [self._string_columns[column_id][row] for column_id in template.string_columns]
+        timestamp = None
+        if template.timestamp_format is not None:
+            timestamp = _format_time(int(self._times[row]), template.timestamp_format)
+        quality_id = int(self._quality_ids[row])
+        return template.build(leaves, strings, timestamp, self._qualities[quality_id] if quality_id >= 0 else None)
+
+    def _rows(self, lo: int, hi: int) -> List[Dict[str, Any]]:
+        """Rebuild the records of rows [lo, hi), most recent first"""
+        if lo >= hi:
+            return []
+        template_ids = self._template_ids[lo:hi].tolist()
+        quality_ids = self._quality_ids[lo:hi].tolist()
+        qualities = self._qualities + [None]  # quality id -1 is a record without a quality code
+        column_values: Dict[int, List[float]] = {}
+        string_values: Dict[int, List[str]] = {}
+        timestamps: Dict[int, List[str]] = {}
+        records = []
+        for i in range(hi - lo - 1, -1, -1):
+            template = self._templates[template_ids[i]]
+            leaves = []
+            for column_id in template.columns:
+                values = column_values.get(column_id)
+                if values is None:
+                    values = column_values[column_id] = self._columns[column_id][lo:hi].tolist()
+                leaves.append(values[i])
+            strings = []
+            for column_id in template.string_columns:
+                values = string_values.get(column_id)
+                if values is None:
+                    values = string_values[column_id] = self._string_columns[column_id][lo:hi].tolist()
+                strings.append(values[i])
+            timestamp = None
+            if template.timestamp_format is not None:
+                formatted = timestamps.get(template.timestamp_format)
+                if formatted is None:
+                    formatted = timestamps[template.timestamp_format] = _format_times(
+                        self._times[lo:hi], template.timestamp_format
+                    )
+                timestamp = formatted[i]
+            records.append(template.build(leaves, strings, timestamp, qualities[quality_ids[i]]))
+        return records
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Dict, Any, Tuple
+
+
+class FrozenDict(dict):
+    """A dict that refuses modification, used for resolved type definitions"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Resolved type definitions are read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value: Any) -> Any:
+    """Return an immutable copy of a JSON value (dicts become FrozenDict, lists become tuples)"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class _SchemaResolver:
+    """Loads Namespaces files and resolves JSON pointers and $refs, for one registry build"""
+
+    def __init__(self, base_dir: str, failed: Optional[Dict[str, Optional[float]]] = None):
+        self.base_dir = base_dir
+        self.documents: Dict[str, Any] = {}  # absolute path -> parsed file
+        self.mtimes: Dict[str, Optional[float]] = {}  # absolute path -> mtime when loaded
+        # absolute path -> mtime of a file that failed to load; it is skipped until its mtime changes
+        self.failed: Dict[str, Optional[float]] = dict(failed or {})
+        self.ids: Dict[str, str] = {}  # $id -> absolute path
+        self._resolved: Dict[Tuple[str, str], Any] = {}
+
+    def load(self, path: str) -> Any:
+        if path not in self.documents:
+            mtime = self.mtimes[path] = _file_mtime(path)
+            if self._skipped(path):
+                raise ValueError(f"{path} failed to load and has not changed since")
+            try:
+                with open(path, "r") as f:
+                    document = json.load(f)
+            except (OSError, ValueError):
+                self.failed[path] = mtime
+                raise
+            self.failed.pop(path, None)
+            self.documents[path] = document
+            if isinstance(document, dict) and "$id" in document:
+                self.ids[document["$id"].rstrip("#")] = path
+            # Load sibling files too, so $refs by $id can be resolved
+            directory = os.path.dirname(path)
+            for name in sorted(os.listdir(directory)):
+                sibling = os.path.join(directory, name)
+                if not name.endswith(".json") or sibling in self.documents:
+                    continue
+                if self._skipped(sibling):
+                    # Still watched, so the registry is rebuilt once the file is fixed
+                    self.mtimes[sibling] = self.failed[sibling]
+                    continue
+                try:
+                    self.load(sibling)
+                except (OSError, ValueError) as e:
+                    # A broken sibling only breaks the $refs into it
+                    print(f"Error loading schema file {sibling}: {e}")
+        return self.documents[path]
+
+    def _skipped(self, path: str) -> bool:
+        return path in self.failed and self.failed[path] == _file_mtime(path)
+
+    def resolve_pointer(self, path: str, pointer: str, stack=()) -> Any:
+        """Return the fully resolved value at path#pointer"""
+        key = (path, pointer)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        current = self.load(path)
+        for part in [p for p in pointer.strip("/").split("/") if p]:
+            part = part.replace("~1", "/").replace("~0", "~")
+            if isinstance(current, dict) and part in current:
+                current = current[part]
+            elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+                current = current[int(part)]
+            else:
+                raise KeyError(f"Could not resolve JSON pointer {pointer} in {path}")
+
+        resolved = self._resolve_node(current, path, stack + (key,))
+        self._resolved[key] = resolved
+        return resolved
+
+    def _resolve_node(self, node: Any, path: str, stack) -> Any:
+        if isinstance(node, list):
+            return [self._resolve_node(item, path, stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+
+        siblings = {
+            k: self._resolve_node(v, path, stack) for k, v in node.items() if k != "$ref"
+        }
+        ref = node.get("$ref")
+        if not isinstance(ref, str):
+            return siblings
+
+        target = self._ref_target(ref, path)
+        if target is None or target in stack:
+            # Unknown or recursive reference, leave it for the client to follow
+            return {"$ref": ref, **siblings}
+        resolved = self.resolve_pointer(*target, stack=stack)
+        if not isinstance(resolved, dict):
+            return resolved
+        # Keywords next to the $ref (e.g. description) annotate the referenced schema
+        return {**resolved, **siblings}
+
+    def _ref_target(self, ref: str, path: str) -> Optional[Tuple[str, str]]:
+        """Map a $ref to (absolute file path, JSON pointer)"""
+        location, _, pointer = ref.partition("#")
+        if not location:
+            return path, pointer
+        if location.rstrip("/") in self.ids:
+            return self.ids[location.rstrip("/")], pointer
+        if "://" in location:
+            return None
+        return os.path.normpath(os.path.join(os.path.dirname(path), location)), pointer
+
+
+class _Snapshot:
+    def __init__(
+        self, types: List[Dict[str, Any]], mtimes: Dict[str, Optional[float]], failed: Dict[str, Optional[float]]
+    ):
+        self.types = types
+        self.by_id = {t["elementId"]: t for t in types}
+        self.by_namespace: Dict[str, List[Dict[str, Any]]] = {}
+        for type_definition in types:
+            self.by_namespace.setdefault(type_definition["namespaceUri"], []).append(type_definition)
+        self.mtimes = mtimes
+        self.failed = failed
+
+
+class TypeRegistry:
+    """Object types with their schema pointers resolved once
+
+    Type metadata carries a pointer such as "Namespaces/abelara.json#types/state-type". The
+    registry resolves every pointer, inlining $refs within and across the Namespaces files,
+    and holds the results as immutable definitions. When a loaded file's mtime changes
+    (checked at most every check_interval seconds), the whole registry is rebuilt and swapped
+    in with one assignment, so readers see either the old or the new definitions. A file that
+    fails to parse is logged once and skipped, in later rebuilds too, until its mtime changes.
+    """
+
+    def __init__(
+        self,
+        type_definitions: List[Dict[str, Any]],
+        base_dir: str,
+        check_interval: float = 1.0,
+    ):
+        self._type_definitions = type_definitions
+        self._base_dir = base_dir
+        self._check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._snapshot = self._build({})
+
+    def _build(self, failed: Dict[str, Optional[float]]) -> _Snapshot:
+        resolver = _SchemaResolver(self._base_dir, failed)
+        types = [freeze(self._resolve_type(t, resolver)) for t in self._type_definitions]
+        return _Snapshot(types, resolver.mtimes, resolver.failed)
+
+    def _resolve_type(self, type_definition: Dict[str, Any], resolver: _SchemaResolver) -> Dict[str, Any]:
+        """Return the type definition with its schema pointer replaced by the resolved schema"""
+        schema_pointer = type_definition.get("schema", "")
+
+        # Types without a string pointer (none, or an inline schema) are returned as-is
+        if not isinstance(schema_pointer, str) or "#" not in schema_pointer:
+            return type_definition
+
+        file_path, json_pointer = schema_pointer.split("#", 1)
+        full_path = os.path.normpath(os.path.join(self._base_dir, file_path))
+        try:
+            schema = resolver.resolve_pointer(full_path, json_pointer)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading schema {schema_pointer}: {e}")
+            return type_definition
+
+        result = dict(type_definition)
+        result["schema"] = schema
+        return result
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self._check_interval:
+            return
+        with self._reload_lock:
+            if now - self._last_check < self._check_interval:
+                return
+            self._last_check = now
+            mtimes = self._snapshot.mtimes
+            if all(_file_mtime(path) == mtime for path, mtime in mtimes.items()):
+                return
+            try:
+                self._snapshot = self._build(self._snapshot.failed)
+            except Exception as e:
+                print(f"Error reloading type schemas, keeping previous definitions: {e}")
+
+    def get(self, element_id: str) -> Optional[Dict[str, Any]]:
+        """Return the resolved type definition for an elementId"""
+        self._reload_if_changed()
+        return self._snapshot.by_id.get(element_id)
+
+    def get_types(self, namespace_uri: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return resolved type definitions, optionally filtered by namespace"""
+        self._reload_if_changed()
+        snapshot = self._snapshot
+        if namespace_uri:
+            return list(snapshot.by_namespace.get(namespace_uri, []))
+        return list(snapshot.types)
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Callable, Iterator, Tuple
+
+# Defaults for the "history_jobs" entry of config.json
+DEFAULT_HISTORY_JOBS_CONFIG = {
+    "workers": 2,  # history queries running at once
+    "ttl": 600,  # seconds a finished job is kept after its last read
+    "max_records": 5_000_000,  # records held over all jobs; the least recently read finished jobs go first
+    "page_size": 1000,  # records per page when the client gives no limit
+}
+
+
+class HistoryJob:
+    """One history query running in the background, with the records collected so far"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.status = "running"  # running, complete, truncated or failed
+        self.message: Optional[str] = None
+        self.records: List[Dict[str, Any]] = []
+        self.done = threading.Event()
+        self.cancelled = False
+        self.last_access = time.monotonic()
+
+    def page(self, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return records [offset, offset + limit) and the offset to continue from, None after the last page"""
+        self.last_access = time.monotonic()
+        # Read done before the records, so a job finishing in between is not taken as fully read
+        done = self.done.is_set()
+        values = self.records[offset : offset + limit]
+        next_offset = offset + len(values)
+        if done and next_offset >= len(self.records):
+            return values, None
+        return values, next_offset
+
+
+class HistoryJobs:
+    """Runs history queries on worker threads and holds their results for paging
+
+    A query that does not finish within the client's timeout keeps running; the client gets
+    the records collected so far and polls the job for the rest. Records are held in memory.
+    Finished jobs expire ttl seconds after they were last read, and when the records of all
+    jobs exceed max_records the least recently read finished jobs are dropped. A job that
+    alone exceeds max_records stops collecting and is marked truncated.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_HISTORY_JOBS_CONFIG, **(config or {})}
+        self.jobs: "OrderedDict[str, HistoryJob]" = OrderedDict()  # least recently read first
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config["workers"], thread_name_prefix="history-job"
+        )
+        self._held = 0  # records held over all jobs
+
+    def submit(self, chunks: Callable[[], Iterator[List[Dict[str, Any]]]]) -> HistoryJob:
+        """Start collecting the chunks of records produced by chunks() in the background"""
+        job = HistoryJob(str(uuid.uuid4()))
+        with self.lock:
+            self._expire()
+            self.jobs[job.job_id] = job
+        self.executor.submit(self._run, job, chunks)
+        return job
+
+    def get(self, job_id: str) -> Optional[HistoryJob]:
+        with self.lock:
+            self._expire()
+            job = self.jobs.get(job_id)
+            if job is not None:
+                self.jobs.move_to_end(job_id)
+            return job
+
+    def shutdown(self) -> None:
+        with self.lock:
+            for job in self.jobs.values():
+                job.cancelled = True
+        self.executor.shutdown(wait=False)
+
+    def _run(self, job: HistoryJob, chunks: Callable[[], Iterator[List[Dict[str, Any]]]]) -> None:
+        try:
+            for chunk in chunks():
+                if job.cancelled:
+                    break
+                with self.lock:
+                    if len(job.records) + len(chunk) > self.config["max_records"]:
+                        job.status = "truncated"
+                        job.message = f"Result exceeds {self.config['max_records']} records"
+                        break
+                    job.records.extend(chunk)
+                    self._held += len(chunk)
+                    self._evict()
+            else:
+                job.status = "complete"
+        except Exception as e:
+            print(f"History job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.message = str(e)
+        finally:
+            job.done.set()
+
+    def _expire(self) -> None:
+        """Drop finished jobs not read within ttl. Call with the lock held."""
+        now = time.monotonic()
+        for job_id, job in list(self.jobs.items()):
+            if job.done.is_set() and now - job.last_access > self.config["ttl"]:
+                self._drop(job_id)
+
+    def _evict(self) -> None:
+        """Drop the least recently read finished jobs while over max_records. Call with the lock held."""
+        for job_id, job in list(self.jobs.items()):
+            if self._held <= self.config["max_records"]:
+                return
+            if job.done.is_set():
+                self._drop(job_id)
+
+    def _drop(self, job_id: str) -> None:
+        job = self.jobs.pop(job_id)
+        job.cancelled = True
+        self._held -= len(job.records)
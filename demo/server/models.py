@@ -76,6 +76,14 @@ class ObjectInstance(ObjectInstanceMinimal):
     )
 
 
+# A page of Objects when /objects is called with limit or cursor
+class ObjectInstancePage(BaseModel):
+    objects: List[ObjectInstanceMinimal] | List[ObjectInstance]
+    cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, null after the last page"
+    )
+
+
 # RFC 4.2.1.1 - Last Known Value Response
 class LastKnownValue(BaseModel):
     elementId: str = Field(..., description="Unique string identifier for the element")
@@ -111,6 +119,20 @@ class HistoricalValue(BaseModel):
     )
 
 
+# RFC 4.2.1.1 - LastKnownValue of many elements
+class LastKnownValuesRequest(BaseModel):
+    elementIds: List[str]
+    maxDepth: int = Field(1, ge=0)  # 0 means infinite recursion, 1 means no recursion, >1 recurses to that depth
+
+
+# RFC 4.2.1.2 - HistoricalValue of many elements
+class HistoricalValuesRequest(BaseModel):
+    elementIds: List[str]
+    startTime: Optional[str] = None
+    endTime: Optional[str] = None
+    maxDepth: int = Field(1, ge=0)  # 0 means infinite recursion, 1 means no recursion, >1 recurses to that depth
+
+
 # RFC 4.2.2.1 - Object Element LastKnownValue
 class UpdateRequest(BaseModel):
     elementIds: List[str]
@@ -138,6 +160,17 @@ class HistoricalUpdateResult(BaseModel):
     message: str
 
 
+# 4.2.1.2 Aggregation of historical values into interval buckets
+class HistoryAggregate(str, Enum):
+    avg = "avg"
+    min = "min"
+    max = "max"
+    first = "first"
+    last = "last"
+    count = "count"
+    lttb = "lttb"  # Largest-Triangle-Three-Buckets downsampling, keeps real samples
+
+
 class QoSLevel(str, Enum):
     fire_and_forget = "QoS0"
     guaranteed_delivery = "QoS2"
@@ -157,6 +190,10 @@ class RegisterMonitoredItemsRequest(BaseModel):
     maxDepth: Optional[int] = 1  # 0 means infinite recursion, 1 means no recursion, >1 recurses to that depth
 
 
+class RemoveMonitoredItemsRequest(BaseModel):
+    elementIds: List[str]
+
+
 class SyncResponseItem(BaseModel):
     model_config = ConfigDict(extra='allow')  # Allow extra fields from record metadata
 
@@ -171,7 +208,7 @@ class UnsubscribeRequest(BaseModel):
 
 
 class SubscriptionSummary(BaseModel):
-    subscriptionId: int
+    subscriptionId: str
     qos: str
     created: str
 
@@ -1,17 +1,24 @@
-from fastapi import APIRouter, Path, Query, HTTPException, Request, Body, Depends
+from fastapi import APIRouter, Path, Query, HTTPException, Request, Body, Depends, Header
+from fastapi.responses import StreamingResponse, JSONResponse
 from typing import List, Optional, Any
+import json
 from urllib.parse import unquote
 from models import (
     ObjectInstanceMinimal,
     ObjectInstance,
+    ObjectInstancePage,
     HistoricalValue,
     ObjectType,
     UpdateResult,
     UpdateRequest,
     HistoricalUpdateResult,
     HistoricalValueUpdate,
+    HistoryAggregate,
+    LastKnownValuesRequest,
+    HistoricalValuesRequest,
 )
-from data_sources.data_interface import I3XDataSource
+from data_sources.data_interface import I3XDataSource, encode_cursor, decode_position_cursor
+from history_jobs import HistoryJob, HistoryJobs
 from datetime import datetime, timezone
 from .utils import getValue, getObject
 
@@ -19,19 +26,61 @@ explore = APIRouter(prefix="", tags=["Explore"])
 query = APIRouter(prefix="", tags=["Query"])
 update = APIRouter(prefix="", tags=["Update"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Page length when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 1000
+
 def get_data_source(request: Request) -> I3XDataSource:
     """Dependency to inject data source"""
     return request.app.state.data_source
 
 
+def get_history_jobs(request: Request) -> HistoryJobs:
+    """Dependency to inject the history job store"""
+    return request.app.state.HISTORY_JOBS
+
+
+def check_time_range(startTime: Optional[str], endTime: Optional[str]) -> None:
+    """Raise a 400 for a startTime or endTime that is not an ISO 8601 timestamp. History is
+    streamed or run as a job after the status is sent, so a bad range must fail up front."""
+    for timestamp in (startTime, endTime):
+        try:
+            if timestamp:
+                datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid timestamp '{timestamp}'")
+
+
+def history_job_page(job: HistoryJob, offset: int, limit: int) -> dict:
+    """A page of job records with the cursor and URL of the next page, both None after the last page"""
+    values, next_offset = job.page(offset, limit)
+    cursor = None if next_offset is None else encode_cursor(next_offset)
+    return {
+        "jobId": job.job_id,
+        "status": job.status,
+        "message": job.message,
+        "values": values,
+        "cursor": cursor,
+        "jobUrl": None if cursor is None else f"/history/jobs/{job.job_id}?cursor={cursor}",
+    }
+
+
 # RFC 4.1.5 - Instances of an Object Type
 @explore.get("/objects", summary="Get Objects")
 def get_objects(
     typeId: Optional[str] = Query(default=None),
     includeMetadata: bool = Query(default=False),
+    limit: Optional[int] = Query(default=None, gt=0, description="Objects per page"),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page"),
     data_source: I3XDataSource = Depends(get_data_source),
-) -> List[ObjectInstanceMinimal] | List[ObjectInstance]:
-    """Return all Objects. Optionally filter by TypeId"""
+) -> List[ObjectInstanceMinimal] | List[ObjectInstance] | ObjectInstancePage:
+    """Return all Objects. Optionally filter by TypeId. With limit or cursor, return one page of objects and the cursor of the next page, null after the last page."""
+    if limit is not None or cursor is not None:
+        try:
+            page, next_cursor = data_source.get_instances_page(typeId, limit or DEFAULT_PAGE_SIZE, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return ObjectInstancePage(objects=[getObject(i, includeMetadata) for i in page], cursor=next_cursor)
     instances = [getObject(i, includeMetadata) for i in data_source.get_instances(typeId)]
     return instances
       
@@ -96,7 +145,31 @@ def get_last_known_value(
         "value": value
     }
 
+# RFC 4.2.1.1 - Object Element LastKnownValue for many elements
+@query.post("/objects/value", summary="Get Last Known Values")
+def get_last_known_values(
+    request: LastKnownValuesRequest,
+    data_source: I3XDataSource = Depends(get_data_source),
+):
+    """Return the last known values of many Objects in one request, in the order of elementIds. Each item is as returned by /objects/{elementId}/value; an element that does not exist gives {"elementId": ..., "notFound": true}. maxDepth applies to every element."""
+    values = data_source.get_last_known_values(request.elementIds, request.maxDepth)
+    return [
+        {"elementId": element_id, "notFound": True} if value is None else value
+        for element_id, value in zip(request.elementIds, values)
+    ]
+
 # 4.2.2.1 Object Element LastKnownValue
+@update.put("/objects/value", summary="Update Values of Objects")
+def update_objects(
+    request: UpdateRequest,
+    data_source: I3XDataSource = Depends(get_data_source),
+) -> List[UpdateResult]:
+    """Update the values of many Objects in one request, values[i] being written to elementIds[i]. Returns an UpdateResult per write, in request order."""
+    if len(request.elementIds) != len(request.values):
+        raise HTTPException(status_code=400, detail="elementIds and values must have the same length")
+    return data_source.update_instance_values(request.elementIds, request.values)
+
+
 @update.put("/objects/{elementId}/value", summary="Update Value of Object")
 def update_object(
     elementId: str = Path(...),
@@ -115,9 +188,17 @@ def get_historical_values(
     startTime: Optional[str] = Query(default=None),
     endTime: Optional[str] = Query(default=None),
     maxDepth: int = Query(default=1, ge=0),
+    interval: Optional[float] = Query(default=None, gt=0, description="Bucket width in seconds for aggregate"),
+    aggregate: Optional[HistoryAggregate] = Query(default=None, description="Aggregate per interval bucket, avg if only interval is given"),
+    stream: bool = Query(default=False, description="Stream records as NDJSON, like Accept: application/x-ndjson"),
+    accept: Optional[str] = Header(default=None),
+    timeout: Optional[float] = Query(default=None, gt=0, description="Seconds to wait before answering with a partial result and a job URL"),
+    limit: Optional[int] = Query(default=None, gt=0, description="Records per page"),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page"),
     data_source: I3XDataSource = Depends(get_data_source),
+    history_jobs: HistoryJobs = Depends(get_history_jobs),
 ):
-    """Get the historical values for one or more Objects. If maxDepth=0, recursively includes all values from HasComponent children (infinite depth). Otherwise, recurses only to the specified depth (1=no recursion, just this element)."""
+    """Get the historical values for one or more Objects. If maxDepth=0, recursively includes all values from HasComponent children (infinite depth). Otherwise, recurses only to the specified depth (1=no recursion, just this element). With interval, values are aggregated into buckets of interval seconds, each with the bucket start as its timestamp. With stream=true or Accept: application/x-ndjson, records are streamed one JSON object per line, each with its elementId. With timeout, the query runs as a job: the response holds the first page of records, each with its elementId, and a jobUrl to fetch the rest from while the job keeps running. With limit or cursor, the response holds one page of records, each with its elementId, and the cursor of the next page, null after the last page."""
     elementId = unquote(elementId)
 
      # Lookup instance to verify it exists
@@ -125,14 +206,147 @@ def get_historical_values(
     if not instance:
         raise HTTPException(status_code=404, detail=f"Element '{elementId}' not found")
 
+    check_time_range(startTime, endTime)
+    if aggregate is not None and interval is None:
+        raise HTTPException(status_code=400, detail="aggregate requires an interval")
+    paged = limit is not None or cursor is not None
+    if paged and interval is not None and timeout is None:
+        raise HTTPException(status_code=400, detail="limit and cursor do not apply to aggregated history")
+    streamed = stream or bool(accept and NDJSON_MEDIA_TYPE in accept)
+    if paged and streamed:
+        raise HTTPException(status_code=400, detail="limit and cursor do not apply to streamed history")
+    if cursor is not None and timeout is not None:
+        raise HTTPException(status_code=400, detail="Page a history job through its jobUrl")
+    if streamed and timeout is not None:
+        raise HTTPException(status_code=400, detail="History jobs are paged, not streamed")
+    if timeout is not None:
+        job = history_jobs.submit(
+            lambda: data_source.iter_instance_history(
+                elementId, startTime, endTime, maxDepth, interval, aggregate.value if aggregate else None
+            )
+        )
+        job.done.wait(timeout)
+        return history_job_page(job, 0, limit or history_jobs.config["page_size"])
+    if paged:
+        # The data source seeks to the cursor, so each page costs the same however deep it is
+        try:
+            values, next_cursor = data_source.get_instance_history_page(
+                elementId, startTime, endTime, maxDepth, limit or DEFAULT_PAGE_SIZE, cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"values": values, "cursor": next_cursor}
+    if streamed:
+        chunks = data_source.iter_instance_history(
+            elementId, startTime, endTime, maxDepth, interval, aggregate.value if aggregate else None
+        )
+        # Serialized chunk by chunk as the client reads, so the full history is never held
+        return StreamingResponse(
+            ("".join(json.dumps(record) + "\n" for record in chunk) for chunk in chunks),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    if interval is not None:
+        # The data source aggregates where the history is stored
+        try:
+            return data_source.get_aggregated_values_by_id(
+                elementId, startTime, endTime, interval, (aggregate or HistoryAggregate.avg).value, maxDepth
+            )
+        except NotImplementedError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+
     # Get historical data with optional recursion based on maxDepth
     # returnHistory=True ensures all values are returned when no time range is specified
     historical_values = data_source.get_instance_values_by_id(elementId, startTime, endTime, maxDepth, returnHistory=True)
 
     return historical_values
 
+# RFC 4.2.1.2 - Object Element HistoricalValue for many elements
+@query.post("/objects/history", response_model=Any, summary="Get Historical Values of Many Objects")
+def get_many_historical_values(
+    request: HistoricalValuesRequest,
+    stream: bool = Query(default=False, description="Stream records as NDJSON, like Accept: application/x-ndjson"),
+    accept: Optional[str] = Header(default=None),
+    data_source: I3XDataSource = Depends(get_data_source),
+):
+    """Get the historical values of many Objects in one request, with a shared startTime, endTime and maxDepth. Returns an array of arrays in the order of elementIds, each holding the records of that element and its HasComponent children as maxDepth allows, each record with its elementId; an element that does not exist gives {"elementId": ..., "notFound": true}. With stream=true or Accept: application/x-ndjson, the records are streamed one JSON object per line in the same order, with not found elements as their marker."""
+    check_time_range(request.startTime, request.endTime)
+    histories = data_source.iter_histories(request.elementIds, request.startTime, request.endTime, request.maxDepth)
+    if stream or (accept and NDJSON_MEDIA_TYPE in accept):
+        def lines():
+            for position, chunk in histories:
+                if chunk is None:
+                    yield json.dumps({"elementId": request.elementIds[position], "notFound": True}) + "\n"
+                else:
+                    yield "".join(json.dumps(record) + "\n" for record in chunk)
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    results: List[Any] = [[] for _ in request.elementIds]
+    for position, chunk in histories:
+        if chunk is None:
+            results[position] = {"elementId": request.elementIds[position], "notFound": True}
+        else:
+            results[position].extend(chunk)
+    # The records are plain JSON values, so they skip the response model encoding
+    return JSONResponse(results)
+
+# RFC 5.4 - Partial history results
+@query.get("/history/jobs/{jobId}", summary="Get History Job Results")
+def get_history_job(
+    jobId: str = Path(...),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page, the first page if not given"),
+    limit: Optional[int] = Query(default=None, gt=0, description="Records per page"),
+    history_jobs: HistoryJobs = Depends(get_history_jobs),
+):
+    """Get a page of the records of a history job started with /objects/{elementId}/history?timeout=. While the job runs, a page may hold fewer records than limit; poll the jobUrl for more. The cursor and jobUrl are null after the last page."""
+    job = history_jobs.get(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"History job '{jobId}' not found or expired")
+    try:
+        offset = decode_position_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return history_job_page(job, offset, limit or history_jobs.config["page_size"])
+
+
+def write_history(data_source: I3XDataSource, updates: List[dict]) -> List[dict]:
+    """Write historical values through the data source, 501 if it does not support history writes"""
+    try:
+        return data_source.update_instance_history(updates)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+
+# RFC 4.2.2.2 - Object Element HistoricalValue for many elements
+@update.put("/objects/history", response_model=List[HistoricalUpdateResult], summary="Update Historical Values of Many Objects")
+def update_objects_history(
+    updates: List[HistoricalValueUpdate],
+    data_source: I3XDataSource = Depends(get_data_source),
+):
+    """Write historical values of many Objects in one request. Values are merged into each element's history in time order, so backfilled values land between the existing ones; values older than the history retained for an element are not stored. Returns a HistoricalUpdateResult per value, in request order."""
+    return JSONResponse(write_history(data_source, [update.model_dump() for update in updates]))
+
+
 # RFC 4.2.2.2 - Object Element HistoricalValue
-@update.put("/objects/{elementId}/history", summary="Update Historical Values of Object")
-def update_object_history(elementId: str = Path(...),data_source: I3XDataSource = Depends(get_data_source)):
-    """Update the historical values for one or more Objects"""
-    raise HTTPException(status_code=501, detail="Operation not implemented")
+@update.put("/objects/{elementId}/history", response_model=List[HistoricalUpdateResult], summary="Update Historical Values of Object")
+def update_object_history(
+    elementId: str = Path(...),
+    updates: List[HistoricalValueUpdate] = Body(...),
+    data_source: I3XDataSource = Depends(get_data_source),
+):
+    """Write historical values of an Object, as PUT /objects/history. Values whose elementId is not the one in the path fail."""
+    elementId = unquote(elementId)
+    if not data_source.get_instance_by_id(elementId):
+        raise HTTPException(status_code=404, detail=f"Element '{elementId}' not found")
+    updates = [update.model_dump() for update in updates]
+    written = iter(write_history(data_source, [update for update in updates if update["elementId"] == elementId]))
+    results = [
+        next(written) if update["elementId"] == elementId else {
+            "elementId": update["elementId"],
+            "timestamp": update["timestamp"],
+            "success": False,
+            "message": f"Value is not for element '{elementId}'",
+        }
+        for update in updates
+    ]
+    return JSONResponse(results)
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Request, Path
 from fastapi.responses import StreamingResponse
-from typing import List, Optional, Any, Callable
+from typing import List, Optional, Any, Callable, Set
 from datetime import datetime, timezone
 import asyncio
 import json
 import time
 from pydantic import BaseModel, Field, ConfigDict
 from models import CreateSubscriptionRequest, CreateSubscriptionResponse
-from models import RegisterMonitoredItemsRequest, SyncResponseItem
+from models import RegisterMonitoredItemsRequest, RemoveMonitoredItemsRequest, SyncResponseItem
 from models import GetSubscriptionsResponse, SubscriptionSummary
 from data_sources.data_interface import I3XDataSource
 from .utils import getSubscriptionValue
@@ -15,14 +15,14 @@ from .utils import getSubscriptionValue
 
 # Not required, but showing what information is stored for simulated subscriptions
 class Subscription(BaseModel):
-    subscriptionId: int
+    subscriptionId: str
     qos: str
     created: str
     maxDepth: int = 1  # Depth to follow HasComponent relationships (0=infinite, 1=no recursion, N=recurse N levels)
-    monitoredItems: List[str] = []
+    monitoredItems: Set[str] = set()
     pendingUpdates: List[Any] = []  # For QoS2, list of values to send
     # Exclude these fields from JSON serialization/schema
-    handler: Callable[[Any], None] | None = Field(exclude=True, default=None)
+    handler: Callable[[bytes], None] | None = Field(exclude=True, default=None)  # gets encoded QoS0 stream lines
     event_loop: Any | None = Field(exclude=True, default=None)
     streaming_response: StreamingResponse | None = Field(exclude=True, default=None)
     model_config = ConfigDict(
@@ -38,6 +38,14 @@ def get_data_source(request: Request) -> I3XDataSource:
     return request.app.state.data_source
 
 
+def get_subscription(request: Request, subscriptionId: str) -> Subscription:
+    """Return the subscription with subscriptionId, 404 if there is none"""
+    sub = request.app.state.I3X_DATA_SUBSCRIPTIONS.get(subscriptionId)
+    if not sub:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    return sub
+
+
 # RFC 4.2.3.1 - Create Subscription
 @subs.post("/subscriptions", response_model=CreateSubscriptionResponse)
 def create_subscription(request: Request, subscription: CreateSubscriptionRequest):
@@ -50,14 +58,14 @@ def create_subscription(request: Request, subscription: CreateSubscriptionReques
             detail="Unsupported QoS level. Only QoS0 and QoS2 are supported.",
         )
 
-    # For now make the subscription ID a simple index to make manual testing easy, but should be a UUID
-    subscriptionId = str(len(request.app.state.I3X_DATA_SUBSCRIPTIONS))
+    subscriptions = request.app.state.I3X_DATA_SUBSCRIPTIONS
+    subscriptionId = subscriptions.new_id()
     new_sub = Subscription(
         subscriptionId=subscriptionId,
         qos=subscription.qos,
         created=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
     )
-    request.app.state.I3X_DATA_SUBSCRIPTIONS.append(new_sub)
+    subscriptions.add(subscriptionId, new_sub)
 
     return CreateSubscriptionResponse(
         subscriptionId=subscriptionId, message="Subscription created successfully"
@@ -69,16 +77,7 @@ def create_subscription(request: Request, subscription: CreateSubscriptionReques
 async def register_monitored_items(
     request: Request, subscriptionId: str, req: RegisterMonitoredItemsRequest
 ):
-    sub = next(
-        (
-            s
-            for s in request.app.state.I3X_DATA_SUBSCRIPTIONS
-            if str(s.subscriptionId) == str(subscriptionId)
-        ),
-        None,
-    )
-    if not sub:
-        raise HTTPException(status_code=404, detail="Subscription not found")
+    sub = get_subscription(request, subscriptionId)
 
     # Get data source
     data_source = request.app.state.data_source
@@ -90,21 +89,15 @@ async def register_monitored_items(
             status_code=404, detail=f"Invalid elementIds: {', '.join(invalid)}"
         )
 
-    # Collect all monitored elementIds including descendants
-    all_element_ids = set()
-    for eid in req.elementIds:
-        tree = collect_instance_tree(
-            eid, req.maxDepth, 0, data_source.get_all_instances()
-        )
-        all_element_ids.update([i["elementId"] for i in tree])
+    # Collect all monitored elementIds including descendants, in one walk of the parent index
+    all_element_ids = {i["elementId"] for i in data_source.get_instance_trees(req.elementIds, req.maxDepth)}
 
     # Update the subscription
     # Store maxDepth preference from the request
     sub.maxDepth = req.maxDepth
-    # TODO right now this is additive, currently need to call delete and re-create the subscription entirely to remove items.
-    for eid in all_element_ids:
-        if eid not in sub.monitoredItems:
-            sub.monitoredItems.append(eid)
+    # Registration is additive; items are removed with DELETE /subscriptions/{subscriptionId}/objects
+    sub.monitoredItems.update(all_element_ids)
+    request.app.state.I3X_DATA_SUBSCRIPTIONS.watch(subscriptionId, all_element_ids)
 
     # QoS0 setup
     if sub.qos == "QoS0":
@@ -119,13 +112,11 @@ async def register_monitored_items(
 
         async def event_stream():
             while True:
-                update = await queue.get()
-                # Remove None values to match QoS2 behavior
-                filtered_update = {k: v for k, v in update.items() if v is not None}
-                yield json.dumps([filtered_update]) + "\n"
+                # Updates arrive already encoded, shared with every other stream receiving them
+                yield await queue.get()
 
-        def push_update_to_client(update):
-            asyncio.run_coroutine_threadsafe(queue.put(update), loop)
+        def push_update_to_client(data: bytes):
+            loop.call_soon_threadsafe(queue.put_nowait, data)
 
         sub.handler = push_update_to_client
         sub.event_loop = loop
@@ -142,7 +133,31 @@ async def register_monitored_items(
         }
 
 
-# RFC 4.2.3.3 Sync
+# RFC 4.2.3.3 - Remove Monitored Items
+@subs.delete("/subscriptions/{subscriptionId}/objects")
+def remove_monitored_items(
+    request: Request, subscriptionId: str, req: RemoveMonitoredItemsRequest
+):
+    """Stop monitoring elementIds, and the HasComponent children registered with them, in a subscription"""
+    sub = get_subscription(request, subscriptionId)
+    data_source = request.app.state.data_source
+
+    removed = [eid for eid in req.elementIds if eid in sub.monitoredItems]
+    not_found = [eid for eid in req.elementIds if eid not in sub.monitoredItems]
+    # Children were registered with the subscription's maxDepth, so they are removed the same way
+    element_ids = {i["elementId"] for i in data_source.get_instance_trees(removed, sub.maxDepth)}
+
+    request.app.state.I3X_DATA_SUBSCRIPTIONS.unwatch(subscriptionId, element_ids)
+    sub.monitoredItems.difference_update(element_ids)
+
+    return {
+        "message": "Monitored items removed.",
+        "removed": removed,
+        "not_found": not_found,
+    }
+
+
+# RFC 4.2.3.4 Sync
 @subs.post(
     "/subscriptions/{subscriptionId}/sync",
     response_model=List[SyncResponseItem],
@@ -151,17 +166,7 @@ async def register_monitored_items(
 def sync_qos2(request: Request, subscriptionId: str):
     """Sync changes for a QoS 2 subscription"""
 
-    # Locate the subscription
-    sub = next(
-        (
-            s
-            for s in request.app.state.I3X_DATA_SUBSCRIPTIONS
-            if str(s.subscriptionId) == str(subscriptionId)
-        ),
-        None,
-    )
-    if not sub:
-        raise HTTPException(status_code=404, detail="Subscription not found")
+    sub = get_subscription(request, subscriptionId)
 
     if sub.qos != "QoS2":
         raise HTTPException(
@@ -173,23 +178,15 @@ def sync_qos2(request: Request, subscriptionId: str):
     return response
 
 
-# 4.2.3.4 Unsubscribe by SubscriptionId
+# 4.2.3.5 Unsubscribe by SubscriptionId
 @subs.delete("/subscriptions/{subscriptionId}")
 def delete_subscription(request: Request, subscriptionId: str):
     removed = []
     not_found = []
 
-    index = next(
-        (
-            i
-            for i, s in enumerate(request.app.state.I3X_DATA_SUBSCRIPTIONS)
-            if str(s.subscriptionId) == str(subscriptionId)
-        ),
-        None,
-    )
-    if index is not None:
-        removed.append(request.app.state.I3X_DATA_SUBSCRIPTIONS[index].subscriptionId)
-        request.app.state.I3X_DATA_SUBSCRIPTIONS.pop(index)
+    sub = request.app.state.I3X_DATA_SUBSCRIPTIONS.remove(subscriptionId)
+    if sub is not None:
+        removed.append(sub.subscriptionId)
     else:
         not_found.append(subscriptionId)
 
@@ -204,58 +201,128 @@ def delete_subscription(request: Request, subscriptionId: str):
 # If QoS is QoS0, it will call the handler immediately to send updates
 # if QoS is QoS2, it will store the updates in a pending dictionary to be sent on the /sync call
 def handle_data_source_update(instance, value, I3X_DATA_SUBSCRIPTIONS, data_source):
-    """Route updates from data sources to active subscriptions"""
+    """Route an update from a data source to active subscriptions"""
+    handle_data_source_updates([(instance, value)], I3X_DATA_SUBSCRIPTIONS, data_source)
+
+
+def composition_parents(instance, data_source):
+    """Return the instances that have instance as a HasComponent child, the relationship
+    recursive values are built over. Candidates are its parentId and ComponentOf targets;
+    a parent that only has it as HasChildren, like equipment and its sensors, is not one."""
+    element_id = instance["elementId"]
+    component_of = instance.get("relationships", {}).get("ComponentOf", [])
+    if isinstance(component_of, str):
+        component_of = [component_of]
+    parents = []
+    for parent_id in dict.fromkeys([instance.get("parentId"), *component_of]):
+        parent = data_source.get_instance_by_id(parent_id) if parent_id else None
+        if parent is None:
+            continue
+        children = parent.get("relationships", {}).get("HasComponent", [])
+        if element_id == children or (isinstance(children, list) and element_id in children):
+            parents.append(parent)
+    return parents
+
+
+def handle_data_source_updates(changes, I3X_DATA_SUBSCRIPTIONS, data_source):
+    """Route a batch of (instance, value) updates from a data source to active subscriptions
+
+    Each update goes to the subscriptions monitoring its element. It is also propagated up
+    the HasComponent relationships: a composition ancestor monitored with a maxDepth that
+    reaches the changed element gets an update with its recursive value. That value is built once per
+    batch for each ancestor and maxDepth, however many of its descendants changed. An ancestor
+    that changed itself in the batch already had its recursive value sent with its own update.
+    """
     try:
-        # Iterate through all active subscriptions
-        for sub in I3X_DATA_SUBSCRIPTIONS:
-            if not sub.monitoredItems:
-                continue
-
-            # Check if this update is for a monitored element
+        # Composition ancestors of the changed elements -> distance to the nearest changed descendant
+        ancestors = {}
+        changed = set()
+        for instance, value in changes:
             element_id = instance.get("elementId")
-            if element_id and element_id in sub.monitoredItems:
-
-                # Get the payload using the subscription's maxDepth preference
-                updateValue = getSubscriptionValue(instance, value, maxDepth=sub.maxDepth, data_source=data_source)
-
-
-                if sub.qos == "QoS0":
-                    # Immediate delivery via handler
-                    if sub.handler:
-                        try:
-                            sub.handler(updateValue)
-                        except Exception as e:
-                            print(f"[QoS0] Handler error: {e}")
-                elif sub.qos == "QoS2":
-                    # Queue for later sync
-                    sub.pendingUpdates.append(updateValue)
+            if not element_id:
+                continue
+            changed.add(element_id)
+            dispatch_update(
+                I3X_DATA_SUBSCRIPTIONS.watching(element_id),
+                lambda maxDepth: getSubscriptionValue(instance, value, maxDepth=maxDepth, data_source=data_source),
+            )
+
+            pending = [(instance, 1)]
+            while pending:
+                child, distance = pending.pop()
+                for parent in composition_parents(child, data_source):
+                    # An ancestor already reached as close has had its own ancestors recorded too
+                    if ancestors.get(parent["elementId"], distance + 1) > distance:
+                        ancestors[parent["elementId"]] = distance
+                        pending.append((parent, distance + 1))
+
+        for ancestor_id, distance in ancestors.items():
+            if ancestor_id in changed:
+                continue
+            subscribers = [
+                sub
+                for sub in I3X_DATA_SUBSCRIPTIONS.watching(ancestor_id)
+                if sub.maxDepth == 0 or distance < sub.maxDepth
+            ]
+            if subscribers:
+                ancestor = data_source.get_instance_by_id(ancestor_id)
+                dispatch_update(
+                    subscribers,
+                    lambda maxDepth: getSubscriptionValue(ancestor, None, maxDepth=maxDepth, data_source=data_source),
+                )
     except Exception as e:
         import traceback
         print(f"Error routing data source update: {e}\n{traceback.format_exc()}")
 
 
+def encode_stream_update(update) -> bytes:
+    """Encode an update as one line of a QoS0 stream"""
+    # Remove None values to match QoS2 behavior
+    return (json.dumps([{k: v for k, v in update.items() if v is not None}]) + "\n").encode()
+
+
+def dispatch_update(subscribers, build_update):
+    """Deliver an update to subscribers, building it with build_update(maxDepth) once per maxDepth.
+    QoS0 streams are handed one shared encoding of it per maxDepth."""
+    updates = {}
+    encoded = {}
+    for sub in subscribers:
+        updateValue = updates.get(sub.maxDepth)
+        if updateValue is None:
+            updateValue = updates[sub.maxDepth] = build_update(sub.maxDepth)
+
+        if sub.qos == "QoS0":
+            # Immediate delivery via handler
+            if sub.handler:
+                data = encoded.get(sub.maxDepth)
+                if data is None:
+                    data = encoded[sub.maxDepth] = encode_stream_update(updateValue)
+                try:
+                    sub.handler(data)
+                except Exception as e:
+                    print(f"[QoS0] Handler error: {e}")
+        elif sub.qos == "QoS2":
+            # Queue for later sync
+            sub.pendingUpdates.append(updateValue)
+
+
+class SubscriptionDispatcher:
+    """Data source update callback routing updates to subscriptions, a batch at a time when
+    the data source reports them in batches (see notify_updates)"""
+
+    def __init__(self, I3X_DATA_SUBSCRIPTIONS, data_source):
+        self.subscriptions = I3X_DATA_SUBSCRIPTIONS
+        self.data_source = data_source
+
+    def __call__(self, instance, value):
+        handle_data_source_update(instance, value, self.subscriptions, self.data_source)
+
+    def batch(self, changes):
+        handle_data_source_updates(changes, self.subscriptions, self.data_source)
+
+
 def subscription_worker(I3X_DATA_SUBSCRIPTIONS, running_flag):
     """Subscription worker thread - now just keeps the thread alive for QoS0 streaming"""
     while running_flag["running"]:
         # Just sleep - updates now come via callback from data sources
         time.sleep(1)
-
-
-# Recursively collect an instance tree starting from root_id
-## TODO this should probably be a utility used by exploratory/browse as well?
-def collect_instance_tree(
-    root_id: str, max_depth: int = 0, depth: int = 0, instances=[]
-):
-    collected = []
-    for inst in instances:
-        if inst["elementId"] == root_id:
-            collected.append(inst)
-            if inst.get("isComposition") and (max_depth == 0 or depth < max_depth):
-                children = [i for i in instances if i.get("parentId") == root_id]
-                for child in children:
-                    collected.extend(
-                        collect_instance_tree(
-                            child["elementId"], max_depth, depth + 1, instances
-                        )
-                    )
-    return collected
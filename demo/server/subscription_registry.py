@@ -0,0 +1,109 @@
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+
+class SubscriptionRegistry:
+    """Subscriptions by subscriptionId, shared by request handlers and the data source update thread
+
+    Ids are random UUIDs, so an id is never reused after a delete. Lookup, insert and delete
+    are dict operations under one lock. Iterating goes over a snapshot, so subscriptions
+    created or deleted meanwhile do not disturb a running update.
+
+    An inverted index maps each monitored elementId to the subscriptions watching it, so an
+    update is dispatched to its subscribers without looking at any other subscription.
+    Watching and unwatching change one dict entry per element. watching() hands out a tuple
+    of an element's subscriptions, built on the first call after a change and then reused,
+    so it is a lock-free dict lookup and a tuple handed out is never changed under the caller.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._subscriptions: Dict[str, Any] = {}
+        self._snapshot: Optional[Tuple[Any, ...]] = None  # rebuilt on the first iteration after a change
+        self._watchers: Dict[str, Dict[str, Any]] = {}  # elementId -> subscriptionId -> subscription
+        self._watcher_snapshots: Dict[str, Tuple[Any, ...]] = {}  # elementId -> tuple of its watchers
+        self._watched: Dict[str, Set[str]] = {}  # subscriptionId -> elementIds it watches
+
+    @staticmethod
+    def new_id() -> str:
+        return str(uuid.uuid4())
+
+    def add(self, subscription_id: str, subscription: Any) -> None:
+        with self.lock:
+            if subscription_id in self._subscriptions:
+                raise ValueError(f"Subscription '{subscription_id}' already exists")
+            self._subscriptions[subscription_id] = subscription
+            self._snapshot = None
+
+    def get(self, subscription_id: str) -> Optional[Any]:
+        return self._subscriptions.get(subscription_id)
+
+    def remove(self, subscription_id: str) -> Optional[Any]:
+        """Remove a subscription and return it, or None if there is none with that id"""
+        with self.lock:
+            subscription = self._subscriptions.pop(subscription_id, None)
+            if subscription is not None:
+                self._snapshot = None
+                self._unwatch(subscription_id, self._watched.pop(subscription_id, set()))
+            return subscription
+
+    def watch(self, subscription_id: str, element_ids: Iterable[str]) -> None:
+        """Add element_ids to the elements a subscription is dispatched updates of"""
+        with self.lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return
+            watched = self._watched.setdefault(subscription_id, set())
+            for element_id in element_ids:
+                if element_id not in watched:
+                    watched.add(element_id)
+                    self._watchers.setdefault(element_id, {})[subscription_id] = subscription
+                    self._watcher_snapshots.pop(element_id, None)
+
+    def unwatch(self, subscription_id: str, element_ids: Iterable[str]) -> None:
+        """Stop dispatching updates of element_ids to a subscription"""
+        with self.lock:
+            watched = self._watched.get(subscription_id)
+            if watched is None:
+                return
+            removed = watched.intersection(element_ids)
+            watched.difference_update(removed)
+            self._unwatch(subscription_id, removed)
+
+    def watching(self, element_id: str) -> Tuple[Any, ...]:
+        """Return the subscriptions watching element_id"""
+        snapshot = self._watcher_snapshots.get(element_id)
+        if snapshot is None:
+            if element_id not in self._watchers:
+                return ()
+            with self.lock:
+                watchers = self._watchers.get(element_id)
+                if watchers is None:
+                    return ()
+                snapshot = self._watcher_snapshots[element_id] = tuple(watchers.values())
+        return snapshot
+
+    def _unwatch(self, subscription_id: str, element_ids: Iterable[str]) -> None:
+        """Drop a subscription from the watchers of element_ids. Call with the lock held."""
+        for element_id in element_ids:
+            watchers = self._watchers.get(element_id)
+            if watchers is None:
+                continue
+            watchers.pop(subscription_id, None)
+            if not watchers:
+                del self._watchers[element_id]
+            self._watcher_snapshots.pop(element_id, None)
+
+    def __iter__(self) -> Iterator[Any]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self.lock:
+                snapshot = self._snapshot = tuple(self._subscriptions.values())
+        return iter(snapshot)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __contains__(self, subscription_id: str) -> bool:
+        return subscription_id in self._subscriptions
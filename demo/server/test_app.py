@@ -1,7 +1,21 @@
 import unittest
+import copy
 import json
+import os
+import tempfile
+import io
+import contextlib
 from fastapi.testclient import TestClient
 from app import app
+from data_sources.mock.mock_data import I3X_DATA
+from data_sources.mock.mock_data_source import MockDataSource
+from data_sources.mock.mock_generator import generate_plant
+from data_sources.mock.record_series import RecordSeries, parse_timestamp
+from data_sources.mock.type_registry import TypeRegistry
+from data_sources.data_interface import I3XDataSource, notify_updates, walk_instance_trees
+from history_jobs import HistoryJobs
+from routers.subscriptions import Subscription, SubscriptionDispatcher, handle_data_source_update
+from subscription_registry import SubscriptionRegistry
 from models import Namespace, ObjectType, ObjectInstanceMinimal
 import threading
 import time
@@ -43,6 +57,13 @@ class TestI3XEndpoints(unittest.TestCase):
         response = self.client.get("/objecttypes/non-existent")
         self.assertEqual(response.status_code, 404)
 
+        # $refs in the Namespaces files are resolved into the schema
+        response = self.client.get("/objecttypes/measurement-type")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["schema"]["properties"]["!value"]["type"], "number")
+
     def test_instances_endpoint(self):
         """Test RFC 4.1.6 - Instances of an Object Type"""
         response = self.client.get("/objects")
@@ -50,6 +71,15 @@ class TestI3XEndpoints(unittest.TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+        # Filter by type
+        response = self.client.get("/objects?typeId=work-unit-type")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(i["elementId"] for i in data), ["pump-101", "tank-201"]
+        )
+
     def test_object_definition_endpoint(self):
         """Test RFC 4.1.8 - Object Definition"""
         response = self.client.get("/objects/pump-101")
@@ -61,6 +91,24 @@ class TestI3XEndpoints(unittest.TestCase):
         response = self.client.get("/objects/non-existent")
         self.assertEqual(response.status_code, 404)
 
+    def test_related_objects_endpoint(self):
+        """Test RFC 4.1.6 - Objects linked by Relationship Type"""
+        response = self.client.get("/objects/tank-201/related?relationshiptype=SuppliedBy")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i["elementId"] for i in data], ["pump-101"])
+
+        # Inverse relationships are answered even when only declared on the other object
+        response = self.client.get("/objects/pump-101/related?relationshiptype=HasChildren")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(i["elementId"] for i in data),
+            ["pump-101-measurements", "pump-101-production"],
+        )
+
     def test_last_known_value_endpoint(self):
         """Test RFC 4.2.1.1 - Object Element LastKnownValue"""
         response = self.client.get("/objects/sensor-001/value")
@@ -73,6 +121,183 @@ class TestI3XEndpoints(unittest.TestCase):
         data = response.json()
         self.assertEqual(response.status_code, 200)
 
+    def test_historical_values_aggregate(self):
+        """Test RFC 4.2.1.2 - HistoricalValue aggregated into interval buckets"""
+        response = self.client.get("/objects/sensor-001/history?interval=86400&aggregate=count")
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(bucket["timestamp"].endswith("T00:00:00Z") for bucket in data))
+        # One seed record per day
+        counts = {bucket["timestamp"]: bucket["value"] for bucket in data}
+        self.assertEqual(counts["2025-10-27T00:00:00Z"], 1)
+
+        response = self.client.get("/objects/sensor-001/history?aggregate=avg")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/objects/sensor-001/history?interval=60&aggregate=median")
+        self.assertEqual(response.status_code, 422)
+
+    def test_historical_values_stream(self):
+        """Test RFC 4.2.1.2 - HistoricalValue streamed as NDJSON"""
+        url = "/objects/sensor-001/history?startTime=2025-10-26T00:00:00Z&endTime=2025-10-28T23:59:59Z"
+        expected = self.client.get(url).json()
+
+        response = self.client.get(url, headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([{k: v for k, v in line.items() if k != "elementId"} for line in lines], expected)
+        self.assertTrue(all(line["elementId"] == "sensor-001" for line in lines))
+
+        # Composed children follow their parent, each record tagged with its element
+        response = self.client.get("/objects/pump-101/history?maxDepth=0&stream=true")
+        self.assertEqual(response.status_code, 200)
+        element_ids = {json.loads(line)["elementId"] for line in response.text.splitlines()}
+        self.assertIn("pump-101-measurements-bearing-temperature-value", element_ids)
+
+        # An invalid time range is rejected before any history is read, however it is read
+        url = "/objects/sensor-001/history?startTime=yesterday&endTime=2025-10-28T23:59:59Z"
+        for mode in ("", "&stream=true", "&interval=60", "&limit=2", "&timeout=5"):
+            self.assertEqual(self.client.get(url + mode).status_code, 400, mode)
+        response = self.client.post("/objects/history?stream=true", json={"elementIds": ["sensor-001"], "endTime": "tomorrow"})
+        self.assertEqual(response.status_code, 400)
+        # History jobs are paged, not streamed
+        self.assertEqual(self.client.get("/objects/sensor-001/history?stream=true&timeout=5").status_code, 400)
+
+    def test_historical_values_job(self):
+        """Test RFC 5.4 - partial history results paged from a job"""
+        url = "/objects/pump-101/history?maxDepth=0&startTime=2025-10-26T00:00:00Z&endTime=2025-10-28T23:59:59Z"
+        expected = [json.loads(line) for line in self.client.get(url + "&stream=true").text.splitlines()]
+
+        response = self.client.get(url + "&timeout=5")
+        self.assertEqual(response.status_code, 200)
+        job_id = response.json()["jobId"]
+
+        # Page through the job, two records at a time
+        records = []
+        cursor = None
+        while True:
+            params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+            page = self.client.get(f"/history/jobs/{job_id}", params=params).json()
+            self.assertEqual(page["status"], "complete")
+            self.assertLessEqual(len(page["values"]), 2)
+            records.extend(page["values"])
+            cursor = page["cursor"]
+            if cursor is None:
+                self.assertIsNone(page["jobUrl"])
+                break
+            self.assertEqual(page["jobUrl"], f"/history/jobs/{job_id}?cursor={cursor}")
+        self.assertEqual(records, expected)
+
+        self.assertEqual(self.client.get("/history/jobs/unknown").status_code, 404)
+        self.assertEqual(self.client.get(f"/history/jobs/{job_id}?cursor=x").status_code, 400)
+        self.assertEqual(self.client.get(f"/history/jobs/{job_id}?cursor=LTE").status_code, 400)  # -1
+
+    def test_last_known_values_batch(self):
+        """Test RFC 4.2.1.1 - LastKnownValue of many elements"""
+        element_ids = ["pump-101", "missing-element", "sensor-001"]
+        response = self.client.post("/objects/value", json={"elementIds": element_ids, "maxDepth": 0})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item["elementId"] for item in data], element_ids)
+        self.assertEqual(data[1], {"elementId": "missing-element", "notFound": True})
+        self.assertTrue(data[0]["isComposition"])
+        self.assertIn("pump-101-state", data[0]["value"])
+        self.assertEqual(set(data[2]), {"elementId", "isComposition", "value"})
+
+    def test_update_values_batch(self):
+        """Test RFC 4.2.2.1 - LastKnownValue writes to many elements"""
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        response = self.client.put(
+            "/objects/value",
+            json={"elementIds": [leaf, "missing-element", leaf], "values": [55.5, 1, "not a number"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["elementId"] for r in results], [leaf, "missing-element", leaf])
+        self.assertEqual([r["success"] for r in results], [True, False, False])
+
+        response = self.client.put("/objects/value", json={"elementIds": [leaf], "values": []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_historical_values_batch(self):
+        """Test RFC 4.2.1.2 - HistoricalValue of many elements"""
+        query = {"startTime": "2025-10-26T00:00:00Z", "endTime": "2025-10-28T23:59:59Z", "maxDepth": 0}
+        element_ids = ["sensor-001", "missing-element", "pump-101"]
+        expected = [
+            [json.loads(line) for line in self.client.get(f"/objects/{element_id}/history", params={**query, "stream": "true"}).text.splitlines()]
+            for element_id in ("sensor-001", "pump-101")
+        ]
+
+        response = self.client.post("/objects/history", json={"elementIds": element_ids, **query})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data, [expected[0], {"elementId": "missing-element", "notFound": True}, expected[1]])
+
+        response = self.client.post("/objects/history?stream=true", json={"elementIds": element_ids, **query})
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines, expected[0] + [{"elementId": "missing-element", "notFound": True}] + expected[1])
+
+    def test_update_historical_values(self):
+        """Test RFC 4.2.2.2 - HistoricalValue writes"""
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        updates = [
+            {"elementId": leaf, "timestamp": "2025-10-27T06:00:00Z", "value": 64.5},
+            {"elementId": leaf, "timestamp": "yesterday", "value": 64.0},
+            {"elementId": "missing-element", "timestamp": "2025-10-27T06:00:00Z", "value": 1.0},
+        ]
+        response = self.client.put("/objects/history", json=updates)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r["timestamp"] for r in results], [u["timestamp"] for u in updates])
+        self.assertEqual([r["success"] for r in results], [True, False, False])
+        self.assertEqual(results[1]["message"], "Invalid timestamp")
+
+        # The backfilled value lands in time order, with the timestamp as written
+        history = self.client.get(
+            f"/objects/{leaf}/history", params={"startTime": "2025-10-27T05:59:59Z", "endTime": "2025-10-27T06:00:01Z"}
+        ).json()
+        self.assertEqual(history, [{"value": 64.5, "quality": "GOOD", "timestamp": "2025-10-27T06:00:00Z"}])
+
+        response = self.client.put(f"/objects/{leaf}/history", json=[updates[0], {**updates[2], "elementId": "sensor-001"}])
+        self.assertEqual([r["success"] for r in response.json()], [True, False])
+        response = self.client.put("/objects/missing-element/history", json=[updates[2]])
+        self.assertEqual(response.status_code, 404)
+
+    def test_paged_objects_and_history(self):
+        """Test cursor pagination of /objects and /objects/{elementId}/history"""
+        expected = self.client.get("/objects").json()
+        objects = []
+        params = {"limit": 7}
+        while True:
+            page = self.client.get("/objects", params=params).json()
+            objects.extend(page["objects"])
+            if page["cursor"] is None:
+                break
+            params = {"limit": 7, "cursor": page["cursor"]}
+        self.assertEqual(objects, expected)
+
+        url = "/objects/pump-101/history"
+        query = {"maxDepth": 0, "startTime": "2025-10-26T00:00:00Z", "endTime": "2025-10-28T23:59:59Z"}
+        response = self.client.get(url, params={**query, "stream": "true"})
+        expected = [json.loads(line) for line in response.text.splitlines()]
+        records = []
+        params = {**query, "limit": 3}
+        while True:
+            page = self.client.get(url, params=params).json()
+            self.assertLessEqual(len(page["values"]), 3)
+            records.extend(page["values"])
+            if page["cursor"] is None:
+                break
+            params = {**query, "limit": 3, "cursor": page["cursor"]}
+        self.assertEqual(records, expected)
+        url += "?maxDepth=0"
+
+        self.assertEqual(self.client.get("/objects?cursor=bogus").status_code, 400)
+        self.assertEqual(self.client.get(url + "&cursor=bogus").status_code, 400)
+        self.assertEqual(self.client.get(url + "&limit=3&stream=true").status_code, 400)
+
     def test_hierarchical_relationships_endpoint(self):
         """Test RFC 4.1.4 - Relationship Types"""
         response = self.client.get("/relationshiptypes")
@@ -80,6 +305,33 @@ class TestI3XEndpoints(unittest.TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_qos2_subscription_lifecycle(self):
+        """Test RFC 4.2.3 - subscriptions are found by id, and ids are not reused after a delete"""
+        first = self.client.post("/subscriptions", json={"qos": "QoS2"}).json()["subscriptionId"]
+        second = self.client.post("/subscriptions", json={"qos": "QoS2"}).json()["subscriptionId"]
+        response = self.client.delete(f"/subscriptions/{first}")
+        self.assertEqual(response.json()["unsubscribed"], [first])
+        third = self.client.post("/subscriptions", json={"qos": "QoS2"}).json()["subscriptionId"]
+        self.assertEqual(len({first, second, third}), 3)
+
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        response = self.client.post(f"/subscriptions/{second}/objects", json={"elementIds": [leaf]})
+        self.assertEqual(response.status_code, 200)
+        self.client.put(f"/objects/{leaf}/value", json=66.5)
+        updates = self.client.post(f"/subscriptions/{second}/sync").json()
+        self.assertIn(66.5, [u["value"] for u in updates if u["elementId"] == leaf])
+        self.assertEqual(self.client.post(f"/subscriptions/{third}/sync").json(), [])
+
+        # Removed items are no longer dispatched to the subscription
+        response = self.client.request("DELETE", f"/subscriptions/{second}/objects", json={"elementIds": [leaf, "sensor-001"]})
+        self.assertEqual((response.json()["removed"], response.json()["not_found"]), ([leaf], ["sensor-001"]))
+        self.client.put(f"/objects/{leaf}/value", json=67.5)
+        self.assertEqual(self.client.post(f"/subscriptions/{second}/sync").json(), [])
+        self.assertEqual(self.client.post(f"/subscriptions/{first}/sync").status_code, 404)
+        self.assertEqual(self.client.delete(f"/subscriptions/{first}").json()["not_found"], [first])
+        for subscription_id in (second, third):
+            self.client.delete(f"/subscriptions/{subscription_id}")
+
     # TODO this probably belongs on the client side and is more than a unit test, placing here so I have a place to test QoS0
     def test_qos0_subscription_streaming(self):
         # Step 1: Create a QoS0 subscription
@@ -123,5 +375,524 @@ class TestI3XEndpoints(unittest.TestCase):
             self.assertTrue(all("elementId" in update for update in data))
 
 
+class TestMockDataSource(unittest.TestCase):
+    """Tests against a private copy of the mock data, without the background updater"""
+
+    def setUp(self):
+        self.data_source = MockDataSource(data=copy.deepcopy(I3X_DATA))
+
+    def test_composite_value_reflects_child_write(self):
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        before = self.data_source.get_instance_values_by_id("pump-101", maxDepth=0)
+        self.assertIs(
+            before, self.data_source.get_instance_values_by_id("pump-101", maxDepth=0)
+        )
+
+        result = self.data_source.update_instance_value(leaf, 99.5)
+        self.assertTrue(result["success"])
+
+        after = self.data_source.get_instance_values_by_id("pump-101", maxDepth=0)
+        measured = after["pump-101-measurements"]["pump-101-bearing-temperature"][leaf]
+        self.assertEqual(measured["value"], 99.5)
+        # Elements outside the written element's ancestor chain keep their cached values
+        self.assertIs(
+            after["pump-101-state"],
+            before["pump-101-state"],
+        )
+
+    def test_instance_index(self):
+        # Every instance is found by its elementId, without its records
+        for instance in I3X_DATA["instances"]:
+            found = self.data_source.get_instance_by_id(instance["elementId"])
+            self.assertEqual(found["elementId"], instance["elementId"])
+            self.assertNotIn("records", found)
+        self.assertIsNone(self.data_source.get_instance_by_id("missing-element"))
+
+        # Seed records are held once, in the store's series; the sample data itself is left whole
+        self.assertFalse(any("records" in instance for instance in self.data_source.data["instances"]))
+        self.assertTrue(self.data_source.get_instance_values_by_id("sensor-001", returnHistory=True))
+        self.assertTrue(any("records" in instance for instance in I3X_DATA["instances"]))
+        self.assertIsNot(MockDataSource().data, I3X_DATA)
+
+        # Added and replaced instances are found at once
+        added = {**I3X_DATA["instances"][0], "elementId": "added-element", "displayName": "Added", "records": []}
+        self.data_source.store.add_instance(added)
+        self.assertEqual(self.data_source.get_instance_by_id("added-element")["displayName"], "Added")
+        self.data_source.store.add_instance({**added, "displayName": "Replaced"})
+        self.assertEqual(self.data_source.get_instance_by_id("added-element")["displayName"], "Replaced")
+
+        # A replaced instance keeps its position and history, and readers' dicts are left as they were
+        before = self.data_source.get_instances()
+        sensor = self.data_source.get_instance_by_id("sensor-001")
+        history = self.data_source.get_instance_values_by_id("sensor-001", returnHistory=True)
+        self.data_source.store.add_instance({**sensor, "displayName": "Renamed"})
+        self.assertNotEqual(sensor["displayName"], "Renamed")
+        after = self.data_source.get_instances()
+        self.assertEqual([i["elementId"] for i in after], [i["elementId"] for i in before])
+        self.assertEqual(after[before.index(sensor)]["displayName"], "Renamed")
+        self.assertEqual(self.data_source.get_instance_values_by_id("sensor-001", returnHistory=True), history)
+
+    def test_listings_survive_writes(self):
+        store = self.data_source.store
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        type_id = store.get_instance(leaf)["typeId"]
+        store.get_instances_page(None, 0, 5)
+        store.get_instances_page(type_id, 0, 5)
+        listing = store.listings[None]
+
+        # A write swaps the new metadata into the cached listings rather than rebuilding them
+        self.assertTrue(self.data_source.update_instance_values([leaf], [1.0])[0]["success"])
+        self.assertIs(store.listings[None], listing)
+        self.assertEqual(listing, store.get_all_instances())
+        self.assertEqual(store.listings[type_id], store.get_instances_by_type(type_id))
+        self.assertIn("timestamp", listing[store.listing_positions[None][leaf]])
+
+    def test_value_cache_depths(self):
+        # pump-101's leaves are three levels down, so any maxDepth beyond that is the whole tree
+        self.assertEqual(self.data_source.store.component_height("pump-101"), 3)
+        full = self.data_source.get_instance_values_by_id("pump-101", maxDepth=0)
+        for max_depth in (4, 50, 10**6):
+            self.assertIs(self.data_source.get_instance_values_by_id("pump-101", maxDepth=max_depth), full)
+        partial = self.data_source.get_instance_values_by_id("pump-101", maxDepth=3)
+        self.assertNotEqual(partial, full)
+        self.assertEqual(sorted(self.data_source.store.value_cache["pump-101"]), [0, 3])
+
+        # A dangling component id is listed, empty, once maxDepth reaches it
+        data = copy.deepcopy(I3X_DATA)
+        sensor = next(i for i in data["instances"] if i["elementId"] == "sensor-001")
+        sensor.setdefault("relationships", {})["HasComponent"] = ["missing-element"]
+        data_source = MockDataSource(data=data)
+        self.assertEqual(data_source.store.component_height("sensor-001"), 1)
+        shallow = data_source.get_instance_values_by_id("sensor-001", maxDepth=1)
+        self.assertEqual(data_source.get_instance_values_by_id("sensor-001", maxDepth=0)["missing-element"], {})
+        self.assertIs(data_source.get_instance_values_by_id("sensor-001", maxDepth=1), shallow)
+        self.assertNotIn("missing-element", shallow)
+
+    def test_generated_plant(self):
+        config = {
+            "generator": {"sites": 2, "lines": 2, "equipment": 3, "records": 4, "seed": 7}
+        }
+        data_source = MockDataSource(config)
+        self.assertEqual(
+            len(data_source.get_instances("work-unit-type")), 2 * 2 * 3
+        )
+        # The same seed produces the same data
+        self.assertEqual(generate_plant(config["generator"]), generate_plant(config["generator"]))
+
+        value = data_source.get_instance_values_by_id("site-0-line-0-eq-0", maxDepth=0)
+        self.assertIn("site-0-line-0-eq-0-state", value)
+        history = data_source.get_instance_values_by_id(
+            "site-0-line-0-eq-0-sensor-0", returnHistory=True
+        )
+        self.assertEqual(len(history), 4)
+
+        # Sources with the same generator settings share the plant, so each sees the other's writes
+        other = MockDataSource(config)
+        self.assertIs(other.store, data_source.store)
+        leaf = "site-0-line-0-eq-0-sensor-0"
+        self.assertTrue(other.update_instance_value(leaf, 42.0)["success"])
+        self.assertEqual(data_source.get_instance_values_by_id(leaf)["value"], 42.0)
+        self.assertIsNot(MockDataSource({"generator": {**config["generator"], "seed": 8}}).store, data_source.store)
+
+    def test_simulation_rates(self):
+        simulation = {
+            "interval": 1.0,
+            "types": {"sensor-type": {"interval": 0.01}},
+            "instances": {"pump-101-state": {"change_probability": 0.0}},
+        }
+        data_source = MockDataSource({"simulation": simulation}, data=copy.deepcopy(I3X_DATA))
+        updater = data_source.updater
+        self.assertEqual(updater.rate_for(data_source.get_instance_by_id("sensor-001")), (0.01, 1.0))
+        self.assertEqual(updater.rate_for(data_source.get_instance_by_id("pump-101-state")), (1.0, 0.0))
+
+        # Only the fast group is due before the default interval elapses
+        updater.compile()
+        self.assertEqual(updater.pop_due(time.monotonic() + 0.5), [(0.01, 1.0)])
+
+        # Instances that never change keep their record
+        state = data_source.store.get_series("pump-101-state").latest()
+        updater.update_once()
+        self.assertIs(data_source.store.get_series("pump-101-state").latest(), state)
+
+    def test_updater_keeps_client_writes(self):
+        data_source = MockDataSource(data=copy.deepcopy(I3X_DATA))
+        updater = data_source.updater
+        compiled = updater.compile()
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        series = data_source.store.get_series(leaf)
+        for _ in range(2):
+            updater.update_once()
+        # Updater writes go through the columns and read back like any record
+        record = series.latest()
+        self.assertIsInstance(record["value"], float)
+        self.assertTrue(record["timestamp"].endswith("Z"))
+        self.assertEqual(series.all()[0], record)
+
+        # A client write since the last tick is not overwritten from the old value
+        self.assertTrue(data_source.update_instance_value(leaf, 50.0)["success"])
+        updater.update_once()
+        self.assertEqual(series.latest()["value"], 50.0)
+
+        # Only the written instance is reread, and the next tick perturbs the client's value
+        self.assertIs(updater._compiled, compiled)
+        notified = {}
+        updater.update_callback = lambda instance, record: notified.setdefault(instance["elementId"], instance)
+        updater.update_once()
+        self.assertTrue(45.0 <= series.latest()["value"] <= 55.0)
+        # Subscribers hear of the change with the metadata the client write replaced
+        self.assertIs(notified[leaf], data_source.get_instance_by_id(leaf))
+        self.assertIn("timestamp", notified[leaf])
+
+    def test_live_history_is_bounded(self):
+        data_source = MockDataSource(
+            {"history": {"capacity": 3}}, data=copy.deepcopy(I3X_DATA)
+        )
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        for value in (1.0, 2.0, 3.0, 4.0):
+            self.assertTrue(data_source.update_instance_value(leaf, value)["success"])
+
+        # Writes are kept as history, most recent first, and the oldest are evicted
+        history = data_source.get_instance_values_by_id(leaf, returnHistory=True)
+        self.assertEqual([r["value"] for r in history], [4.0, 3.0, 2.0])
+
+    def test_last_known_values(self):
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        self.assertTrue(self.data_source.update_instance_value(leaf, 12.5)["success"])
+        values = self.data_source.get_last_known_values([leaf, "missing-element", leaf])
+        self.assertIsNone(values[1])
+        self.assertIs(values[0], values[2])
+        self.assertEqual(values[0]["value"]["value"], 12.5)
+        # The same items as looking up each element in turn
+        self.assertEqual(values, I3XDataSource.get_last_known_values(self.data_source, [leaf, "missing-element", leaf]))
+
+    def test_update_instance_values(self):
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        notified = []
+        self.data_source.update_callback = lambda instance, record: notified.append((instance["elementId"], record["value"]))
+        instance = self.data_source.get_instance_by_id(leaf)
+        results = self.data_source.update_instance_values([leaf, leaf, "missing-element"], [1.0, "2.5", 3.0])
+        self.assertEqual([r["success"] for r in results], [True, True, False])
+
+        # Both writes are kept as history, and subscribers hear of each once the batch is written
+        history = self.data_source.get_instance_values_by_id(leaf, returnHistory=True)
+        self.assertEqual([r["value"] for r in history[:2]], [2.5, 1.0])
+        self.assertEqual(notified, [(leaf, 1.0), (leaf, 2.5)])
+        # The instance metadata is replaced, not changed under readers holding the old dict
+        self.assertNotIn("timestamp", instance)
+        self.assertIn("timestamp", self.data_source.get_instance_by_id(leaf))
+
+    def test_update_instance_history(self):
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        with tempfile.TemporaryDirectory() as directory:
+            audit_log = os.path.join(directory, "audit.jsonl")
+            data_source = MockDataSource({"history": {"capacity": 5, "audit_log": audit_log, "audit_entries": 1}}, data=copy.deepcopy(I3X_DATA))
+            seeded = data_source.get_instance_values_by_id(leaf, returnHistory=True)
+            latest = data_source.get_instance_values_by_id(leaf)
+            updates = [
+                {"elementId": leaf, "timestamp": "2025-10-28T00:00:00Z", "value": 3.0},
+                {"elementId": leaf, "timestamp": "2025-10-26T00:00:00Z", "value": 1.0},
+                {"elementId": leaf, "timestamp": "2025-10-27T00:00:00+00:00", "value": 2},
+                {"elementId": leaf, "timestamp": "2025-10-25T00:00:00Z", "value": 0.0},
+            ]
+            results = data_source.update_instance_history(updates)
+            # With room for five records, the oldest value is evicted as soon as it is merged
+            self.assertEqual([r["success"] for r in results], [True, True, True, False])
+            history = data_source.get_instance_values_by_id(leaf, returnHistory=True)
+            self.assertEqual([r["value"] for r in history], [seeded[0]["value"], 3.0, seeded[1]["value"], 2.0, 1.0])
+            self.assertEqual(history[3]["timestamp"], "2025-10-27T00:00:00+00:00")
+            # Backfill does not change the last known value
+            self.assertEqual(data_source.get_instance_values_by_id(leaf), latest)
+
+            with open(audit_log) as f:
+                entries = [json.loads(line) for line in f]
+            self.assertEqual(entries, list(data_source.store.audit_log))
+            self.assertEqual((entries[0]["elementId"], entries[0]["records"], entries[0]["retained"]), (leaf, 4, 3))
+
+            # The file keeps every entry, memory only the latest audit_entries
+            data_source.update_instance_history(updates[:1])
+            with open(audit_log) as f:
+                self.assertEqual(len(f.readlines()), 2)
+            self.assertEqual(len(data_source.store.audit_log), 1)
+
+    def test_instance_trees(self):
+        for max_depth in (0, 1, 2):
+            trees = self.data_source.get_instance_trees(["pump-101", "missing-element", "pump-101-measurements"], max_depth)
+            # The parent index walk finds what the default, indexing all instances, finds
+            self.assertEqual(trees, I3XDataSource.get_instance_trees(self.data_source, ["pump-101", "missing-element", "pump-101-measurements"], max_depth))
+            self.assertEqual(len({i["elementId"] for i in trees}), len(trees))
+        # As registration always has, maxDepth=1 takes in the direct children
+        self.assertEqual(
+            [i["elementId"] for i in self.data_source.get_instance_trees(["pump-101"], 1)],
+            ["pump-101"] + [c["elementId"] for c in self.data_source.get_child_instances("pump-101")],
+        )
+
+        # A parent cycle ends, and a root inside another root's tree is still expanded from itself
+        instances = {
+            "a": {"elementId": "a", "isComposition": True},
+            "b": {"elementId": "b", "isComposition": True},
+            "c": {"elementId": "c", "isComposition": False},
+        }
+        children = {"a": ["b"], "b": ["a", "c"]}
+        walk = lambda roots, depth: [
+            i["elementId"] for i in walk_instance_trees(roots, depth, instances.get, lambda e: [instances[c] for c in children.get(e, [])])
+        ]
+        self.assertEqual(walk(["a"], 0), ["a", "b", "c"])
+        self.assertEqual(walk(["a"], 1), ["a", "b"])
+        self.assertEqual(walk(["a", "b"], 1), ["a", "b", "c"])
+
+    def test_child_changes_reach_ancestor_subscriptions(self):
+        registry = SubscriptionRegistry()
+        self.data_source.update_callback = SubscriptionDispatcher(registry, self.data_source)
+        subscriptions = {}
+        for max_depth in (0, 1):
+            sub = Subscription(subscriptionId=registry.new_id(), qos="QoS2", created="2025-01-01T00:00:00Z", maxDepth=max_depth)
+            registry.add(sub.subscriptionId, sub)
+            registry.watch(sub.subscriptionId, [i["elementId"] for i in self.data_source.get_instance_trees(["pump-101"], max_depth)])
+            subscriptions[max_depth] = sub
+
+        built = []
+        get_values = self.data_source.get_instance_values_by_id
+        self.data_source.get_instance_values_by_id = lambda element_id, *args, **kwargs: built.append(element_id) or get_values(element_id, *args, **kwargs)
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        self.assertTrue(all(r["success"] for r in self.data_source.update_instance_values([leaf, leaf], [70.0, 71.0])))
+
+        # Both changes reach pump-101 within maxDepth=0, in one update built once for the batch
+        updates = [u for u in subscriptions[0].pendingUpdates if u["elementId"] == "pump-101"]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(built.count("pump-101"), 1)
+        self.assertEqual(updates[0]["value"], get_values("pump-101", maxDepth=0))
+        self.assertEqual(len([u for u in subscriptions[0].pendingUpdates if u["elementId"] == leaf]), 2)
+        # The leaves are three levels down, beyond maxDepth=1
+        self.assertEqual(subscriptions[1].pendingUpdates, [])
+
+        # A parent changed with its child gets one update for the batch, holding both changes
+        for sub in subscriptions.values():
+            sub.pendingUpdates.clear()
+        pump = self.data_source.get_instance_by_id("pump-101")
+        notify_updates(self.data_source.update_callback, [(pump, {"value": 1.0}), (self.data_source.get_instance_by_id(leaf), {"value": 72.0})])
+        updates = [u for u in subscriptions[0].pendingUpdates if u["elementId"] == "pump-101"]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual([u["elementId"] for u in subscriptions[1].pendingUpdates], ["pump-101"])
+
+    def test_sensor_changes_skip_equipment_subscriptions(self):
+        data_source = MockDataSource({"generator": {"equipment": 1, "sensors": 1, "records": 1, "seed": 1}})
+        registry = SubscriptionRegistry()
+        data_source.update_callback = SubscriptionDispatcher(registry, data_source)
+        equipment = "site-0-line-0-eq-0"
+        sub = Subscription(subscriptionId=registry.new_id(), qos="QoS2", created="2025-01-01T00:00:00Z", maxDepth=0)
+        registry.add(sub.subscriptionId, sub)
+        registry.watch(sub.subscriptionId, [i["elementId"] for i in data_source.get_instance_trees([equipment], 0)])
+
+        # Sensors have the equipment as parentId, but are its HasChildren, not its components
+        self.assertTrue(data_source.update_instance_value(f"{equipment}-sensor-0", 50.0)["success"])
+        self.assertNotIn(equipment, [u["elementId"] for u in sub.pendingUpdates])
+        state = data_source.get_instance_values_by_id(f"{equipment}-state")["value"]
+        self.assertTrue(data_source.update_instance_value(f"{equipment}-state", state)["success"])
+        self.assertEqual([u["elementId"] for u in sub.pendingUpdates][-2:], [f"{equipment}-state", equipment])
+
+    def test_qos0_streams_share_encoded_update(self):
+        registry = SubscriptionRegistry()
+        received = []
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        for _ in range(3):
+            sub = Subscription(subscriptionId=registry.new_id(), qos="QoS0", created="2025-01-01T00:00:00Z", handler=received.append)
+            registry.add(sub.subscriptionId, sub)
+            registry.watch(sub.subscriptionId, [leaf])
+
+        record = {"value": 70.0, "quality": "GOOD", "timestamp": "2025-01-01T00:00:00Z", "unit": None}
+        handle_data_source_update(self.data_source.get_instance_by_id(leaf), record, registry, self.data_source)
+        # One encoding, handed to every stream
+        self.assertEqual(len(received), 3)
+        self.assertTrue(all(data is received[0] for data in received))
+        self.assertEqual(
+            json.loads(received[0]),
+            [{"elementId": leaf, "value": 70.0, "quality": "GOOD", "timestamp": "2025-01-01T00:00:00Z"}],
+        )
+
+    def test_histories(self):
+        element_ids = ["pump-101", "missing-element", "sensor-001", "pump-101"]
+        histories = list(self.data_source.iter_histories(element_ids, maxDepth=0))
+        # The same records as reading each element in turn, though short histories share a read
+        self.assertEqual(
+            [(position, record) for position, chunk in histories if chunk for record in chunk],
+            [(position, record) for position, chunk in I3XDataSource.iter_histories(self.data_source, element_ids, maxDepth=0) if chunk for record in chunk],
+        )
+        self.assertIn((1, None), histories)
+
+    def test_history_page_resumes_after_writes(self):
+        leaf = "pump-101-measurements-bearing-temperature-value"
+        full = [r for chunk in self.data_source.iter_instance_history(leaf) for r in chunk]
+        first, cursor = self.data_source.get_instance_history_page(leaf, None, None, 1, 1)
+        self.assertEqual(first, full[:1])
+
+        # Newer records do not shift the pages after the cursor
+        self.assertTrue(self.data_source.update_instance_value(leaf, 42.0)["success"])
+        records = list(first)
+        while cursor is not None:
+            page, cursor = self.data_source.get_instance_history_page(leaf, None, None, 1, 1, cursor)
+            records.extend(page)
+        self.assertEqual(records, full)
+        self.assertGreater(len(full), 1)
+
+        # Pages walk the HasComponent tree in the order of the stream
+        full = [r for chunk in self.data_source.iter_instance_history("pump-101", maxDepth=0) for r in chunk]
+        records, cursor = self.data_source.get_instance_history_page("pump-101", None, None, 0, 4)
+        while cursor is not None:
+            page, cursor = self.data_source.get_instance_history_page("pump-101", None, None, 0, 4, cursor)
+            records.extend(page)
+        self.assertEqual(records, full)
+
+    def test_aggregated_history(self):
+        config = {"generator": {"equipment": 1, "records": 100, "record_interval": 60, "seed": 3}}
+        data_source = MockDataSource(config)
+        sensor = "site-0-line-0-eq-0-sensor-0"
+        history = data_source.get_instance_values_by_id(sensor, returnHistory=True)
+
+        # 100 records a minute apart fall in 10 ten-minute buckets
+        averages = data_source.get_aggregated_values_by_id(sensor, None, None, 600, "avg")
+        self.assertEqual(len(averages), 10)
+        self.assertEqual(averages[-1]["timestamp"], history[-1]["timestamp"])
+        counts = data_source.get_aggregated_values_by_id(sensor, None, None, 600, "count")
+        self.assertEqual([bucket["value"] for bucket in counts], [10] * 10)
+
+        # LTTB keeps real records, including the first and last
+        points = data_source.get_aggregated_values_by_id(sensor, None, None, 600, "lttb")
+        self.assertEqual(len(points), 10)
+        self.assertEqual(points[0], history[0])
+        self.assertEqual(points[-1], history[-1])
+        self.assertTrue(all(point in history for point in points))
+        # An interval covering every record keeps only the first one
+        points = data_source.get_aggregated_values_by_id(sensor, None, None, 10**9, "lttb")
+        self.assertEqual(points, [history[-1]])
+
+
+class TestRecordSeries(unittest.TestCase):
+    def test_round_trip(self):
+        records = [
+            {"value": 1.5, "quality": "GOOD", "timestamp": "2025-01-01T00:00:00Z"},
+            {"value": 2, "quality": "GOOD", "timestamp": "2025-01-01T00:00:01.250Z"},
+            {"value": 3.5, "quality": "BAD", "timestamp": "2025-01-01T05:30:02.000001+05:30"},
+            {"value": "running", "quality": "GOOD", "timestamp": "2024-12-31T16:00:03.500-08:00"},
+            {"value": {"speed": 4.0, "mode": "auto"}, "quality": "GOOD", "timestamp": "2025-01-01T00:00:04.1Z"},
+        ]
+        # Records come back as written, whether appended one by one or merged
+        series = RecordSeries()
+        for record in records:
+            series.append(record)
+        self.assertEqual(series.all(), records[::-1])
+        merged = RecordSeries()
+        merged.merge(records)
+        self.assertEqual(merged.all(), records[::-1])
+
+    def test_templates_are_shared_and_reclaimed(self):
+        series = RecordSeries(capacity=10)
+        for i in range(2000):
+            timestamp = f"2025-01-01T00:00:{i // 1000:02d}.{i % 1000:03d}Z"
+            series.append({"value": f"state-{i}", "quality": "GOOD", "timestamp": timestamp})
+        # Millisecond timestamps and string values do not make a template per record
+        self.assertEqual(len(series._template_ids_by_shape), 1)
+
+        # A template is dropped with its last row, and its id reused
+        for i in range(10):
+            series.append({"value": {"speed": float(i)}, "quality": "GOOD", "timestamp": f"2025-01-01T01:00:{i:02d}Z"})
+        self.assertEqual(len(series._template_ids_by_shape), 1)
+        self.assertEqual(len(series._templates), 2)
+        self.assertEqual(series.latest()["value"], {"speed": 9.0})
+
+
+    def test_time_ordered_windows(self):
+        records = [
+            {"value": float(i), "quality": "GOOD", "timestamp": f"2025-01-01T00:00:{i:02d}Z"}
+            for i in (5, 1, 9, 3, 7, 0, 8, 2, 6, 4)
+        ]
+        series = RecordSeries()
+        for record in records:
+            series.insert(record)
+        # Out of order writes land at their position in time
+        ordered = sorted(records, key=lambda r: r["timestamp"], reverse=True)
+        self.assertEqual(series.all(), ordered)
+        self.assertEqual(series.latest(), ordered[0])
+
+        # Windows include both ends, as a scan of the records would
+        start, end = parse_timestamp("2025-01-01T00:00:02Z"), parse_timestamp("2025-01-01T00:00:06Z")
+        expected = [r for r in ordered if start <= parse_timestamp(r["timestamp"]) <= end]
+        self.assertEqual(series.window_records(start, end), expected)
+        self.assertEqual(series.window_records(end + 100, end + 200), [])
+
+
+class TestTypeRegistry(unittest.TestCase):
+    def test_reload_on_change(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            os.mkdir(os.path.join(base_dir, "Namespaces"))
+            path = os.path.join(base_dir, "Namespaces", "a.json")
+            broken = os.path.join(base_dir, "Namespaces", "broken.json")
+
+            def write(file_path, text, mtime):
+                with open(file_path, "w") as f:
+                    f.write(text)
+                os.utime(file_path, (mtime, mtime))
+
+            write(path, json.dumps({"types": {"t": {"type": "number"}}}), 1_000_000)
+            write(broken, "{", 1_000_000)
+            types = [{"elementId": "t", "namespaceUri": "ns", "schema": "Namespaces/a.json#types/t"}]
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                registry = TypeRegistry(types, base_dir, check_interval=0)
+                self.assertEqual(registry.get("t")["schema"], {"type": "number"})
+
+                # A changed schema file is picked up; the broken sibling is not read again
+                write(path, json.dumps({"types": {"t": {"type": "string"}}}), 1_000_010)
+                self.assertEqual(registry.get("t")["schema"], {"type": "string"})
+                registry.get("t")
+            self.assertEqual(output.getvalue().count("broken.json"), 1)
+
+            # Fixing the broken file rebuilds the registry too
+            previous = registry.get("t")
+            write(broken, "{}", 1_000_020)
+            self.assertIsNot(registry.get("t"), previous)
+            self.assertNotIn(broken, registry._snapshot.failed)
+
+
+class TestHistoryJobs(unittest.TestCase):
+    def test_partial_results(self):
+        jobs = HistoryJobs()
+        release = threading.Event()
+
+        def chunks():
+            yield [{"value": 1}, {"value": 2}]
+            release.wait(5)
+            yield [{"value": 3}]
+
+        job = jobs.submit(chunks)
+        self.assertFalse(job.done.wait(0.2))
+        # The records collected so far, and where to continue while the job runs
+        self.assertEqual(job.page(0, 10), ([{"value": 1}, {"value": 2}], 2))
+        release.set()
+        self.assertTrue(job.done.wait(5))
+        self.assertEqual(job.page(2, 10), ([{"value": 3}], None))
+        self.assertEqual(job.status, "complete")
+        jobs.shutdown()
+
+    def test_size_cap_and_expiry(self):
+        jobs = HistoryJobs({"max_records": 3, "ttl": 60})
+        first = jobs.submit(lambda: iter([[{"value": 1}, {"value": 2}]]))
+        self.assertTrue(first.done.wait(5))
+        # A second job pushes the total over the cap, so the finished first job is dropped
+        second = jobs.submit(lambda: iter([[{"value": 3}, {"value": 4}]]))
+        self.assertTrue(second.done.wait(5))
+        self.assertIsNone(jobs.get(first.job_id))
+        self.assertIs(jobs.get(second.job_id), second)
+
+        # A job larger than the cap on its own keeps what fits and is marked truncated
+        large = jobs.submit(lambda: iter([[{"value": 5}] * 2, [{"value": 6}] * 2]))
+        self.assertTrue(large.done.wait(5))
+        self.assertEqual(large.status, "truncated")
+        self.assertEqual(len(large.records), 2)
+
+        second.last_access -= 61
+        self.assertIsNone(jobs.get(second.job_id))
+        jobs.shutdown()
+
+
 if __name__ == "__main__":
     unittest.main()